@@ -1,106 +1,620 @@
-from google.oauth2.credentials import Credentials
-from google.oauth2.service_account import Credentials as SACredentials
-from functools import lru_cache
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-import gspread
-import streamlit as st
-import io
-
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive.file"
-]
-
-@lru_cache(maxsize=1)
-def get_gspread_client():
-    """Service Account untuk Sheets"""
-    sa_info = dict(st.secrets["service_account"])
-    pk = sa_info.get("private_key", "")
-    if "\\n" in pk:
-        sa_info["private_key"] = pk.replace("\\n", "\n")
-    creds = SACredentials.from_service_account_info(sa_info, scopes=SCOPES)
-    return gspread.authorize(creds)
-
-def get_drive_service():
-    """OAuth credentials untuk Drive dengan auto-refresh"""
-    
-    # Cache di session state
-    if 'drive_service' in st.session_state:
-        return st.session_state['drive_service']
-    
-    if "oauth_token" not in st.secrets:
-        st.error("OAuth token belum di-setup di secrets!")
-        st.stop()
-    
-    token_data = dict(st.secrets["oauth_token"])
-    
-    creds = Credentials(
-        token=token_data.get("access_token"),
-        refresh_token=token_data.get("refresh_token"),
-        token_uri=token_data.get("token_uri"),
-        client_id=token_data.get("client_id"),
-        client_secret=token_data.get("client_secret"),
-        scopes=SCOPES
-    )
-    
-    # Auto refresh jika expired
-    from google.auth.transport.requests import Request
-    if not creds.valid:
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-    
-    service = build('drive', 'v3', credentials=creds)
-    st.session_state['drive_service'] = service
-    
-    return service
-
-def get_or_create_folder(parent_folder_id: str, folder_name: str) -> str:
-    service = get_drive_service()
-    
-    query = f"name='{folder_name}' and '{parent_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-    
-    try:
-        results = service.files().list(
-            q=query,
-            spaces='drive',
-            fields='files(id, name)'
-        ).execute()
-        
-        items = results.get('files', [])
-        if items:
-            return items[0]['id']
-    except Exception:
-        pass
-    
-    file_metadata = {
-        'name': folder_name,
-        'mimeType': 'application/vnd.google-apps.folder',
-        'parents': [parent_folder_id]
-    }
-    
-    folder = service.files().create(
-        body=file_metadata,
-        fields='id'
-    ).execute()
-    
-    return folder.get('id')
-
-def upload_file_to_drive(file_content, filename: str, folder_id: str, mime_type: str) -> dict:
-    service = get_drive_service()
-    
-    file_metadata = {
-        'name': filename,
-        'parents': [folder_id]
-    }
-    
-    fh = io.BytesIO(file_content)
-    media = MediaIoBaseUpload(fh, mimetype=mime_type, resumable=True)
-    
-    file = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields='id, name, webViewLink'
-    ).execute()
-    
-    return file
\ No newline at end of file
+from google.oauth2.credentials import Credentials
+from google.oauth2.service_account import Credentials as SACredentials
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from googleapiclient.discovery import build
+from googleapiclient.http import MediaIoBaseUpload
+import gspread
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import io
+import os
+import json
+import time
+import mmap
+import hashlib
+import threading
+import tracing
+import shared_cache
+from outbox import is_transient
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.file"
+]
+
+# Upload foto: potongan resumable (kelipatan 256 KiB sesuai syarat Drive)
+_UPLOAD_CHUNK_UNIT = 256 * 1024
+try:
+    UPLOAD_CHUNK_SIZE = int(st.secrets.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+    UPLOAD_SESSION_DIR = str(st.secrets.get("UPLOAD_SESSION_DIR", ".data/upload_sessions"))
+except Exception:
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
+    UPLOAD_SESSION_DIR = ".data/upload_sessions"
+UPLOAD_CHUNK_SIZE = max(1, -(-UPLOAD_CHUNK_SIZE // _UPLOAD_CHUNK_UNIT)) * _UPLOAD_CHUNK_UNIT
+UPLOAD_MAX_RESUMES = 8
+UPLOAD_SESSION_MAX_AGE = 6 * 24 * 3600  # URI sesi resumable Drive berlaku ~1 minggu
+
+# Kuota Sheets dibagi semua replika lewat token bucket di shared_cache
+try:
+    SHEETS_RATE_PER_MIN = float(st.secrets.get("SHEETS_RATE_PER_MIN", 240))
+except Exception:
+    SHEETS_RATE_PER_MIN = 240.0
+SHEETS_BUCKET = shared_cache.TokenBucket("sheets", rate=SHEETS_RATE_PER_MIN / 60, capacity=30)
+WORKSHEET_REGISTRY_TTL = 600
+WORKSHEET_REGISTRY_STALE_TTL = 3600
+FOLDER_MAP_TTL = 24 * 3600
+
+# Sumber data: "google" (Sheets/Drive asli) atau "local" (local_backend.py: file
+# lokal, tanpa secrets Google). Env GESER_METER_BACKEND dipakai bila belum ada secrets.
+try:
+    BACKEND = str(st.secrets.get("BACKEND", os.environ.get("GESER_METER_BACKEND", "google"))).lower()
+except Exception:
+    BACKEND = os.environ.get("GESER_METER_BACKEND", "google").lower()
+
+_thread_drive = threading.local()
+
+# Backend pengganti (mis. stand-in lokal fake_google untuk benchmark); None = Google asli
+_backend_override = {"gspread": None, "drive": None}
+_local_lock = threading.Lock()
+_MISSING = object()
+
+def set_backend_override(gspread_client=None, drive_service=None) -> None:
+    """Ganti client Sheets/Drive tanpa secrets Google (dipakai bench/)"""
+    _backend_override["gspread"] = gspread_client
+    _backend_override["drive"] = drive_service
+    clear_content_index()
+    _spreadsheets.clear()
+
+def _use_local_backend() -> None:
+    """BACKEND = "local": pasang LocalBackend sebagai override (sekali per proses)"""
+    if _backend_override["gspread"] is not None:
+        return
+    import local_backend
+    with _local_lock:
+        if _backend_override["gspread"] is None:
+            backend = local_backend.get()
+            set_backend_override(backend.client(), backend.drive_service())
+
+def setting(name: str, default=_MISSING):
+    """Konfigurasi halaman (SHEET_ID, SHEET_GID, DRIVE_FOLDER_EKSEKUSI, ...).
+
+    Mode local: ID spreadsheet & folder diambil dari data lokal. Tanpa default,
+    nilai yang tidak ada -> KeyError (halaman menampilkan error lalu berhenti).
+    """
+    if BACKEND == "local":
+        import local_backend
+        value = local_backend.settings().get(name)
+        if value is not None:
+            return value
+    try:
+        return st.secrets[name]
+    except Exception:
+        if default is _MISSING:
+            raise
+        return default
+
+def get_gspread_client():
+    """Service Account untuk Sheets"""
+    if BACKEND == "local":
+        _use_local_backend()
+    if _backend_override["gspread"] is not None:
+        return _backend_override["gspread"]
+    tracing.record_cache("auth.gspread_client", hit=_build_gspread_client.cache_info().currsize > 0)
+    return _build_gspread_client()
+
+@lru_cache(maxsize=1)
+@tracing.traced("auth.build_gspread_client")
+def _build_gspread_client():
+    sa_info = dict(st.secrets["service_account"])
+    pk = sa_info.get("private_key", "")
+    if "\\n" in pk:
+        sa_info["private_key"] = pk.replace("\\n", "\n")
+    creds = SACredentials.from_service_account_info(sa_info, scopes=SCOPES)
+    return _rate_limited(gspread.authorize(creds))
+
+def _rate_limited(client):
+    """Setiap request HTTP gspread mengambil satu token dari SHEETS_BUCKET"""
+    http = getattr(client, "http_client", None)
+    if http is None:
+        return client
+    raw_request = http.request
+    def request(*args, **kwargs):
+        SHEETS_BUCKET.acquire()
+        return raw_request(*args, **kwargs)
+    http.request = request
+    return client
+
+# === Spreadsheet & registry worksheet ===
+# Handle Spreadsheet di-cache per proses (tidak bisa di-pickle); daftar tab
+# (properti worksheet) ada di shared_cache sehingga semua replika memakainya
+# tanpa fetch_sheet_metadata di setiap rerun.
+_spreadsheets = {}
+
+def open_spreadsheet(spreadsheet_id: str):
+    gc = get_gspread_client()
+    cached = _spreadsheets.get(spreadsheet_id)
+    if cached is not None and cached[0] is gc:
+        return cached[1]
+    with tracing.span("sheets.open_by_key"):
+        sh = gc.open_by_key(spreadsheet_id)
+    _spreadsheets[spreadsheet_id] = (gc, sh)
+    return sh
+
+def worksheet_registry(sh, refresh: bool = False) -> list:
+    """Properti semua tab (sheetId, title, index, ...) dari cache bersama"""
+    def load():
+        with tracing.span("sheets.fetch_metadata") as sp:
+            metadata = sh.fetch_sheet_metadata()
+            sp.bytes_in = tracing.payload_size(metadata)
+        return [s["properties"] for s in metadata.get("sheets", [])]
+    
+    return shared_cache.get_or_set(
+        f"sheets:registry:{sh.id}",
+        load,
+        ttl=WORKSHEET_REGISTRY_TTL,
+        name="auth.worksheet_registry",
+        stale_ttl=WORKSHEET_REGISTRY_STALE_TTL,
+        force=refresh,
+    )
+
+def invalidate_worksheet_registry(spreadsheet_id: str) -> None:
+    """Panggil setelah tab dibuat/dihapus/diganti nama"""
+    shared_cache.delete(f"sheets:registry:{spreadsheet_id}")
+
+def _worksheet_from_properties(sh, props: dict):
+    if isinstance(sh, gspread.Spreadsheet):
+        return gspread.Worksheet(sh, props, sh.id, sh.client)
+    return sh.worksheet_from_properties(props)  # stand-in lokal (fake_google)
+
+def list_worksheets(sh, refresh: bool = False) -> list:
+    return [_worksheet_from_properties(sh, p) for p in worksheet_registry(sh, refresh)]
+
+def get_worksheet(sh, gid=None, title: str = None):
+    """Worksheet berdasarkan gid atau judul tanpa round-trip; None bila tidak ada"""
+    def find(props):
+        for p in props:
+            if gid is not None and str(p.get("sheetId")) == str(gid):
+                return p
+            if title is not None and p.get("title") == title:
+                return p
+        return None
+    
+    props = find(worksheet_registry(sh))
+    if props is None:
+        # Registry bisa basi (tab baru dari replika lain): cek ulang sekali
+        props = find(worksheet_registry(sh, refresh=True))
+    return _worksheet_from_properties(sh, props) if props is not None else None
+
+def drive_available() -> bool:
+    """True bila Drive bisa dipakai tanpa menghentikan halaman (override / token OAuth ada)"""
+    if _backend_override["drive"] is not None or BACKEND == "local":
+        return True
+    try:
+        return "oauth_token" in st.secrets
+    except Exception:
+        return False
+
+def get_drive_service():
+    """OAuth credentials untuk Drive dengan auto-refresh"""
+    
+    if BACKEND == "local":
+        _use_local_backend()
+    if _backend_override["drive"] is not None:
+        return _backend_override["drive"]
+    
+    # Thread tanpa konteks script (worker antrean, upload paralel) tidak punya
+    # session state: satu service per thread, karena objek service (httplib2)
+    # tidak aman dipakai bersama antar thread
+    if get_script_run_ctx(suppress_warning=True) is None:
+        service = getattr(_thread_drive, "service", None)
+        if service is None:
+            service = _thread_drive.service = _build_drive_service()
+        return service
+    
+    # Cache di session state
+    if 'drive_service' in st.session_state:
+        tracing.record_cache("auth.drive_service", hit=True)
+        return st.session_state['drive_service']
+    tracing.record_cache("auth.drive_service", hit=False)
+    service = _build_drive_service()
+    st.session_state['drive_service'] = service
+    
+    return service
+
+def _build_drive_service():
+    if "oauth_token" not in st.secrets:
+        st.error("OAuth token belum di-setup di secrets!")
+        st.stop()
+    
+    token_data = dict(st.secrets["oauth_token"])
+    
+    creds = Credentials(
+        token=token_data.get("access_token"),
+        refresh_token=token_data.get("refresh_token"),
+        token_uri=token_data.get("token_uri"),
+        client_id=token_data.get("client_id"),
+        client_secret=token_data.get("client_secret"),
+        scopes=SCOPES
+    )
+    
+    # Auto refresh jika expired
+    from google.auth.transport.requests import Request
+    with tracing.span("auth.build_drive_service"):
+        if not creds.valid:
+            if creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+        
+        return build('drive', 'v3', credentials=creds)
+
+@tracing.traced("auth.get_or_create_folder")
+def get_or_create_folder(parent_folder_id: str, folder_name: str) -> str:
+    # Single-flight: sesi yang submit bersamaan tidak membuat folder IDPEL ganda
+    return shared_cache.get_or_set(
+        f"drive:folder:{parent_folder_id}:{folder_name}",
+        lambda: _find_or_create_folder(parent_folder_id, folder_name),
+        ttl=FOLDER_MAP_TTL,
+        name="auth.folder_map",
+    )
+
+@tracing.traced("auth.resolve_folders")
+def resolve_folders(parent_folder_id: str, folder_names) -> dict:
+    """Folder anak untuk banyak nama sekaligus: satu listing Drive, sisanya dibuat.
+
+    Hasil listing mengisi peta folder yang sama dengan get_or_create_folder,
+    sehingga upload berikutnya tidak mencari folder satu per satu.
+    """
+    names = list(dict.fromkeys(str(n) for n in folder_names))
+    found = {}
+    for name in names:
+        entry = shared_cache.get(f"drive:folder:{parent_folder_id}:{name}")
+        if entry is not None:
+            found[name] = entry[0]
+    wanted = set(names) - set(found)
+    listed = False
+    if wanted:
+        service = get_drive_service()
+        query = f"'{parent_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+        page_token = None
+        try:
+            while True:
+                with tracing.span("drive.files.list", payload=query) as sp:
+                    results = service.files().list(
+                        q=query,
+                        spaces='drive',
+                        fields='nextPageToken, files(id, name)',
+                        pageSize=1000,
+                        pageToken=page_token
+                    ).execute()
+                    sp.bytes_in = tracing.payload_size(results)
+                for f in results.get('files', []):
+                    if f['name'] in wanted and f['name'] not in found:
+                        found[f['name']] = f['id']
+                        shared_cache.set(
+                            f"drive:folder:{parent_folder_id}:{f['name']}",
+                            (f['id'], time.time() + FOLDER_MAP_TTL),
+                            FOLDER_MAP_TTL,
+                        )
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+            listed = True
+        except Exception:
+            tracing.record_event("auth.resolve_folders_list_failed")
+    for name in names:
+        if name in found:
+            continue
+        if not listed:
+            found[name] = get_or_create_folder(parent_folder_id, name)
+            continue
+        # Listing lengkap membuktikan folder belum ada: langsung buat (tetap
+        # single-flight), dan folder baru pasti kosong -> indeks hash kosong
+        created = []
+        def create(name=name):
+            created.append(_create_folder(parent_folder_id, name))
+            return created[0]
+        found[name] = shared_cache.get_or_set(
+            f"drive:folder:{parent_folder_id}:{name}",
+            create,
+            ttl=FOLDER_MAP_TTL,
+            name="auth.folder_map",
+        )
+        if created and created[0] == found[name]:
+            with _content_index_lock:
+                _remember_index(found[name], {})
+    return found
+
+def _find_or_create_folder(parent_folder_id: str, folder_name: str) -> str:
+    service = get_drive_service()
+    
+    query = f"name='{folder_name}' and '{parent_folder_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
+    
+    try:
+        with tracing.span("drive.files.list", payload=query) as sp:
+            results = service.files().list(
+                q=query,
+                spaces='drive',
+                fields='files(id, name)'
+            ).execute()
+            sp.bytes_in = tracing.payload_size(results)
+        
+        items = results.get('files', [])
+        if items:
+            return items[0]['id']
+    except Exception:
+        pass
+    
+    return _create_folder(parent_folder_id, folder_name)
+
+def _create_folder(parent_folder_id: str, folder_name: str) -> str:
+    service = get_drive_service()
+    file_metadata = {
+        'name': folder_name,
+        'mimeType': 'application/vnd.google-apps.folder',
+        'parents': [parent_folder_id]
+    }
+    
+    with tracing.span("drive.files.create_folder", payload=file_metadata):
+        folder = service.files().create(
+            body=file_metadata,
+            fields='id'
+        ).execute()
+    
+    return folder.get('id')
+
+# === Dedup foto berdasarkan hash isi ===
+# Tiap file yang diupload diberi appProperties sha256=<hash isi>. Indeks
+# hash -> file per folder IDPEL diisi sekali dari listing Drive, lalu dijaga
+# lokal, sehingga foto yang sama tidak diupload ulang saat submit diulang.
+# Indeks dibatasi CONTENT_INDEX_MAX_FOLDERS folder (LRU); folder yang terbuang
+# diisi ulang dari listing bila dipakai lagi.
+CONTENT_HASH_PROPERTY = "sha256"
+CONTENT_INDEX_MAX_FOLDERS = 256
+
+_content_index_lock = threading.Lock()
+_content_index = OrderedDict()
+
+def _remember_index(folder_id: str, index: dict) -> dict:
+    """Simpan/ambil indeks folder (pemanggil memegang _content_index_lock)"""
+    index = _content_index.setdefault(folder_id, index)
+    _content_index.move_to_end(folder_id)
+    while len(_content_index) > CONTENT_INDEX_MAX_FOLDERS:
+        _content_index.popitem(last=False)
+    return index
+
+def clear_content_index(folder_id: str = None) -> None:
+    with _content_index_lock:
+        if folder_id is None:
+            _content_index.clear()
+        else:
+            _content_index.pop(folder_id, None)
+
+def _index_entry(f: dict) -> dict:
+    return {k: f[k] for k in ('id', 'name', 'webViewLink') if k in f}
+
+def _seed_content_index(folder_id: str) -> dict:
+    service = get_drive_service()
+    query = f"'{folder_id}' in parents and trashed=false"
+    index = {}
+    page_token = None
+    while True:
+        with tracing.span("drive.files.list", payload=query) as sp:
+            results = service.files().list(
+                q=query,
+                spaces='drive',
+                fields='nextPageToken, files(id, name, webViewLink, appProperties)',
+                pageSize=1000,
+                pageToken=page_token
+            ).execute()
+            sp.bytes_in = tracing.payload_size(results)
+        for f in results.get('files', []):
+            digest = (f.get('appProperties') or {}).get(CONTENT_HASH_PROPERTY)
+            if digest and digest not in index:
+                index[digest] = _index_entry(f)
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return index
+
+def find_uploaded_file(folder_id: str, digest: str):
+    """File Drive di folder ini dengan hash isi yang sama, atau None"""
+    with _content_index_lock:
+        index = _content_index.get(folder_id)
+        if index is not None:
+            _content_index.move_to_end(folder_id)
+    tracing.record_cache("auth.content_index", hit=index is not None)
+    if index is None:
+        index = _seed_content_index(folder_id)
+        with _content_index_lock:
+            index = _remember_index(folder_id, index)
+    return index.get(digest)
+
+# === Upload streaming & resumable ===
+class _MemoryviewReader(io.RawIOBase):
+    """File-like read-only di atas memoryview: hanya potongan yang diminta yang disalin"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+@contextmanager
+def _as_memoryview(file_content):
+    """bytes / file biner di disk -> memoryview tanpa salinan penuh; mmap ditutup setelahnya"""
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        yield memoryview(file_content)
+        return
+    if os.fstat(file_content.fileno()).st_size == 0:
+        yield memoryview(b"")
+        return
+    with mmap.mmap(file_content.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+
+def _session_path(folder_id: str, digest: str) -> str:
+    key = hashlib.sha1(f"{folder_id}:{digest}".encode("utf-8")).hexdigest()
+    return os.path.join(UPLOAD_SESSION_DIR, f"{key}.json")
+
+def _load_upload_session(path: str, size: int):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("size") != size or time.time() - saved.get("created_at", 0) > UPLOAD_SESSION_MAX_AGE:
+        _drop_upload_session(path)
+        return None
+    return saved.get("uri")
+
+def _save_upload_session(path: str, uri: str, size: int) -> None:
+    os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+    tmp = f"{path}.part"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"uri": uri, "size": size, "created_at": time.time()}, f)
+    os.replace(tmp, path)
+
+def _drop_upload_session(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _query_upload_offset(request, size: int):
+    """Tanya Drive sudah terima sampai byte ke berapa.
+
+    Return dict file bila upload ternyata sudah selesai, int offset bila sesi
+    masih berjalan, atau None bila sesi kedaluwarsa (mulai dari awal).
+    """
+    with tracing.span("drive.upload.status"):
+        resp, content = request.http.request(
+            request.resumable_uri,
+            method="PUT",
+            headers={"Content-Length": "0", "Content-Range": f"bytes */{size}"},
+        )
+    status = int(resp.status)
+    if status in (200, 201):
+        return json.loads(content)
+    if status == 308:
+        rng = resp.get("range")
+        return int(rng.rsplit("-", 1)[1]) + 1 if rng else 0
+    return None
+
+@tracing.traced("auth.upload_file_to_drive")
+def upload_file_to_drive(
+    file_content,
+    filename: str,
+    folder_id: str,
+    mime_type: str,
+    app_properties: dict = None,
+    digest: str = None,
+) -> dict:
+    """Upload file ke folder; bila isi yang sama sudah ada, kembalikan file itu (skipped=True)
+
+    file_content boleh bytes atau file biner yang terbuka (di-mmap); isinya
+    dibaca lewat memoryview per potongan UPLOAD_CHUNK_SIZE. digest = sha256 isi
+    bila pemanggil sudah menghitungnya (mis. nama blob outbox). Koneksi putus
+    dilanjutkan dari offset terakhir yang diterima Drive, juga lintas proses
+    (URI sesi disimpan di UPLOAD_SESSION_DIR).
+    """
+    with _as_memoryview(file_content) as view:
+        return _upload_view(view, filename, folder_id, mime_type, app_properties, digest)
+
+def _upload_view(view: memoryview, filename, folder_id, mime_type, app_properties, digest) -> dict:
+    size = len(view)
+    if digest is None:
+        digest = hashlib.sha256(view).hexdigest()
+    existing = find_uploaded_file(folder_id, digest)
+    if existing is not None:
+        tracing.record_event("auth.upload_skipped_duplicate")
+        return {**existing, 'skipped': True}
+    
+    service = get_drive_service()
+    
+    file_metadata = {
+        'name': filename,
+        'parents': [folder_id],
+        'appProperties': {**(app_properties or {}), CONTENT_HASH_PROPERTY: digest}
+    }
+    
+    media = MediaIoBaseUpload(_MemoryviewReader(view), mimetype=mime_type, chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+    request = service.files().create(
+        body=file_metadata,
+        media_body=media,
+        fields='id, name, webViewLink'
+    )
+    
+    session_path = _session_path(folder_id, digest)
+    file = None
+    saved_uri = _load_upload_session(session_path, size)
+    if saved_uri:
+        request.resumable_uri = saved_uri
+        state = _query_upload_offset(request, size)
+        if isinstance(state, dict):
+            file = state
+        elif state is None:
+            request.resumable_uri = None
+            _drop_upload_session(session_path)
+        else:
+            request.resumable_progress = state
+            tracing.record_event("auth.upload_resumed_session")
+    
+    sent = 0
+    resumes = 0
+    with tracing.span("drive.files.create") as sp:
+        while file is None:
+            offset = request.resumable_progress
+            error = None
+            try:
+                _, file = request.next_chunk()
+            except Exception as e:
+                error = e
+            sent += min(UPLOAD_CHUNK_SIZE, size - offset)
+            # Simpan URI sesi begitu ada, agar proses lain bisa melanjutkan
+            if file is None and request.resumable_uri and request.resumable_uri != saved_uri:
+                saved_uri = request.resumable_uri
+                _save_upload_session(session_path, saved_uri, size)
+            if error is not None:
+                resumes += 1
+                if not is_transient(error) or resumes > UPLOAD_MAX_RESUMES:
+                    raise error
+                tracing.record_retry("auth.upload_file_to_drive")
+                time.sleep(min(2 ** (resumes - 1), 30))
+        sp.bytes_out = sent
+    if sent > size:
+        tracing.record_event("auth.upload_retransmitted_chunk")
+    _drop_upload_session(session_path)
+    
+    with _content_index_lock:
+        _remember_index(folder_id, {})[digest] = _index_entry(file)
+    
+    return file
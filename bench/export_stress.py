@@ -0,0 +1,211 @@
+"""Uji stres export paralel: lease per IDPEL & retensi tab REKAP yang diserialkan.
+
+Banyak export Proses (dua tab REKAP + cleanup + Tanggal Survey) dan update
+TanggalEksekusi dijalankan bersamaan dari thread pool terhadap fake_google /
+LocalBackend, dengan sedikit IDPEL supaya penulisan ke baris yang sama saling
+berebut. Dengan KEEP_LATEST_TABS kecil hampir tiap export memicu cleanup.
+
+Dicek setelah semua selesai:
+  - tidak ada export/update yang gagal
+  - tidak ada penghapusan tab ganda (export.cleanup_batch_failed/_delete_failed)
+  - jumlah tab REKAP di sheet = keep setelah satu cleanup penutup (tidak ada tab sisa)
+  - tidak ada tab yang dihapus retensi selagi export lain masih menulisnya
+  - tidak ada penulisan hilang: nilai TanggalEksekusi & Tanggal Survey di sheet
+    sama dengan penulisan lokal terakhir (pelanggan.pending_writes)
+Exit code 1 bila salah satu gagal. --no-locks mematikan lease untuk pembanding.
+
+Contoh:
+    python bench/export_stress.py
+    python bench/export_stress.py --exports 128 --workers 32 --idpels 2 --latency 0.02
+    python bench/export_stress.py --shared-cache fake-redis     # lease lewat RedisCache(FakeRedis)
+    python bench/export_stress.py --no-locks                     # pembanding tanpa lease
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import auth  # noqa: E402
+import export_rekap_sheets  # noqa: E402
+import local_backend  # noqa: E402
+import outbox  # noqa: E402
+import pelanggan  # noqa: E402
+import rekap_ledger  # noqa: E402
+import shared_cache  # noqa: E402
+import sheet_columns  # noqa: E402
+import tracing  # noqa: E402
+from fake_google import FakeBackend, seed_workbook  # noqa: E402
+from run_bench import SAMPLE_BARANG  # noqa: E402
+
+EVENTS = (
+    "export.cleanup_batch_failed",
+    "export.cleanup_delete_failed",
+    "export.cleanup_skipped",
+    "shared_cache.lease_timeout",
+    "shared_cache.lease_expired",
+)
+
+
+def _sheet_values(backend, spreadsheet_id: str, gid: str, idpels) -> dict:
+    """{idpel: {kolom: nilai}} dari baris terakhir tiap IDPEL, langsung dari isi backend"""
+    data = backend.spreadsheets[spreadsheet_id]
+    tab = next(t for t in data.tabs if str(t.sheet_id) == str(gid))
+    header = [str(h) for h in tab.values[0]]
+    id_col = header.index(sheet_columns.label("id_pelanggan"))
+    out = {}
+    for row in tab.values[1:]:
+        if len(row) > id_col and str(row[id_col]).strip() in idpels:
+            out[str(row[id_col]).strip()] = dict(zip(header, row))
+    return out
+
+
+def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="geser_meter_stress_")
+    outbox.OUTBOX_DIR = os.path.join(workdir, "outbox")
+    rekap_ledger.REKAP_LEDGER_PATH = os.path.join(workdir, "rekap_ledger.sqlite3")
+
+    if args.backend == "local":
+        backend = local_backend.LocalBackend(os.path.join(workdir, "local"), seed_rows=args.rows, latency=0.0)
+        spreadsheet_id, gid = backend.settings["SHEET_ID"], backend.settings["SHEET_GID"]
+    else:
+        backend = FakeBackend(latency=0.0, seed=0)
+        ids = seed_workbook(backend, args.rows, seed=0)
+        spreadsheet_id, gid = ids["spreadsheet_id"], ids["gid"]
+    auth.set_backend_override(backend.client(), backend.drive_service())
+    shared_cache.set_backend(
+        shared_cache.RedisCache(shared_cache.FakeRedis()) if args.shared_cache == "fake-redis" else shared_cache.LocalCache()
+    )
+    export_rekap_sheets.KEEP_LATEST_TABS = args.keep
+    lease = shared_cache.lease
+    if args.no_locks:
+        shared_cache.lease = lambda *a, **kw: nullcontext()
+
+    data = backend.spreadsheets[spreadsheet_id]
+    idpels = [str(r[1]) for r in data.tabs[0].values[1:args.idpels + 1]]
+    backend.latency = args.latency
+    tracing.reset()
+
+    def export(i: int) -> None:
+        idpel = idpels[i % len(idpels)]
+        ts = (datetime(2025, 1, 1) + timedelta(minutes=i)).strftime("%Y%m%d_%H%M")
+        meta = {"Pekerjaan": "Geser APP", "Nama": f"Stress ({idpel})", "Lokasi": "-", "ULP": "Dinoyo", "No SPK": "-", "Vendor": "-"}
+        result = export_rekap_sheets.export_rekap_pair(
+            spreadsheet_id=spreadsheet_id,
+            base_sheet_title_vendor=f"REKAP Stress {i} - {ts}_Vendor",
+            base_sheet_title_pelanggan=f"REKAP Stress {i} - {ts}_Pelanggan",
+            meta=meta,
+            df_pilih=SAMPLE_BARANG,
+            idpel=idpel,
+            gid=gid,
+        )
+        if not result["survey_result"].get("success"):
+            raise RuntimeError(result["survey_result"].get("message"))
+
+    def eksekusi(i: int) -> None:
+        idpel = idpels[i % len(idpels)]
+        tanggal = (datetime(2025, 1, 1) + timedelta(days=i)).strftime("%d/%m/%Y")  # unik per penulisan
+        result = pelanggan.update_tanggal_eksekusi(spreadsheet_id, gid, idpel, tanggal)
+        if not result["success"]:
+            raise RuntimeError(result["message"])
+
+    jobs = [(export, i) for i in range(args.exports)] + [(eksekusi, i) for i in range(args.exports)]
+    jobs.sort(key=lambda j: j[1])  # export & update IDPEL yang sama saling bersilangan
+    errors = []
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(fn, i) for fn, i in jobs]
+            for fut in futures:
+                try:
+                    fut.result()
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+        elapsed = time.perf_counter() - t0
+        # tab export yang masih berjalan dilewati retensi; export berikutnya yang membersihkan
+        export_rekap_sheets.cleanup_old_rekap(auth.open_spreadsheet(spreadsheet_id), keep_latest=args.keep)
+    finally:
+        shared_cache.lease = lease
+        auth.set_backend_override(None, None)
+
+    rekap_tabs = sum(1 for t in data.tabs if t.title.startswith("REKAP "))
+    on_sheet = _sheet_values(backend, spreadsheet_id, gid, set(idpels))
+    lost = []
+    for w in pelanggan.pending_writes(spreadsheet_id, gid):
+        if w["idpel"] not in on_sheet:
+            continue
+        actual = on_sheet[w["idpel"]].get(w["column"])
+        if str(actual) != str(w["value"]):
+            lost.append(f"{w['idpel']} {w['column']}: sheet={actual!r} lokal={w['value']!r}")
+    events = {row["name"]: row["events"] for row in tracing.summary() if row["name"] in EVENTS}
+    return {
+        "backend": args.backend,
+        "shared_cache": args.shared_cache,
+        "locks": not args.no_locks,
+        "jobs": len(jobs),
+        "seconds": round(elapsed, 3),
+        "jobs_per_s": round(len(jobs) / elapsed, 1) if elapsed else None,
+        "errors": errors,
+        "events": {name: events.get(name, 0) for name in EVENTS},
+        "rekap_tabs": rekap_tabs,
+        "keep": args.keep,
+        "lost_writes": lost,
+    }
+
+
+def check(res: dict) -> list:
+    failures = []
+    if res["errors"]:
+        failures.append(f"{len(res['errors'])} job gagal, mis. {res['errors'][0]}")
+    double = res["events"]["export.cleanup_batch_failed"] + res["events"]["export.cleanup_delete_failed"]
+    if double:
+        failures.append(f"{double} penghapusan tab ganda / gagal")
+    if res["rekap_tabs"] != res["keep"]:
+        failures.append(f"{res['rekap_tabs']} tab REKAP tersisa, seharusnya {res['keep']}")
+    if res["lost_writes"]:
+        failures.append(f"{len(res['lost_writes'])} penulisan hilang, mis. {res['lost_writes'][0]}")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exports", type=int, default=64, help="jumlah export (ditambah update TanggalEksekusi sebanyak itu)")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--idpels", type=int, default=4, help="jumlah IDPEL yang diperebutkan")
+    parser.add_argument("--keep", type=int, default=10, help="KEEP_LATEST_TABS selama uji")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.01, help="latensi buatan per panggilan API (detik)")
+    parser.add_argument("--backend", choices=("fake", "local"), default="fake")
+    parser.add_argument("--shared-cache", choices=("local", "fake-redis"), default="local")
+    parser.add_argument("--no-locks", action="store_true", help="matikan lease (pembanding)")
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+
+    res = run(args)
+    failures = check(res)
+    print(f"== {res['jobs']} job, {args.workers} worker, {args.idpels} IDPEL, backend={res['backend']}, "
+          f"shared_cache={res['shared_cache']}, lease={'ya' if res['locks'] else 'TIDAK'} ==")
+    print(f"waktu {res['seconds']:.2f} s ({res['jobs_per_s']} job/s), error {len(res['errors'])}")
+    print(f"tab REKAP {res['rekap_tabs']} (keep {res['keep']}), penulisan hilang {len(res['lost_writes'])}")
+    for name, n in res["events"].items():
+        print(f"  {name:<32}{n:>6}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"result": res, "failures": failures}, f, indent=2)
+        print(f"\nHasil disimpan di {args.json}")
+    for msg in failures:
+        print(f"GAGAL: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
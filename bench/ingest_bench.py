@@ -0,0 +1,108 @@
+"""Benchmark memori ingest sheet pelanggan: get_all_records vs per potongan.
+
+Tiap kombinasi (mode, jumlah baris) dijalankan di subproses tersendiri agar
+puncak RSS tidak tercampur. Di subproses: FakeBackend diisi dulu, puncak RSS
+di-reset (VmHWM, Linux) lalu _fetch_pelanggan dijalankan sekali. Dilaporkan
+puncak RSS di atas baseline, ukuran DataFrame akhir (deep) dan rasionya;
+target mode chunked sekitar 1x ukuran data.
+
+Catatan: data fake_google sudah ada di memori sebelum baseline, jadi yang
+terukur hanya biaya ingest (respons API + konversi). Tanpa reset VmHWM (non
+Linux) angka puncak memakai ru_maxrss dan bisa terlalu rendah.
+
+Contoh:
+    python bench/ingest_bench.py
+    python bench/ingest_bench.py --rows 10000 100000 200000 --chunk-rows 2000
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+MODES = ("records", "chunked")
+MB = 1024 * 1024
+
+
+def run_child(mode: str, rows: int, chunk_rows: int) -> dict:
+    import auth
+    import pelanggan
+    import sheet_ingest
+    from fake_google import FakeBackend, seed_workbook
+
+    backend = FakeBackend(latency=0.0, seed=0)
+    ids = seed_workbook(backend, rows, seed=0)
+    auth.set_backend_override(backend.client(), backend.drive_service())
+    sheet_ingest.INGEST_CHUNK_ROWS = 0 if mode == "records" else chunk_rows
+    # registry worksheet & kernel Arrow/pandas di-warm dulu (biaya sekali, bukan per baris)
+    pelanggan.load_sheet_by_gid(ids["spreadsheet_id"], ids["gid"])
+    sheet_ingest.frame_from_rows(["a", "b"], iter([[["1", "x"], ["2", ""]]])).fillna("")
+
+    gc.collect()
+    reset = sheet_ingest.reset_peak_rss()
+    base = (sheet_ingest.current_rss_bytes() if reset else sheet_ingest.peak_rss_bytes()) or 0
+    backend.reset_stats()
+    t0 = time.perf_counter()
+    df, _ = pelanggan._fetch_pelanggan(ids["spreadsheet_id"], ids["gid"])
+    elapsed = time.perf_counter() - t0
+    peak = (sheet_ingest.peak_rss_bytes() or 0) - base
+    frame = int(df.memory_usage(deep=True).sum())
+    return {
+        "mode": mode,
+        "rows": len(df),
+        "seconds": round(elapsed, 3),
+        "peak_mb": round(peak / MB, 1),
+        "frame_mb": round(frame / MB, 1),
+        "ratio": round(peak / frame, 2) if frame else None,
+        "round_trips": backend.round_trips,
+        "peak_reset": reset,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--chunk-rows", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(args.child[0], int(args.child[1]), args.chunk_rows)))
+        return 0
+
+    print(f"{'baris':>9}{'mode':>10}{'detik':>8}{'puncak MB':>11}{'frame MB':>10}{'rasio':>7}{'round-trip':>12}")
+    results = []
+    for rows in args.rows:
+        for mode in args.modes:
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, str(rows),
+                 "--chunk-rows", str(args.chunk_rows)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{rows:>9,}{mode:>10}  GAGAL: {proc.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+                continue
+            res = json.loads(proc.stdout.strip().splitlines()[-1])
+            results.append(res)
+            print(f"{rows:>9,}{mode:>10}{res['seconds']:>8.2f}{res['peak_mb']:>11.1f}{res['frame_mb']:>10.1f}"
+                  f"{res['ratio'] if res['ratio'] is not None else '-':>7}{res['round_trips']:>12}")
+    if results and not all(r["peak_reset"] for r in results):
+        print("\nVmHWM tidak bisa di-reset: puncak memakai ru_maxrss (bisa terlalu rendah).")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nHasil disimpan di {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""Uji beban: N sesi Streamlit simulasi (AppTest) terhadap fake_google.
+
+Setiap sesi menjalankan alur Data Pelanggan, Proses (cari, pilih pelanggan,
+isi volume, Hitung Rekap) dan Eksekusi (cari, pilih pelanggan). Halaman dibuka
+lewat app.py (menu sidebar) seperti di aplikasi sebenarnya, dengan sys.path
+yang sama dengan `streamlit run app.py` (hanya root repo); error "Gagal memuat
+halaman" dan st.error lain ikut dihitung sebagai error. Semua sesi
+tetap hidup sampai akhir putaran sehingga memori yang dipegang per sesi ikut
+terukur. Langkah antar sesi dijalankan bergiliran (round-robin) dalam satu
+proses: AppTest menukar st.secrets secara global, jadi tidak aman diparalelkan.
+
+Dilaporkan: memori session_state per sesi, pertumbuhan heap per sesi
+(tracemalloc, opsional), CPU per rerun dan latensi p95 per halaman. Exit code 1 bila
+salah satu budget terlampaui.
+
+Contoh:
+    python bench/load_test.py
+    python bench/load_test.py --sessions 1 10 50 --rows 10000 --latency 0.02
+    python bench/load_test.py --sessions 20 --tracemalloc --budget-heap-kb 2048
+    python bench/load_test.py --backend local --sessions 5   # LocalBackend (SQLite + direktori)
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Hanya root repo (sama dengan `streamlit run app.py`): import halaman yang
+# bergantung pada sidebar/ di sys.path harus gagal di sini juga
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from streamlit import logger as st_logger  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import auth  # noqa: E402
+import local_backend  # noqa: E402
+import outbox  # noqa: E402
+import pelanggan  # noqa: E402
+import rekap_ledger  # noqa: E402
+import session_stats  # noqa: E402
+from fake_google import FakeBackend, seed_workbook  # noqa: E402
+
+APP = os.path.join(ROOT, "app.py")
+# halaman -> label menu sidebar di app.py
+PAGES = {
+    "data_pelanggan": "Data Pelanggan",
+    "proses": "Proses",
+    "eksekusi": "Eksekusi",
+}
+RUN_TIMEOUT = 120
+
+
+# === Alur per halaman: daftar langkah, tiap langkah berakhir dengan satu rerun ===
+def _proses_steps(query: str):
+    def search(at):
+        at.text_input(key="filter_search").input(query)
+
+    def select(at):
+        sb = at.selectbox(key="select_idpel")
+        if len(sb.options) > 1:
+            sb.select_index(1)
+
+    def hitung(at):
+        at.number_input(key="qty_0").set_value(1)
+        at.number_input(key="qty_2").set_value(2)
+        next(b for b in at.button if "Hitung" in str(b.label)).click()
+
+    return [None, search, select, hitung]
+
+
+def _eksekusi_steps(query: str):
+    def search(at):
+        at.text_input(key="search_id_eksekusi").input(query)
+
+    def select(at):
+        sb = at.selectbox(key="select_idpel_eksekusi")
+        if len(sb.options) > 1:
+            sb.select_index(1)
+
+    return [None, search, select]
+
+
+def _open_menu(label: str):
+    def step(at):
+        at.sidebar.selectbox[0].select(label)
+
+    return step
+
+
+def _flows(query: str) -> dict:
+    # rerun pertama app.py selalu membuka Proses (menu default), lalu pindah menu
+    return {
+        "data_pelanggan": [None, _open_menu(PAGES["data_pelanggan"])],
+        "proses": _proses_steps(query),
+        "eksekusi": [None, _open_menu(PAGES["eksekusi"])] + _eksekusi_steps(query)[1:],
+    }
+
+
+def _page_errors(at) -> list:
+    """Exception tak tertangkap + st.error (app.py menangkap error import halaman)"""
+    return [str(e.value) for e in at.exception] + [str(e.value) for e in at.error]
+
+
+class Session:
+    """Satu sesi simulasi: satu AppTest per halaman, state tetap hidup"""
+
+    def __init__(self, n: int, secrets: dict, query: str):
+        self.n = n
+        self.apps = {}
+        self.steps = _flows(query)
+        for page in PAGES:
+            at = AppTest.from_file(APP, default_timeout=RUN_TIMEOUT)
+            for k, v in secrets.items():
+                at.secrets[k] = v
+            self.apps[page] = at
+
+    def state_bytes(self) -> int:
+        return sum(session_stats.total_bytes(at.session_state) for at in self.apps.values())
+
+
+def _p95(values):
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[max(0, math.ceil(0.95 * len(s)) - 1)]
+
+
+def run_round(n_sessions: int, ids: dict, secrets: dict, trace_memory: bool) -> dict:
+    pelanggan.clear_cache()
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    heap0 = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+
+    sessions = [Session(i, secrets, query=ids["query"]) for i in range(n_sessions)]
+    wall = {page: [] for page in PAGES}
+    cpu = {page: [] for page in PAGES}
+    errors = 0
+
+    max_steps = max(len(steps) for steps in sessions[0].steps.values()) if sessions else 0
+    for step in range(max_steps):
+        for page in PAGES:
+            for s in sessions:
+                steps = s.steps[page]
+                if step >= len(steps):
+                    continue
+                at = s.apps[page]
+                try:
+                    if steps[step] is not None:
+                        steps[step](at)
+                    c0, t0 = time.process_time(), time.perf_counter()
+                    at.run(timeout=RUN_TIMEOUT)
+                    wall[page].append(time.perf_counter() - t0)
+                    cpu[page].append(time.process_time() - c0)
+                    page_errors = _page_errors(at)
+                    if page_errors:
+                        errors += 1
+                        print(f"    ! sesi {s.n} {page}: {page_errors[0].splitlines()[0]}", file=sys.stderr)
+                except Exception as e:
+                    errors += 1
+                    print(f"    ! sesi {s.n} {page}: {type(e).__name__}: {e}", file=sys.stderr)
+
+    gc.collect()
+    heap_per_session = None
+    if trace_memory:
+        heap_per_session = (tracemalloc.get_traced_memory()[0] - heap0) / max(1, n_sessions)
+        tracemalloc.stop()
+    state = [s.state_bytes() for s in sessions]
+
+    all_wall = [w for ws in wall.values() for w in ws]
+    all_cpu = [c for cs in cpu.values() for c in cs]
+    return {
+        "sessions": n_sessions,
+        "reruns": len(all_wall),
+        "state_kb_per_session": round(statistics.mean(state) / 1024, 2) if state else 0.0,
+        "heap_kb_per_session": round(heap_per_session / 1024, 1) if heap_per_session is not None else None,
+        "cpu_ms_per_rerun": round(statistics.mean(all_cpu) * 1000, 1) if all_cpu else 0.0,
+        "p95_ms": round(_p95(all_wall) * 1000, 1),
+        "p95_ms_by_page": {page: round(_p95(ws) * 1000, 1) for page, ws in wall.items()},
+        "errors": errors,
+    }
+
+
+def check_budgets(result: dict, budgets: dict) -> list:
+    failures = []
+    for field, limit in budgets.items():
+        value = result.get(field)
+        if limit is not None and value is not None and value > limit:
+            failures.append(f"{result['sessions']} sesi: {field} = {value} > budget {limit}")
+    if result["errors"]:
+        failures.append(f"{result['sessions']} sesi: {result['errors']} rerun error")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="latensi per round-trip (detik)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=["fake", "local"], default="fake",
+                        help="fake = fake_google di memori, local = local_backend (tulis ke file)")
+    parser.add_argument("--query", default="5131000000", help="teks pencarian yang diketik tiap sesi")
+    parser.add_argument("--budget-session-kb", type=float, default=256.0, help="maks session_state per sesi (KB)")
+    parser.add_argument("--budget-heap-kb", type=float, default=None, help="maks pertumbuhan heap per sesi (KB)")
+    parser.add_argument("--budget-cpu-ms", type=float, default=500.0, help="maks CPU rata-rata per rerun (ms)")
+    parser.add_argument("--budget-p95-ms", type=float, default=2000.0, help="maks latensi p95 per rerun (ms)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="ukur pertumbuhan heap per sesi (memperlambat rerun, budget CPU/p95 ikut naik)")
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+    st_logger.set_log_level("error")  # peringatan deprecation per rerun menenggelamkan tabel
+
+    # Antrean & ledger ke direktori sementara: uji beban tidak mengotori .data/
+    workdir = tempfile.mkdtemp(prefix="geser_meter_load_")
+    outbox.OUTBOX_DIR = os.path.join(workdir, "outbox")
+    rekap_ledger.REKAP_LEDGER_PATH = os.path.join(workdir, "rekap_ledger.sqlite3")
+
+    if args.backend == "local":
+        backend = local_backend.LocalBackend(os.path.join(workdir, "local"), seed_rows=args.rows, latency=0.0)
+        ids = {
+            "spreadsheet_id": backend.settings["SHEET_ID"],
+            "gid": backend.settings["SHEET_GID"],
+            "drive_folder_eksekusi": backend.settings["DRIVE_FOLDER_EKSEKUSI"],
+        }
+    else:
+        backend = FakeBackend(latency=0.0, seed=args.seed)
+        ids = seed_workbook(backend, args.rows, seed=args.seed)
+    backend.latency = args.latency
+    auth.set_backend_override(backend.client(), backend.drive_service())
+    ids["query"] = args.query
+    secrets = {
+        "SHEET_ID": ids["spreadsheet_id"],
+        "SHEET_GID": ids["gid"],
+        "DRIVE_FOLDER_EKSEKUSI": ids["drive_folder_eksekusi"],
+    }
+    budgets = {
+        "state_kb_per_session": args.budget_session_kb,
+        "heap_kb_per_session": args.budget_heap_kb,
+        "cpu_ms_per_rerun": args.budget_cpu_ms,
+        "p95_ms": args.budget_p95_ms,
+    }
+
+    print(f"== {args.rows:,} baris, backend={args.backend}, latency={args.latency}s ==")
+    print(f"{'sesi':>6}{'rerun':>8}{'state KB/sesi':>15}{'heap KB/sesi':>14}{'CPU ms/rerun':>14}"
+          f"{'p95 ms':>10}{'error':>7}")
+    results, failures = [], []
+    try:
+        for n in args.sessions:
+            res = run_round(n, ids, secrets, args.tracemalloc)
+            results.append(res)
+            failures.extend(check_budgets(res, budgets))
+            heap = "-" if res["heap_kb_per_session"] is None else f"{res['heap_kb_per_session']:.1f}"
+            print(f"{n:>6}{res['reruns']:>8}{res['state_kb_per_session']:>15.2f}{heap:>14}"
+                  f"{res['cpu_ms_per_rerun']:>14.1f}{res['p95_ms']:>10.1f}{res['errors']:>7}")
+            print(f"{'':>6}p95 per halaman: " + ", ".join(f"{k} {v} ms" for k, v in res["p95_ms_by_page"].items()))
+    finally:
+        auth.set_backend_override(None, None)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"budgets": budgets, "results": results, "failures": failures}, f, indent=2)
+        print(f"\nHasil disimpan di {args.json}")
+    for msg in failures:
+        print(f"BUDGET TERLAMPAUI: {msg}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
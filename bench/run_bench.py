@@ -0,0 +1,244 @@
+"""Benchmark offline alur Proses, Eksekusi & Data Pelanggan terhadap fake_google.
+
+Tidak butuh akses Google: auth.set_backend_override() mengarahkan semua
+panggilan Sheets/Drive ke FakeBackend dengan latensi & error kuota buatan.
+
+Contoh:
+    python bench/run_bench.py
+    python bench/run_bench.py --rows 1000 10000 100000 --latency 0.05 --quota-rate 0.02
+    python bench/run_bench.py --rows 10000 --json bench_output.json
+    python bench/run_bench.py --only proses_export --latency 0.05 --serial-export
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pandas as pd  # noqa: E402
+
+import auth  # noqa: E402
+import pelanggan  # noqa: E402
+import shared_cache  # noqa: E402
+import export_rekap_sheets  # noqa: E402
+from harga import HARGA_PELANGGAN, HARGA_VENDOR  # noqa: E402
+from fake_google import FakeBackend, seed_workbook  # noqa: E402
+
+SAMPLE_BARANG = pd.DataFrame([
+    {"Rincian": "Jasa Kegiatan Geser APP", "SAT": "PLG", "Vol": 1, "Harga Satuan Material": 103230, "Harga Total": 103230},
+    {"Rincian": "Service wedge clamp 2/4 x 6/10 mm", "SAT": "B", "Vol": 2, "Harga Satuan Material": 4428.90, "Harga Total": 8857.80},
+    {"Rincian": "Strainhook / ekor babi", "SAT": "B", "Vol": 2, "Harga Satuan Material": 8880.00, "Harga Total": 17760.00},
+    {"Rincian": "Twisted Cable 2 x 10 mm² - Al", "SAT": "M", "Vol": 15, "Harga Satuan Material": 4816.29, "Harga Total": 72244.35},
+])
+SEARCH_QUERIES = ["5131", "sofia", "513100000700", "wijaya", "zzz-tidak-ada"]
+FOTO_SIZE = 200 * 1024
+FOTO_PER_SUBMIT = 3
+
+
+class Context:
+    def __init__(self, backend: FakeBackend, ids: dict, rows: int):
+        self.backend = backend
+        self.spreadsheet_id = ids["spreadsheet_id"]
+        self.gid = ids["gid"]
+        self.drive_root = ids["drive_folder_eksekusi"]
+        self.rows = rows
+        self.counter = 0
+        self.values_mode = False
+        self._idpels = None
+
+    def idpel(self) -> str:
+        if self._idpels is None:
+            data = self.backend.spreadsheets[self.spreadsheet_id]
+            self._idpels = [r[1] for r in data.tabs[0].values[1:]]
+        self.counter += 1
+        return self._idpels[(self.counter * 7919) % len(self._idpels)]
+
+
+# === Skenario ===
+def scenario_data_pelanggan(ctx: Context):
+    """Fetch dingin + transformasi tabel + render HTML halaman Data Pelanggan"""
+    pelanggan.clear_cache()
+    df = pelanggan.fetch_pelanggan_df(ctx.spreadsheet_id, ctx.gid)
+    df_display, _ = pelanggan.prepare_display_df(df)
+    df_display.to_html(escape=False, index=False)
+
+
+def setup_search(ctx: Context):
+    pelanggan.fetch_pelanggan_df(ctx.spreadsheet_id, ctx.gid)
+
+
+def scenario_search(ctx: Context):
+    """Cache hangat: pencarian berperingkat (top-N) lewat indeks untuk beberapa query"""
+    index = pelanggan.search_index(ctx.spreadsheet_id, ctx.gid)
+    for q in SEARCH_QUERIES:
+        index.search(search_text=q)
+    # query baru (bukan memo) agar biaya pencarian sebenarnya ikut terukur
+    index.search(search_text=str(ctx.counter))
+    ctx.counter += 1
+
+
+def scenario_proses_export(ctx: Context):
+    """Konfirmasi & Export: dua tab rekap + cleanup + update Tanggal Survey"""
+    idpel = ctx.idpel()
+    ts = (datetime(2025, 1, 1) + timedelta(minutes=ctx.counter)).strftime("%Y%m%d_%H%M")
+    meta = {"Pekerjaan": "Geser APP", "Nama": f"Bench ({idpel})", "Lokasi": "-", "ULP": "Dinoyo", "No SPK": "-", "Vendor": "-"}
+    result = export_rekap_sheets.export_rekap_pair(
+        spreadsheet_id=ctx.spreadsheet_id,
+        base_sheet_title_vendor=f"REKAP Bench {ctx.counter} - {ts}_Vendor",
+        base_sheet_title_pelanggan=f"REKAP Bench {ctx.counter} - {ts}_Pelanggan",
+        meta=meta,
+        df_pilih=SAMPLE_BARANG,
+        idpel=idpel,
+        gid=ctx.gid,
+        values_mode=ctx.values_mode,
+    )
+    if not result["survey_result"].get("success"):
+        raise RuntimeError(result["survey_result"].get("message"))
+
+
+def scenario_eksekusi_upload(ctx: Context):
+    """Submit Eksekusi: folder IDPEL + upload foto + update TanggalEksekusi"""
+    idpel = ctx.idpel()
+    folder_id = auth.get_or_create_folder(ctx.drive_root, idpel)
+    for i in range(1, FOTO_PER_SUBMIT + 1):
+        auth.upload_file_to_drive(
+            file_content=os.urandom(FOTO_SIZE),  # isi unik, agar tidak dilewati dedup hash
+            filename=f"{idpel}_01012025_Bench_{i:02d}.jpg",
+            folder_id=folder_id,
+            mime_type="image/jpeg",
+        )
+    result = pelanggan.update_tanggal_eksekusi(ctx.spreadsheet_id, ctx.gid, idpel, "01/01/2025")
+    if not result["success"]:
+        raise RuntimeError(result["message"])
+
+
+SCENARIOS = [
+    ("data_pelanggan_render", None, scenario_data_pelanggan),
+    ("search", setup_search, scenario_search),
+    ("proses_export", None, scenario_proses_export),
+    ("eksekusi_upload", None, scenario_eksekusi_upload),
+]
+
+
+def verify_values_mode(ctx: Context) -> int:
+    """Angka values mode harus sama dengan formula template (stand-in menghitung formula)"""
+    failures = 0
+    for template, harga in ((export_rekap_sheets.TEMPLATE_VENDOR_TITLE, HARGA_VENDOR),
+                            (export_rekap_sheets.TEMPLATE_PELANGGAN_TITLE, HARGA_PELANGGAN)):
+        mismatches = export_rekap_sheets.verify_values_mode(ctx.spreadsheet_id, SAMPLE_BARANG, template, harga)
+        print(f"verifikasi values mode {template}: {'OK' if not mismatches else 'SELISIH'}")
+        for m in mismatches:
+            print(f"    ! {m}", file=sys.stderr)
+        failures += len(mismatches)
+    return failures
+
+
+def measure(ctx: Context, setup, fn, repeat: int, trace_memory: bool) -> dict:
+    walls, peaks, trips, received, errors = [], [], [], [], 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup(ctx)
+        ctx.backend.reset_stats()
+        gc.collect()
+        if trace_memory:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            fn(ctx)
+        except Exception as e:
+            errors += 1
+            print(f"    ! {fn.__name__}: {type(e).__name__}: {e}", file=sys.stderr)
+        walls.append(time.perf_counter() - t0)
+        if trace_memory:
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        trips.append(ctx.backend.round_trips)
+        received.append(ctx.backend.bytes_received)
+    return {
+        "wall_ms_median": round(statistics.median(walls) * 1000, 1),
+        "wall_ms_max": round(max(walls) * 1000, 1),
+        "round_trips": round(statistics.mean(trips), 1),
+        "peak_mem_mb": round(max(peaks) / 2**20, 2) if peaks else None,
+        "upload_mb": round(statistics.mean(received) / 2**20, 2),
+        "errors": errors,
+    }
+
+
+def run(rows_list, repeat, latency, jitter, quota_rate, seed, only, trace_memory, drop_rate=0.0,
+        values_mode=False) -> list:
+    results = []
+    for rows in rows_list:
+        backend = FakeBackend(latency=0.0, seed=seed)
+        ids = seed_workbook(backend, rows, seed=seed)
+        backend.latency, backend.jitter, backend.quota_error_rate = latency, jitter, quota_rate
+        backend.upload_drop_rate = drop_rate
+        auth.set_backend_override(backend.client(), backend.drive_service())
+        pelanggan.clear_cache()
+        ctx = Context(backend, ids, rows)
+        ctx.values_mode = values_mode
+
+        print(f"\n== {rows:,} baris (latency={latency}s, quota_rate={quota_rate}, drop_rate={drop_rate}) ==")
+        print(f"{'skenario':<24}{'wall med (ms)':>15}{'wall max':>11}{'round-trip':>12}{'peak MB':>10}"
+              f"{'upload MB':>11}{'error':>7}")
+        for name, setup, fn in SCENARIOS:
+            if only and name not in only:
+                continue
+            res = measure(ctx, setup, fn, repeat, trace_memory)
+            res.update({"scenario": name, "rows": rows})
+            results.append(res)
+            peak = "-" if res["peak_mem_mb"] is None else f"{res['peak_mem_mb']:.2f}"
+            print(f"{name:<24}{res['wall_ms_median']:>15.1f}{res['wall_ms_max']:>11.1f}"
+                  f"{res['round_trips']:>12.1f}{peak:>10}{res['upload_mb']:>11.2f}{res['errors']:>7}")
+    auth.set_backend_override(None, None)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="latensi per round-trip (detik)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="tambahan latensi acak maks (detik)")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="peluang error 429 per round-trip")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="peluang koneksi putus per potongan upload")
+    parser.add_argument("--shared-cache", choices=["local", "fake-redis"], default="local",
+                        help="backend shared_cache (fake-redis = jalur RedisCache tanpa server)")
+    parser.add_argument("--values-mode", action="store_true", help="export rekap dengan angka hasil hitung lokal")
+    parser.add_argument("--verify-values-mode", action="store_true",
+                        help="hanya cek angka values mode vs formula template, lalu keluar")
+    parser.add_argument("--serial-export", action="store_true",
+                        help="tab Vendor & Pelanggan dibuat berurutan (pembanding export paralel)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", choices=[s[0] for s in SCENARIOS])
+    parser.add_argument("--no-tracemalloc", action="store_true", help="matikan pengukuran memori (lebih cepat)")
+    parser.add_argument("--json", help="simpan hasil ke file JSON")
+    args = parser.parse_args(argv)
+
+    shared_cache.set_backend(shared_cache._build_backend(args.shared_cache))
+    export_rekap_sheets.EXPORT_PARALLEL = not args.serial_export
+    if args.verify_values_mode:
+        backend = FakeBackend(seed=args.seed)
+        ids = seed_workbook(backend, 10, seed=args.seed)
+        auth.set_backend_override(backend.client(), backend.drive_service())
+        failures = verify_values_mode(Context(backend, ids, 10))
+        auth.set_backend_override(None, None)
+        return 1 if failures else 0
+    results = run(args.rows, args.repeat, args.latency, args.jitter, args.quota_rate,
+                  args.seed, args.only, not args.no_tracemalloc, args.drop_rate, args.values_mode)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nHasil disimpan di {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+# eksekusi_batch.py - Tandai eksekusi banyak pelanggan dalam satu submit
+#
+# Foto dikelompokkan per IDPEL dari ZIP (folder "IDPEL/foto.jpg" atau nama file
+# "IDPEL_xxx.jpg") atau dari upload banyak file dengan nama berawalan IDPEL.
+# Alurnya sama dengan submit satu pelanggan (antrean outbox, nama file & idem
+# key sama), tetapi: semua folder IDPEL diselesaikan dengan satu listing Drive,
+# upload antar pelanggan berjalan paralel, dan TanggalEksekusi semua pelanggan
+# yang fotonya sudah lengkap ditulis dengan satu values_batch_update.
+import hashlib
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import streamlit as st
+
+import outbox
+import tracing
+from auth import resolve_folders
+
+try:
+    EKSEKUSI_BATCH_WORKERS = int(st.secrets.get("EKSEKUSI_BATCH_WORKERS", 4))
+except Exception:
+    EKSEKUSI_BATCH_WORKERS = 4
+
+IMAGE_MIME = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+_RE_IDPEL = re.compile(r"^(\d{6,})(?=[_\-\s.(]|$)")
+
+
+def idpel_from_path(path: str) -> Optional[str]:
+    """'513100000035/a.jpg' atau '513100000035_1.jpg' -> '513100000035'"""
+    parts = [p for p in re.split(r"[\\/]", path) if p]
+    for part in parts:
+        m = _RE_IDPEL.match(part.strip())
+        if m:
+            return m.group(1)
+    return None
+
+
+def group_photos(files: Iterable) -> Tuple["OrderedDict[str, List[dict]]", List[str]]:
+    """File upload (ZIP / gambar) -> ({idpel: [foto]}, [nama file yang dilewati]).
+
+    Isi foto belum dibaca: tiap foto membawa read() sehingga isi ZIP diekstrak
+    satu per satu saat diantrekan, bukan semuanya sekaligus ke memori.
+    """
+    groups: "OrderedDict[str, List[dict]]" = OrderedDict()
+    skipped: List[str] = []
+
+    def add(path: str, size: int, read) -> None:
+        if os.path.basename(path).startswith(".") or "__MACOSX" in path:
+            return
+        ext = os.path.splitext(path)[1].lower()
+        idpel = idpel_from_path(path)
+        if idpel is None or ext not in IMAGE_MIME:
+            skipped.append(path)
+            return
+        groups.setdefault(idpel, []).append({
+            "name": os.path.basename(path),
+            "ext": ext.lstrip("."),
+            "mime": IMAGE_MIME[ext],
+            "size": size,
+            "read": read,
+        })
+
+    for f in files:
+        if f.name.lower().endswith(".zip"):
+            zf = zipfile.ZipFile(f)
+            for info in zf.infolist():
+                if not info.is_dir():
+                    add(info.filename, info.file_size, lambda info=info, zf=zf: zf.read(info))
+        else:
+            add(f.name, f.size, lambda f=f: f.getbuffer())
+    return groups, skipped
+
+
+def batch_key(tanggal: date, idpels: Iterable[str]) -> str:
+    digest = hashlib.sha1(",".join(sorted(idpels)).encode("utf-8")).hexdigest()[:16]
+    return f"eksekusi_batch:{tanggal.strftime('%d%m%Y')}:{digest}"
+
+
+@tracing.traced("eksekusi_batch.submit")
+def submit_batch(
+    groups: Dict[str, List[dict]],
+    names: Dict[str, str],
+    tanggal: date,
+    spreadsheet_id: str,
+    gid: str,
+    parent_folder_id: str,
+    workers: int = EKSEKUSI_BATCH_WORKERS,
+    deadline: Optional[float] = None,
+) -> dict:
+    """Antrekan & kirim semua foto + TanggalEksekusi; return ringkasan per IDPEL"""
+    tanggal_str = tanggal.strftime("%d/%m/%Y")
+    tanggal_prefix = tanggal.strftime("%d%m%Y")
+    idpels = list(groups)
+
+    # Satu listing Drive untuk semua folder IDPEL (mengisi peta folder bersama).
+    # Gagal di sini tidak fatal: handler upload mencari foldernya sendiri.
+    try:
+        resolve_folders(parent_folder_id, idpels)
+    except Exception:
+        tracing.record_event("eksekusi_batch.resolve_folders_failed")
+
+    group_keys = {}
+    upload_keys: Dict[str, List[str]] = {}
+    for idpel, photos in groups.items():
+        nama = names.get(idpel, "-")
+        group_key = f"eksekusi:{idpel}:{tanggal_prefix}"
+        group_keys[idpel] = group_key
+        upload_keys[idpel] = []
+        for idx, photo in enumerate(photos, 1):
+            # Nama file & idem key sama dengan submit satu pelanggan
+            filename = f"{idpel}_{tanggal_prefix}_{nama.replace(' ', '_')}_{idx:02d}.{photo['ext']}"
+            data = photo["read"]()
+            file_hash = outbox.content_hash(data)
+            upload_key = f"upload:{idpel}:{tanggal_prefix}:{file_hash}"
+            upload_keys[idpel].append(upload_key)
+            outbox.enqueue(
+                "drive_upload",
+                {
+                    "parent_folder_id": parent_folder_id,
+                    "folder_name": idpel,
+                    "filename": filename,
+                    "mime_type": photo["mime"],
+                },
+                idem_key=upload_key,
+                blob=data,
+                blob_digest=file_hash,
+                group_key=group_key,
+            )
+
+    outbox.drain_many(group_keys.values(), workers=workers, deadline=deadline)
+
+    summary = {}
+    siap = []
+    for idpel, group_key in group_keys.items():
+        # hanya foto submit ini; group yang sama bisa berisi submit sebelumnya hari itu
+        uploads = outbox.items(group_key=group_key, idem_keys=upload_keys[idpel])
+        gagal = [it for it in uploads if it["status"] == "failed"]
+        tertunda = [it for it in uploads if it["status"] in ("pending", "running")]
+        summary[idpel] = {
+            "nama": names.get(idpel, "-"),
+            "foto": len(groups[idpel]),
+            "diupload": sum(1 for it in uploads if it["status"] == "done"),
+            "errors": [it["last_error"] for it in gagal],
+            "status": "gagal" if gagal else ("tertunda" if tertunda else "upload_ok"),
+        }
+        if gagal:
+            continue
+        if tertunda:
+            # Foto belum terkirim: tanggal menyusul lewat group IDPEL-nya (worker)
+            outbox.enqueue(
+                "sheets_tanggal_eksekusi",
+                {"spreadsheet_id": spreadsheet_id, "gid": gid, "idpel": idpel, "tanggal": tanggal_str},
+                idem_key=f"eksekusi:{idpel}:{tanggal_str}",
+                group_key=group_key,
+                requires=upload_keys[idpel],
+            )
+        else:
+            siap.append(idpel)
+
+    batch = None
+    if siap:
+        key = batch_key(tanggal, siap)
+        outbox.enqueue(
+            "sheets_tanggal_eksekusi_batch",
+            {"spreadsheet_id": spreadsheet_id, "gid": gid, "updates": {idpel: tanggal_str for idpel in siap}},
+            idem_key=key,
+            group_key=key,
+        )
+        outbox.drain(group_key=key)
+        batch = next(iter(outbox.items(group_key=key)), None)
+
+    batch_status = batch["status"] if batch else None
+    tidak_ditemukan = set(((batch or {}).get("result") or {}).get("missing", []))
+    for idpel in siap:
+        if batch_status == "done":
+            summary[idpel]["status"] = "tidak_ditemukan" if idpel in tidak_ditemukan else "selesai"
+        elif batch_status == "failed":
+            summary[idpel]["status"] = "gagal"
+            summary[idpel]["errors"].append(batch["last_error"])
+        else:
+            summary[idpel]["status"] = "tertunda"
+    return {"tanggal": tanggal_str, "pelanggan": summary, "batch": batch}
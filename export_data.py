@@ -0,0 +1,111 @@
+# export_data.py - Unduhan CSV/Parquet dari snapshot yang sudah ada di memori
+#
+# Dipakai halaman Data Pelanggan. File dibangun potongan demi potongan
+# (EXPORT_CHUNK_ROWS baris) langsung ke disk, jadi memori puncak sebesar satu
+# potongan, bukan sebesar seluruh file. Sumbernya snapshot cache (pelanggan /
+# registry worksheet): tidak ada panggilan API tambahan untuk mengunduh.
+import os
+import re
+import time
+from typing import Iterator, Optional
+
+import pandas as pd
+import streamlit as st
+
+import tracing
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet opsional; CSV selalu tersedia
+    pa = None
+    pq = None
+
+try:
+    EXPORT_DIR = str(st.secrets.get("EXPORT_DIR", ".data/exports"))
+except Exception:
+    EXPORT_DIR = ".data/exports"
+
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_MAX_AGE = 3600  # detik; file unduhan lama dibuang saat membuat yang baru
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def available_formats() -> list:
+    return ["csv", "parquet"] if pq is not None else ["csv"]
+
+
+def _chunks(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[bytes]:
+    """CSV UTF-8 (dengan BOM agar terbaca Excel) per potongan baris"""
+    yield "\ufeff".encode("utf-8") + df.iloc[:0].to_csv(index=False).encode("utf-8")
+    for chunk in _chunks(df, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode("utf-8")
+
+
+def _as_text(chunk: pd.DataFrame) -> pd.DataFrame:
+    # kolom object dari get_all_records bisa campuran angka/teks: samakan jadi teks
+    # supaya skema tiap row group identik
+    out = chunk.copy(deep=False)
+    for c in out.columns:
+        if out[c].dtype == "object":
+            out[c] = out[c].astype(str)
+    return out
+
+
+def write_parquet(df: pd.DataFrame, path: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """Parquet dengan satu row group per potongan baris"""
+    if pq is None:
+        raise RuntimeError("Parquet butuh paket pyarrow")
+    schema = pa.Schema.from_pandas(_as_text(df.iloc[:0]), preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(_as_text(chunk), schema=schema, preserve_index=False))
+
+
+def _cleanup_old_exports(now: float) -> None:
+    try:
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            if now - os.path.getmtime(path) > EXPORT_MAX_AGE:
+                os.remove(path)
+    except OSError:
+        pass
+
+
+@tracing.traced("export_data.build_export")
+def build_export(df: pd.DataFrame, name: str, fmt: str = "csv", chunk_rows: int = EXPORT_CHUNK_ROWS) -> str:
+    """Tulis df ke EXPORT_DIR sebagai CSV/Parquet per potongan; return path file"""
+    if fmt not in MIME_TYPES:
+        raise ValueError(f"Format tidak dikenal: {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    now = time.time()
+    _cleanup_old_exports(now)
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "export"
+    path = os.path.join(EXPORT_DIR, f"{safe}_{int(now * 1000)}.{fmt}")
+    tmp = path + ".part"
+    try:
+        if fmt == "parquet":
+            write_parquet(df, tmp, chunk_rows)
+        else:
+            with open(tmp, "wb") as f:
+                for block in iter_csv(df, chunk_rows):
+                    f.write(block)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+def file_name(name: str, fmt: str, when: Optional[str] = None) -> str:
+    """Nama file untuk tombol unduh, mis. data_pelanggan_20250101_1200.csv"""
+    return f"{name}_{when}.{fmt}" if when else f"{name}.{fmt}"
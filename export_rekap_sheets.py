@@ -0,0 +1,943 @@
+# export_rekap_sheets.py - Simplified with Template Formulas
+import re
+import difflib
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, List, Any, Iterable, Sequence
+import numpy as np
+import pandas as pd
+import streamlit as st
+import outbox
+import rekap_ledger
+import shared_cache
+import sheet_columns
+import tracing
+from auth import open_spreadsheet, get_worksheet, list_worksheets, invalidate_worksheet_registry
+from pelanggan import idpel_lease, locate_cell, own_write, record_local_write
+from harga import HARGA_VENDOR, HARGA_PELANGGAN, hitung_rekap
+
+# Timezone helper
+try:
+    from zoneinfo import ZoneInfo
+    def now_jakarta():
+        return datetime.now(tz=ZoneInfo("Asia/Jakarta"))
+except Exception:
+    def now_jakarta():
+        return datetime.utcnow() + timedelta(hours=7)
+
+# Retention: keep latest 40 tabs
+KEEP_LATEST_TABS = 40
+# Satu pembersih per spreadsheet pada satu waktu (antar sesi & replika)
+RETENTION_LEASE_TTL = 120
+RETENTION_LEASE_WAIT = 30
+_RE_REKAP = re.compile(r"^REKAP\s+.+?\s*-\s*(\d{8}[_-]\d{4})_(Vendor|Pelanggan)$")
+# Judul tab yang sedang ditulis export (di replika mana pun) dicatat di
+# shared_cache: tidak ikut dihapus retensi, karena export IDPEL lain yang selesai
+# lebih dulu bisa menjalankan cleanup. TTL menjaga tanda tidak tertinggal bila
+# proses pengekspor mati.
+IN_FLIGHT_TTL = 600
+
+def _in_flight_key(spreadsheet_id: str, title: str) -> str:
+    return f"rekap_inflight:{spreadsheet_id}:{title}"
+
+def _parse_dt_from_title(title: str) -> Optional[datetime]:
+    m = _RE_REKAP.match(title)
+    if not m:
+        return None
+    ts = m.group(1).replace("-", "_")
+    try:
+        return datetime.strptime(ts, "%Y%m%d_%H%M")
+    except Exception:
+        return None
+
+def _rekap_surplus(sh, keep_latest: int, refresh: bool = False) -> list:
+    """Tab REKAP di luar keep_latest terbaru (yang akan dihapus)"""
+    candidates: List[tuple[Optional[datetime], Any]] = []
+    for ws in list_worksheets(sh, refresh=refresh):
+        if ws.title.startswith("REKAP "):
+            dt = _parse_dt_from_title(ws.title)
+            candidates.append((dt, ws))
+    
+    if len(candidates) <= keep_latest:
+        return []
+    
+    candidates.sort(key=lambda x: (x[0] is not None, x[0]), reverse=True)
+    return [
+        ws for _, ws in candidates[keep_latest:]
+        if shared_cache.get(_in_flight_key(sh.id, ws.title)) is None
+    ]
+
+@tracing.traced("export.cleanup_old_rekap")
+def cleanup_old_rekap(sh, keep_latest: int = KEEP_LATEST_TABS) -> None:
+    """Hapus tab REKAP terlama. Diserialkan per spreadsheet: export paralel tidak
+    menghapus tab yang sama dua kali; pemegang berikutnya membaca registry yang
+    sudah di-invalidate pemegang sebelumnya."""
+    try:
+        with shared_cache.lease(f"rekap_retention:{sh.id}", ttl=RETENTION_LEASE_TTL, timeout=RETENTION_LEASE_WAIT):
+            surplus = _rekap_surplus(sh, keep_latest)
+            if not surplus:
+                return
+            body = {"requests": [{"deleteSheet": {"sheetId": ws.id}} for ws in surplus]}
+            try:
+                with tracing.span("sheets.batch_update", payload=body):
+                    sh.batch_update(body)
+            except Exception:
+                # registry basi (tab sudah dihapus di luar aplikasi): baca ulang, hapus satu per satu
+                tracing.record_event("export.cleanup_batch_failed")
+                for ws in _rekap_surplus(sh, keep_latest, refresh=True):
+                    try:
+                        with tracing.span("sheets.del_worksheet"):
+                            sh.del_worksheet(ws)
+                    except Exception:
+                        tracing.record_event("export.cleanup_delete_failed")
+            invalidate_worksheet_registry(sh.id)
+    except shared_cache.LeaseTimeout:
+        # pembersih lain masih berjalan; sisa tab ikut terhapus pada export berikutnya
+        tracing.record_event("export.cleanup_skipped")
+
+def rekap_tab_history(spreadsheet_id: str) -> pd.DataFrame:
+    """Daftar tab REKAP dari registry worksheet (cache), terbaru dulu"""
+    rows = []
+    for ws in list_worksheets(open_spreadsheet(spreadsheet_id)):
+        m = _RE_REKAP.match(ws.title)
+        if not m:
+            continue
+        nama = ws.title[len("REKAP "):m.start(1)].rstrip(" -")
+        rows.append({
+            "Judul Tab": ws.title,
+            "Nama": nama,
+            "Waktu": _parse_dt_from_title(ws.title),
+            "Jenis": m.group(2),
+            "Sheet ID": ws.id,
+        })
+    df = pd.DataFrame(rows, columns=["Judul Tab", "Nama", "Waktu", "Jenis", "Sheet ID"])
+    return df.sort_values("Waktu", ascending=False, na_position="last").reset_index(drop=True)
+
+# Template titles
+TEMPLATE_VENDOR_TITLE = "Template Vendor"
+TEMPLATE_PELANGGAN_TITLE = "Template Pelanggan"
+
+try:
+    TEMPLATE_VENDOR_TITLE = str(st.secrets.get("TEMPLATE_VENDOR_TITLE", "Template Vendor"))
+    TEMPLATE_PELANGGAN_TITLE = str(st.secrets.get("TEMPLATE_PELANGGAN_TITLE", "Template Pelanggan"))
+except Exception:
+    pass
+
+# Values mode: tulis angka hasil hitung lokal, bukan mengandalkan formula template.
+# Tab rekap jadi statis sehingga spreadsheet tidak makin berat dihitung ulang.
+try:
+    EXPORT_VALUES_MODE = str(st.secrets.get("EXPORT_VALUES_MODE", "false")).lower() in ("1", "true", "yes")
+except Exception:
+    EXPORT_VALUES_MODE = False
+
+# Tab Vendor & Pelanggan dibuat bersamaan (dua thread, satu handle spreadsheet)
+try:
+    EXPORT_PARALLEL = str(st.secrets.get("EXPORT_PARALLEL", "true")).lower() in ("1", "true", "yes")
+except Exception:
+    EXPORT_PARALLEL = True
+
+@lru_cache(maxsize=4096)
+def _normalize_str(s: str) -> str:
+    s = s.lower()
+    s = s.replace("–", "-").replace("—", "-").replace(""", '"').replace(""", '"').replace("'", "'")
+    s = s.replace("mm2", "mm²").replace("mm^2", "mm²")
+    s = re.sub(r"\s+", " ", s)
+    return s.strip()
+
+def _normalize(s) -> str:
+    # memoized: nama item yang sama hanya dinormalisasi sekali per proses
+    return _normalize_str(str(s or ""))
+
+# Aliases for item name variations
+ALIASES = {
+    _normalize("Jasa Kegiatan"): _normalize("Jasa Kegiatan Geser APP"),
+    _normalize("Jasa Kegiatan Geser APP"): _normalize("Jasa Kegiatan Geser APP"),
+    _normalize("Jasa Kegiatan Perubahan Situasi SR"): _normalize("Jasa Kegiatan Geser Perubahan Situasi SR"),
+    _normalize("Jasa Kegiatan Geser Perubahan Situasi SR"): _normalize("Jasa Kegiatan Geser Perubahan Situasi SR"),
+    _normalize("Service wedge clamp 2/4 x 6/10 mm"): _normalize("Service wedge clamp 2/4 x 6/10 mm"),
+    _normalize("Service wedge clamp 2/4 x 6/10mm"): _normalize("Service wedge clamp 2/4 x 6/10 mm"),
+    _normalize("Strainhook / ekor babi"): _normalize("Strainhook / ekor babi"),
+    _normalize("Strainthook / ekor babi"): _normalize("Strainhook / ekor babi"),
+    _normalize("Strainhook / Ekor babi"): _normalize("Strainhook / ekor babi"),
+    _normalize("Imundex klem"): _normalize("Imundex klem"),
+    _normalize("Imundex Klem"): _normalize("Imundex klem"),
+    _normalize("Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover"): _normalize("Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover"),
+    _normalize("Conn. press AL/AL 10-16 mm² + Scoot + Cover"): _normalize("Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover"),
+    _normalize("Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover"): _normalize("Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover"),
+    _normalize("Conn. press AL/AL 50-70 mm² + Scoot + Cover"): _normalize("Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover"),
+    _normalize('Pole Bracket 3-9"'): _normalize('Pole Bracket 3-9"'),
+    _normalize("Twisted Cable 2 x 10 mm² - Al"): _normalize("Twisted Cable 2 x 10 mm² - Al"),
+    _normalize("Twisted Cable 2 x 10 mm² – Al"): _normalize("Twisted Cable 2 x 10 mm² - Al"),
+    _normalize("Twisted Cable 2x10 mm² - Al"): _normalize("Twisted Cable 2x10 mm² - Al"),
+    _normalize("Twisted Cable 2x10 mm² – Al"): _normalize("Twisted Cable 2x10 mm² - Al"),
+}
+
+class ItemResolver:
+    """Nama item -> indeks baris template, dari satu tabel lookup yang dibekukan.
+
+    Nama kanonik + semua ALIASES dinormalisasi sekali saat dibuat. Hanya
+    cocok persis (setelah normalisasi/alias): nama yang mirip bisa jadi item
+    lain dengan harga berbeda (mis. varian Conn. press AL/AL), jadi kandidat
+    fuzzy hanya dilaporkan lewat suggest(), tidak pernah dipakai.
+    """
+
+    FUZZY_CUTOFF = 0.88
+    TOKEN_CUTOFF = 0.8
+
+    def __init__(self, items: Sequence[str]):
+        self.items = tuple(items)
+        table = {}
+        for i, name in enumerate(self.items):
+            if _normalize(name):
+                table.setdefault(ALIASES.get(_normalize(name), _normalize(name)), i)
+        for alias, canonical in ALIASES.items():
+            if canonical in table:
+                table.setdefault(alias, table[canonical])
+        self._table = MappingProxyType(table)
+        self._keys = tuple(table)
+        self._tokens = tuple(frozenset(k.split()) for k in self._keys)
+
+    def suggest(self, item_name) -> Optional[str]:
+        """Item template yang mirip nama tak dikenal ini (difflib ratio, lalu token set), untuk pesan error"""
+        key = _normalize(item_name)
+        if not key or key in self._table:
+            return None
+        match = difflib.get_close_matches(key, self._keys, n=1, cutoff=self.FUZZY_CUTOFF)
+        best = match[0] if match else None
+        if best is None:
+            tokens = frozenset(key.split())
+            best_score = 0.0
+            for k, kt in zip(self._keys, self._tokens):
+                score = len(tokens & kt) / len(tokens | kt) if tokens | kt else 0.0
+                if score > best_score:
+                    best, best_score = k, score
+            if best_score < self.TOKEN_CUTOFF:
+                best = None
+        return self.items[self._table[best]] if best is not None else None
+
+    def resolve(self, item_name) -> Optional[int]:
+        key = _normalize(item_name)
+        if not key:
+            return None
+        return self._table.get(key)
+
+    def resolve_many(self, names: Iterable) -> np.ndarray:
+        """Indeks baris untuk satu kolom nama sekaligus (-1 = tidak dikenal)"""
+        names = list(names)
+        memo = {}
+        out = np.full(len(names), -1, dtype=np.int64)
+        for pos, name in enumerate(names):
+            if name not in memo:
+                idx = self.resolve(name)
+                memo[name] = -1 if idx is None else idx
+            out[pos] = memo[name]
+        return out
+
+@lru_cache(maxsize=16)
+def get_item_resolver(items: tuple) -> ItemResolver:
+    """Resolver per daftar item (mis. per versi layout template), dibuat sekali"""
+    return ItemResolver(items)
+
+# === Layout template ===
+# Posisi sel dibaca dari template (named range), bukan di-hardcode. Named range
+# milik tab template dikenali dari akhiran namanya, mis. "Vendor_IDENTITAS":
+#   IDENTITAS (6 baris: Pekerjaan..Vendor), ITEM_NAMA (nama item per baris),
+#   VOLUME (kolom volume), HARGA (harga satuan + total per baris, opsional),
+#   TOTAL (Subtotal/PPN/Total, opsional; keduanya wajib untuk values mode).
+# Template tanpa named range memakai DEFAULT_LAYOUT_RANGES. Default itu tidak
+# punya HARGA/TOTAL: sel harga/total hanya ditulis ke range yang dinamai jelas
+# di template, bukan ke sel tebakan. Layout di-cache di shared_cache dengan
+# version stamp (hash isinya) dan divalidasi sebelum dipakai.
+LAYOUT_KEYS = ("IDENTITAS", "ITEM_NAMA", "VOLUME", "HARGA", "TOTAL")
+DEFAULT_LAYOUT_RANGES = {
+    "IDENTITAS": "C3:C8",
+    "ITEM_NAMA": "B14:B26",
+    "VOLUME": "C14:C26",
+}
+_N_IDENTITAS = 6
+LAYOUT_TTL = 6 * 3600
+
+_col_letter = sheet_columns.col_letter
+
+def _grid_to_a1(grid: dict) -> str:
+    """GridRange named range (0-based, end eksklusif) -> 'C14:C26'"""
+    r1, r2 = grid.get("startRowIndex", 0) + 1, grid.get("endRowIndex", 1)
+    c1, c2 = grid.get("startColumnIndex", 0) + 1, grid.get("endColumnIndex", 1)
+    return f"{_col_letter(c1)}{r1}:{_col_letter(c2)}{r2}"
+
+def _a1_size(a1: str) -> tuple:
+    """'D14:E26' -> (13 baris, 2 kolom)"""
+    m = re.match(r"^([A-Z]+)(\d+):([A-Z]+)(\d+)$", a1)
+    if not m:
+        return (0, 0)
+    def col(letters):
+        n = 0
+        for ch in letters:
+            n = n * 26 + ord(ch) - 64
+        return n
+    return (int(m.group(4)) - int(m.group(2)) + 1, col(m.group(3)) - col(m.group(1)) + 1)
+
+def _validate_layout(layout: dict) -> List[str]:
+    errors = []
+    ranges = layout["ranges"]
+    n_items = len(layout["items"])
+    if _a1_size(ranges["IDENTITAS"]) != (_N_IDENTITAS, 1):
+        errors.append(f"IDENTITAS {ranges['IDENTITAS']} harus {_N_IDENTITAS} baris x 1 kolom")
+    if n_items == 0:
+        errors.append(f"ITEM_NAMA {ranges['ITEM_NAMA']} kosong")
+    if _a1_size(ranges["VOLUME"]) != (n_items, 1):
+        errors.append(f"VOLUME {ranges['VOLUME']} harus {n_items} baris x 1 kolom (sesuai jumlah item)")
+    if ranges.get("HARGA") and _a1_size(ranges["HARGA"]) != (n_items, 2):
+        errors.append(f"HARGA {ranges['HARGA']} harus {n_items} baris x 2 kolom")
+    if ranges.get("TOTAL") and _a1_size(ranges["TOTAL"]) != (3, 1):
+        errors.append(f"TOTAL {ranges['TOTAL']} harus 3 baris x 1 kolom (Subtotal, PPN, Total)")
+    for i, name in enumerate(layout["items"]):
+        if not _normalize(name):
+            errors.append(f"Nama item baris ke-{i + 1} kosong")
+    return errors
+
+def _read_template_layout(sh, template_title: str) -> dict:
+    ws = get_worksheet(sh, title=template_title)
+    if ws is None:
+        raise RuntimeError(f"Template '{template_title}' tidak ditemukan!")
+    
+    with tracing.span("sheets.list_named_ranges"):
+        named = sh.list_named_ranges()
+    ranges = {}
+    for nr in named:
+        grid = nr.get("range", {})
+        if str(grid.get("sheetId", 0)) != str(ws.id):
+            continue
+        name = str(nr.get("name", "")).upper()
+        for key in LAYOUT_KEYS:
+            if name == key or name.endswith("_" + key):
+                ranges[key] = _grid_to_a1(grid)
+    source = "named_range" if ranges else "default"
+    if not ranges:
+        ranges = dict(DEFAULT_LAYOUT_RANGES)
+    for key in ("IDENTITAS", "ITEM_NAMA", "VOLUME"):
+        if key not in ranges:
+            raise RuntimeError(f"Named range {key} untuk '{template_title}' tidak ditemukan")
+    
+    with tracing.span("sheets.values_get") as sp:
+        item_values = sh.values_get(sheet_columns.a1_range(template_title, ranges['ITEM_NAMA'])).get("values", [])
+        sp.bytes_in = tracing.payload_size(item_values)
+    n_rows = _a1_size(ranges["ITEM_NAMA"])[0]
+    items = [str(row[0]).strip() if row else "" for row in item_values]
+    items += [""] * (n_rows - len(items))
+    
+    layout = {
+        "template": template_title,
+        "sheet_id": ws.id,
+        "source": source,
+        "ranges": {k: ranges.get(k) for k in LAYOUT_KEYS},
+        "items": items,
+    }
+    layout["version"] = hashlib.sha1(
+        json.dumps([layout["sheet_id"], layout["ranges"], items], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:12]
+    layout["errors"] = _validate_layout(layout)
+    return layout
+
+def get_template_layout(spreadsheet_id: str, template_title: str, refresh: bool = False) -> dict:
+    """Layout template (cached bersama); refresh=True membaca ulang template"""
+    sh = open_spreadsheet(spreadsheet_id)
+    key = f"template_layout:{spreadsheet_id}:{template_title}"
+    previous = shared_cache.get(f"{key}:version")
+    layout = shared_cache.get_or_set(
+        key,
+        lambda: _read_template_layout(sh, template_title),
+        ttl=LAYOUT_TTL,
+        name="export.template_layout",
+        force=refresh,
+    )
+    if previous != layout["version"]:
+        if previous is not None:
+            tracing.record_event("export.template_layout_changed")
+        shared_cache.set(f"{key}:version", layout["version"])
+    return layout
+
+def check_template_layouts(spreadsheet_id: str, refresh: bool = False) -> List[str]:
+    """Cek layout kedua template (dipanggil saat halaman Proses dimuat); return daftar masalah"""
+    problems = []
+    for title in (TEMPLATE_VENDOR_TITLE, TEMPLATE_PELANGGAN_TITLE):
+        try:
+            layout = get_template_layout(spreadsheet_id, title, refresh=refresh)
+        except Exception as e:
+            problems.append(f"{title}: {e}")
+            continue
+        problems.extend(f"{title}: {err}" for err in layout["errors"])
+        if EXPORT_VALUES_MODE and not _has_value_ranges(layout):
+            problems.append(f"{title}: values mode butuh named range HARGA dan TOTAL di template")
+        known = get_item_resolver(tuple(HARGA_PELANGGAN))
+        unknown = [n for n in layout["items"] if n and known.resolve(n) is None]
+        if unknown:
+            problems.append(f"{title}: item tidak dikenal aplikasi: {', '.join(unknown)}")
+        for n in unknown:
+            candidate = known.suggest(n)
+            if candidate:
+                problems.append(f"{title}: item '{n}' mirip '{candidate}' tetapi tidak dipakai; tambahkan ke ALIASES bila memang sama")
+    return problems
+
+def _find_template_row_index(layout: dict, item_name: str) -> Optional[int]:
+    return get_item_resolver(tuple(layout["items"])).resolve(item_name)
+
+def volume_vector(layout: dict, df_pilih: Optional[pd.DataFrame]) -> np.ndarray:
+    """Kolom Rincian/Vol -> array volume per baris template (0 = kosong), sekali jalan"""
+    vol = np.zeros(len(layout["items"]), dtype=np.int64)
+    if df_pilih is None or df_pilih.empty or "Rincian" not in df_pilih.columns:
+        return vol
+    idx = get_item_resolver(tuple(layout["items"])).resolve_many(df_pilih["Rincian"].astype(str).str.strip())
+    if "Vol" in df_pilih.columns:
+        qty = pd.to_numeric(df_pilih["Vol"], errors="coerce").fillna(0).to_numpy()
+    else:
+        qty = np.zeros(len(df_pilih))
+    qty = qty.astype(np.int64)
+    mask = (idx >= 0) & (qty > 0)
+    # baris duplikat: nilai terakhir yang menang (sama seperti sebelumnya)
+    vol[idx[mask]] = qty[mask]
+    return vol
+
+def _to_sheet_values(grid: List[List[Optional[Any]]]) -> List[List[Any]]:
+    out: List[List[Any]] = []
+    for row in grid:
+        v = row[0] if row else None
+        out.append(["" if v is None else v])
+    return out
+
+@tracing.traced("export.update_tanggal_survey")
+def update_tanggal_survey(spreadsheet_id: str, gid: str, idpel: str) -> dict:
+    try:
+        now = now_jakarta()
+        sh = open_spreadsheet(spreadsheet_id)
+        target_ws = get_worksheet(sh, gid=gid)
+        
+        if target_ws is None:
+            return {"success": False, "message": "Worksheet dengan GID tidak ditemukan", "row": 0, "col": 0}
+        
+        with idpel_lease(spreadsheet_id, gid, idpel):
+            matched_row_index, tanggal_survey_col, error = locate_cell(
+                target_ws, spreadsheet_id, gid, idpel, "tanggal_survey"
+            )
+            if error:
+                return {"success": False, "message": error, "row": 0, "col": 0}
+            
+            timestamp_str = now.strftime("%d/%m/%Y %H:%M:%S")
+            with own_write(spreadsheet_id, gid), tracing.span("sheets.update_cell", payload=timestamp_str):
+                target_ws.update_cell(matched_row_index, tanggal_survey_col, timestamp_str)
+            record_local_write(spreadsheet_id, gid, idpel, sheet_columns.label("tanggal_survey"), timestamp_str)
+        
+        return {
+            "success": True,
+            "message": f"Berhasil update row {matched_row_index}, col {tanggal_survey_col} dengan waktu WIB: {timestamp_str}",
+            "row": matched_row_index,
+            "col": tanggal_survey_col
+        }
+    except shared_cache.LeaseTimeout:
+        return {"success": False, "message": f"Error: timeout - ID Pelanggan {idpel} sedang diperbarui proses lain", "row": 0, "col": 0}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}", "row": 0, "col": 0}
+
+def _canonical_items(items: Sequence[str], harga: dict) -> List[str]:
+    """Nama item template -> kunci daftar harga (lewat resolver yang sama)"""
+    names = tuple(harga)
+    idx = get_item_resolver(names).resolve_many(items)
+    return [names[i] if i >= 0 else item for item, i in zip(items, idx)]
+
+def _has_value_ranges(layout: dict) -> bool:
+    return bool(layout["ranges"].get("HARGA") and layout["ranges"].get("TOTAL"))
+
+def _build_payload(
+    layout: dict,
+    sheet_title: str,
+    meta: dict,
+    df_pilih: pd.DataFrame,
+    harga: Optional[dict] = None,
+    values_mode: bool = False,
+) -> dict:
+    """Body values_batch_update untuk satu tab rekap (+ angka harga bila values_mode)"""
+    ranges = layout["ranges"]
+    n_items = len(layout["items"])
+    
+    # Identitas
+    identitas = [
+        [meta.get("Pekerjaan", "-")],
+        [meta.get("Nama", "-")],
+        [meta.get("Lokasi", "-")],
+        [meta.get("ULP", "-")],
+        [meta.get("No SPK", "-")],
+        [meta.get("Vendor", "-")],
+    ]
+    
+    # Volume per baris item (satu kali resolve untuk seluruh kolom)
+    vol = volume_vector(layout, df_pilih)
+    vol_values: List[List[Optional[int]]] = [[int(q) if q > 0 else None] for q in vol]
+    
+    data = [
+        {"range": sheet_columns.a1_range(sheet_title, ranges['IDENTITAS']), "values": identitas},
+        {"range": sheet_columns.a1_range(sheet_title, ranges['VOLUME']), "values": _to_sheet_values(vol_values)},
+    ]
+    
+    if values_mode:
+        if not _has_value_ranges(layout):
+            raise RuntimeError(f"Template '{layout['template']}' tidak punya range HARGA/TOTAL untuk values mode")
+        items = _canonical_items(layout["items"], harga or {})
+        rekap = hitung_rekap(items, [v[0] for v in vol_values], harga or {})
+        data.append({
+            "range": sheet_columns.a1_range(sheet_title, ranges['HARGA']),
+            "values": [[u, t] for u, t in zip(rekap["unit"], rekap["line_total"])],
+        })
+        data.append({
+            "range": sheet_columns.a1_range(sheet_title, ranges['TOTAL']),
+            "values": [[rekap["subtotal"]], [rekap["ppn"]], [rekap["total"]]],
+        })
+    
+    return {"valueInputOption": "USER_ENTERED", "data": data}
+
+def _retitle_payload(payload: dict, sheet_title: str) -> dict:
+    """Payload yang sama dengan nama tab lain (range tetap, hanya prefiks judul)"""
+    return {
+        **payload,
+        "data": [
+            {**item, "range": sheet_columns.a1_range(sheet_title, item["range"].rsplit("!", 1)[1])}
+            for item in payload["data"]
+        ],
+    }
+
+# === Model preview ===
+# Dialog preview Proses dirender ulang pada setiap interaksi. Harga Vendor &
+# Pelanggan, subtotal/PPN/total dan payload export dihitung sekali per
+# (IDPEL, vektor volume, meta) lalu disimpan di shared_cache. Konfirmasi export
+# mengirim payload yang sama persis (lewat antrean outbox) ke export_rekap_to_sheet.
+PREVIEW_TTL = 900
+_PREVIEW_TITLE = "PREVIEW"
+_PREVIEW_COLUMNS = ["Rincian", "SAT", "Vol", "Harga Satuan Material", "Harga Total"]
+
+def preview_key(spreadsheet_id: str, idpel: str, df_pilih: pd.DataFrame, meta: dict, values_mode: bool) -> str:
+    qty = []
+    if df_pilih is not None and not df_pilih.empty:
+        vols = pd.to_numeric(df_pilih.get("Vol", 0), errors="coerce").fillna(0).astype(int).tolist()
+        qty = list(zip(df_pilih["Rincian"].astype(str).tolist(), vols))
+    raw = json.dumps([spreadsheet_id, str(idpel), qty, meta, bool(values_mode)], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _preview_side(spreadsheet_id: str, df_pilih: pd.DataFrame, meta: dict, template_title: str,
+                  harga: dict, values_mode: bool) -> dict:
+    df = df_pilih.reindex(columns=_PREVIEW_COLUMNS)
+    names = df["Rincian"].astype(str).str.strip().tolist()
+    qty = pd.to_numeric(df["Vol"], errors="coerce").fillna(0).astype(int).tolist()
+    rekap = hitung_rekap(_canonical_items(names, harga), qty, harga)
+    df["Harga Satuan Material"] = rekap["unit"]
+    df["Harga Total"] = rekap["line_total"]
+    side = {
+        "rows": json.loads(df.to_json(orient="records")),
+        "subtotal": rekap["subtotal"],
+        "ppn": rekap["ppn"],
+        "total": rekap["total"],
+        "payload": None,
+        "layout_version": None,
+        "values_mode": values_mode,
+    }
+    try:
+        layout = get_template_layout(spreadsheet_id, template_title)
+        if not layout["errors"]:
+            side["payload"] = _build_payload(layout, _PREVIEW_TITLE, meta, df_pilih, harga, values_mode)
+            side["layout_version"] = layout["version"]
+    except Exception:
+        # preview tetap tampil; payload dibangun saat export
+        tracing.record_event("export.preview_payload_failed")
+    return side
+
+def prepare_rekap(
+    spreadsheet_id: str,
+    idpel: str,
+    df_pilih: pd.DataFrame,
+    meta: dict,
+    values_mode: Optional[bool] = None,
+) -> dict:
+    """Model preview (cached): {"key", "vendor": {...}, "pelanggan": {...}}.
+
+    Tiap sisi berisi rows, subtotal, ppn, total dan payload export siap kirim.
+    """
+    if values_mode is None:
+        values_mode = EXPORT_VALUES_MODE
+    key = preview_key(spreadsheet_id, idpel, df_pilih, meta, values_mode)
+    
+    def build():
+        return {
+            "key": key,
+            "vendor": _preview_side(spreadsheet_id, df_pilih, meta, TEMPLATE_VENDOR_TITLE, HARGA_VENDOR, values_mode),
+            "pelanggan": _preview_side(spreadsheet_id, df_pilih, meta, TEMPLATE_PELANGGAN_TITLE, HARGA_PELANGGAN, values_mode),
+        }
+    
+    return shared_cache.get_or_set(f"rekap_preview:{key}", build, ttl=PREVIEW_TTL, name="export.rekap_preview")
+
+@tracing.traced("export.export_rekap_to_sheet")
+def export_rekap_to_sheet(
+    spreadsheet_id: str,
+    sheet_title: str,
+    meta: dict,
+    df_pilih: pd.DataFrame,
+    template_title: str,
+    harga: Optional[dict] = None,
+    values_mode: Optional[bool] = None,
+    sh=None,
+    prepared: Optional[dict] = None,
+    new_sheet_id: Optional[int] = None,
+):
+    """Export rekap from template: Identitas + Volume, plus computed prices in values mode.
+
+    prepared: payload dari prepare_rekap (preview); dipakai apa adanya bila
+    versi layout & values mode masih sama, selain itu payload dibangun ulang.
+    new_sheet_id: sheetId tab baru (antrean outbox: tetap per job), None = dipilih API.
+    """
+    if values_mode is None:
+        values_mode = EXPORT_VALUES_MODE
+    if sh is None:
+        sh = open_spreadsheet(spreadsheet_id)
+    
+    # Layout template dari cache: tidak ada pembacaan template per export
+    try:
+        layout = get_template_layout(spreadsheet_id, template_title)
+    except RuntimeError as e:
+        all_sheets = [ws.title for ws in list_worksheets(sh)]
+        raise RuntimeError(f"{e}\nAvailable sheets: {', '.join(all_sheets)}")
+    if layout["errors"]:
+        # Template berubah: tolak export daripada menulis ke sel yang salah
+        raise RuntimeError(
+            f"Layout template '{template_title}' tidak valid (versi {layout['version']}): "
+            + "; ".join(layout["errors"])
+        )
+    if values_mode and not _has_value_ranges(layout):
+        # cek sebelum duplikat: jangan tinggalkan tab tanpa harga
+        raise RuntimeError(f"Template '{template_title}' tidak punya named range HARGA/TOTAL untuk values mode")
+    
+    template_id = layout["sheet_id"]
+    
+    # Duplicate template
+    dup_body = {
+        "requests": [{
+            "duplicateSheet": {
+                "sourceSheetId": template_id,
+                "insertSheetIndex": 0,
+                "newSheetName": sheet_title,
+            }
+        }]
+    }
+    if new_sheet_id is not None:
+        dup_body["requests"][0]["duplicateSheet"]["newSheetId"] = new_sheet_id
+    try:
+        with tracing.span("sheets.duplicateSheet", payload=dup_body):
+            dup_result = sh.batch_update(dup_body)
+    except Exception:
+        # sheetId template di cache bisa basi (template dibuat ulang)
+        shared_cache.delete(f"template_layout:{spreadsheet_id}:{template_title}")
+        raise
+    invalidate_worksheet_registry(spreadsheet_id)
+    new_sheet_id = dup_result["replies"][0]["duplicateSheet"]["properties"]["sheetId"]
+    
+    # Batch update: identitas + volume (+ harga & total di values mode) dalam satu request
+    if (prepared and prepared.get("payload") and prepared.get("layout_version") == layout["version"]
+            and prepared.get("values_mode") == values_mode):
+        tracing.record_event("export.prepared_payload_used")
+        payload = _retitle_payload(prepared["payload"], sheet_title)
+    else:
+        payload = _build_payload(layout, sheet_title, meta, df_pilih, harga, values_mode)
+    
+    try:
+        try:
+            with tracing.span("sheets.values_batch_update", payload=payload):
+                sh.values_batch_update(body=payload)
+        except Exception:
+            for item in payload["data"]:
+                tracing.record_retry("sheets.values_batch_update")
+                with tracing.span("sheets.values_update", payload=item["values"]):
+                    sh.values_update(
+                        item["range"],
+                        params={"valueInputOption": "USER_ENTERED"},
+                        body={"values": item["values"]},
+                    )
+    except Exception:
+        # jangan tinggalkan tab setengah terisi
+        _hapus_tab_by_id(sh, [new_sheet_id])
+        raise
+    
+    return {
+        "sheet_title": sheet_title,
+        "new_sheet_id": new_sheet_id,
+        "values_mode": values_mode,
+        "layout_version": layout["version"],
+    }
+
+def verify_values_mode(
+    spreadsheet_id: str,
+    df_pilih: pd.DataFrame,
+    template_title: str,
+    harga: dict,
+    tolerance: float = 0.01,
+) -> List[str]:
+    """Bandingkan angka values mode dengan hasil formula template.
+
+    Export mode formula ke tab sementara, baca nilai yang dihitung Sheets
+    (UNFORMATTED_VALUE) lalu hapus tabnya. Return daftar selisih (kosong = cocok).
+    Dipakai di bench/ terhadap stand-in lokal atau sekali terhadap spreadsheet uji.
+    """
+    title = f"VERIFY {template_title} {now_jakarta().strftime('%Y%m%d%H%M%S%f')}"
+    meta = {"Pekerjaan": "-", "Nama": "-", "Lokasi": "-", "ULP": "-", "No SPK": "-", "Vendor": "-"}
+    info = export_rekap_to_sheet(spreadsheet_id, title, meta, df_pilih, template_title, values_mode=False)
+    sh = open_spreadsheet(spreadsheet_id)
+    try:
+        layout = get_template_layout(spreadsheet_id, template_title)
+        expected = _build_payload(layout, title, meta, df_pilih, harga, values_mode=True)["data"][2:]
+        with tracing.span("sheets.values_batch_get"):
+            actual = sh.values_batch_get(
+                [item["range"] for item in expected],
+                params={"valueRenderOption": "UNFORMATTED_VALUE"},
+            )["valueRanges"]
+    finally:
+        with tracing.span("sheets.batch_update", payload=info):
+            sh.batch_update({"requests": [{"deleteSheet": {"sheetId": info["new_sheet_id"]}}]})
+        invalidate_worksheet_registry(spreadsheet_id)
+    
+    mismatches = []
+    for exp, act in zip(expected, actual):
+        act_values = act.get("values", [])
+        for r, exp_row in enumerate(exp["values"]):
+            act_row = act_values[r] if r < len(act_values) else []
+            for c, want in enumerate(exp_row):
+                got = act_row[c] if c < len(act_row) else 0
+                try:
+                    got_num = float(got or 0)
+                except (TypeError, ValueError):
+                    got_num = None
+                if got_num is None or abs(got_num - float(want)) > tolerance:
+                    mismatches.append(f"{exp['range']} baris {r + 1} kolom {c + 1}: values mode {want}, formula {got}")
+    return mismatches
+
+def _hapus_tab_by_id(sh, sheet_ids: List[int]) -> None:
+    """Best-effort: hapus tab berdasarkan sheetId dalam satu batch_update"""
+    if not sheet_ids:
+        return
+    body = {"requests": [{"deleteSheet": {"sheetId": sid}} for sid in sheet_ids]}
+    try:
+        with tracing.span("sheets.batch_update", payload=body):
+            sh.batch_update(body)
+    except Exception:
+        tracing.record_event("export.rollback_failed")
+    invalidate_worksheet_registry(sh.id)
+
+_RE_TITLE_SUFFIX = re.compile(r"^(.*?)(\s*-\s*\d{8}[_-]\d{4}_(?:Vendor|Pelanggan))$")
+
+def _with_suffix(title: str, n: int) -> str:
+    # sisipkan " (n)" sebelum timestamp agar judul tetap dikenali cleanup_old_rekap
+    m = _RE_TITLE_SUFFIX.match(title)
+    if m:
+        return f"{m.group(1)} ({n}){m.group(2)}"
+    return f"{title} ({n})"
+
+def _unique_titles(sh, titles: List[str]) -> List[str]:
+    """Judul yang belum dipakai; bila bentrok, semua judul diberi akhiran (n) yang sama"""
+    existing = {ws.title for ws in list_worksheets(sh)}
+    if not existing.intersection(titles):
+        return list(titles)
+    tracing.record_event("export.title_conflict")
+    n = 2
+    while existing.intersection(_with_suffix(t, n) for t in titles):
+        n += 1
+    return [_with_suffix(t, n) for t in titles]
+
+@tracing.traced("export.export_rekap_pair")
+def export_rekap_pair(
+    spreadsheet_id: str,
+    base_sheet_title_vendor: str,
+    base_sheet_title_pelanggan: str,
+    meta: dict,
+    df_pilih: pd.DataFrame,
+    idpel: Optional[str] = None,
+    gid: Optional[str] = None,
+    values_mode: Optional[bool] = None,
+    on_conflict: str = "rename",
+    prepared: Optional[dict] = None,
+    sheet_ids: Optional[Sequence[int]] = None,
+):
+    """Export Vendor + Pelanggan sheets with different templates.
+
+    Kedua tab dibuat bersamaan dengan satu handle spreadsheet. Bila salah satu
+    gagal, tab pasangannya dihapus (semua atau tidak sama sekali).
+    on_conflict="rename" memberi akhiran (n) bila judul sudah ada; "error"
+    membiarkan duplicateSheet gagal (dipakai antrean outbox bersama sheet_ids, yaitu
+    sheetId [Vendor, Pelanggan] yang tetap per job).
+    Export untuk IDPEL yang sama diserialkan (lease per IDPEL, juga dipakai
+    update Tanggal Survey); IDPEL berbeda tetap berjalan paralel.
+    """
+    lease = idpel_lease(spreadsheet_id, gid or "", idpel) if idpel is not None else nullcontext()
+    with lease:
+        return _export_rekap_pair(
+            spreadsheet_id, base_sheet_title_vendor, base_sheet_title_pelanggan, meta, df_pilih,
+            idpel, gid, values_mode, on_conflict, prepared, sheet_ids,
+        )
+
+def _export_rekap_pair(
+    spreadsheet_id, base_sheet_title_vendor, base_sheet_title_pelanggan, meta, df_pilih,
+    idpel, gid, values_mode, on_conflict, prepared, sheet_ids,
+):
+    sh = open_spreadsheet(spreadsheet_id)
+    titles = [base_sheet_title_vendor, base_sheet_title_pelanggan]
+    if on_conflict == "rename":
+        titles = _unique_titles(sh, titles)
+    
+    for t in titles:
+        shared_cache.set(_in_flight_key(spreadsheet_id, t), True, IN_FLIGHT_TTL)
+    try:
+        return _write_rekap_pair(
+            sh, spreadsheet_id, titles, meta, df_pilih, idpel, gid, values_mode, prepared, sheet_ids,
+        )
+    finally:
+        for t in titles:
+            shared_cache.delete(_in_flight_key(spreadsheet_id, t))
+
+def _write_rekap_pair(sh, spreadsheet_id, titles, meta, df_pilih, idpel, gid, values_mode, prepared, sheet_ids):
+    prepared = prepared or {}
+    sheet_ids = list(sheet_ids) if sheet_ids else [None, None]
+    jobs = [
+        (titles[0], TEMPLATE_VENDOR_TITLE, HARGA_VENDOR, prepared.get("vendor"), sheet_ids[0]),
+        (titles[1], TEMPLATE_PELANGGAN_TITLE, HARGA_PELANGGAN, prepared.get("pelanggan"), sheet_ids[1]),
+    ]
+    
+    def run(job):
+        title, template_title, harga, prepared_side, new_sheet_id = job
+        return export_rekap_to_sheet(
+            spreadsheet_id=spreadsheet_id,
+            sheet_title=title,
+            meta=meta,
+            df_pilih=df_pilih,
+            template_title=template_title,
+            harga=harga,
+            values_mode=values_mode,
+            sh=sh,
+            prepared=prepared_side,
+            new_sheet_id=new_sheet_id,
+        )
+    
+    results, errors = [None, None], [None, None]
+    if EXPORT_PARALLEL:
+        with ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="rekap") as pool:
+            futures = [pool.submit(run, job) for job in jobs]
+            for i, fut in enumerate(futures):
+                try:
+                    results[i] = fut.result()
+                except Exception as e:
+                    errors[i] = e
+    else:
+        for i, job in enumerate(jobs):
+            try:
+                results[i] = run(job)
+            except Exception as e:
+                errors[i] = e
+                break
+    
+    failed = next((e for e in errors if e is not None), None)
+    if failed is not None:
+        # rollback: tab yang sudah jadi ikut dihapus
+        _hapus_tab_by_id(sh, [r["new_sheet_id"] for r in results if r is not None])
+        tracing.record_event("export.pair_rolled_back")
+        raise failed
+    info_vendor, info_pelanggan = results
+    
+    if idpel is not None:
+        _catat_ledger(spreadsheet_id, idpel, meta, df_pilih, info_vendor, info_pelanggan)
+    
+    cleanup_old_rekap(sh, keep_latest=KEEP_LATEST_TABS)
+    
+    survey_result = {"success": False, "message": "Parameter tidak lengkap"}
+    if idpel is not None and gid is not None:
+        survey_result = update_tanggal_survey(spreadsheet_id, gid, idpel)
+    
+    return {
+        "vendor": info_vendor,
+        "pelanggan": info_pelanggan,
+        "survey_result": survey_result
+    }
+
+def rekap_totals(df_pilih: Optional[pd.DataFrame]) -> dict:
+    """Total (termasuk PPN) Vendor & Pelanggan untuk volume di df_pilih"""
+    if df_pilih is None or df_pilih.empty or "Rincian" not in df_pilih.columns:
+        return {"vendor": 0.0, "pelanggan": 0.0}
+    qty = pd.to_numeric(df_pilih.get("Vol", 0), errors="coerce").fillna(0).astype(int).tolist()
+    names = df_pilih["Rincian"].astype(str).str.strip().tolist()
+    return {
+        "vendor": hitung_rekap(_canonical_items(names, HARGA_VENDOR), qty, HARGA_VENDOR)["total"],
+        "pelanggan": hitung_rekap(_canonical_items(names, HARGA_PELANGGAN), qty, HARGA_PELANGGAN)["total"],
+    }
+
+def _catat_ledger(spreadsheet_id, idpel, meta, df_pilih, info_vendor, info_pelanggan) -> None:
+    # ledger lokal tidak boleh menggagalkan export yang sudah jadi
+    try:
+        totals = rekap_totals(df_pilih)
+        rekap_ledger.record(
+            spreadsheet_id=spreadsheet_id,
+            idpel=idpel,
+            title_vendor=info_vendor["sheet_title"],
+            title_pelanggan=info_pelanggan["sheet_title"],
+            meta=meta,
+            items=json.loads(df_pilih.to_json(orient="records")) if df_pilih is not None else [],
+            total_vendor=totals["vendor"],
+            total_pelanggan=totals["pelanggan"],
+            sheet_id_vendor=info_vendor["new_sheet_id"],
+            sheet_id_pelanggan=info_pelanggan["new_sheet_id"],
+            values_mode=info_vendor["values_mode"],
+        )
+    except Exception:
+        tracing.record_event("export.ledger_write_failed")
+
+def _job_sheet_ids(idem_key: str) -> List[int]:
+    """sheetId [Vendor, Pelanggan] yang tetap per job antrean (diturunkan dari idem key)"""
+    ids = []
+    for side in ("vendor", "pelanggan"):
+        digest = hashlib.sha1(f"{idem_key}:{side}".encode("utf-8")).digest()
+        ids.append((int.from_bytes(digest[:4], "big") & 0x7FFFFFFF) or 1)
+    return ids
+
+def _hapus_tab_job(spreadsheet_id: str, sheet_ids: List[int]) -> None:
+    """Hapus tab sisa percobaan job ini saja (dikenali dari sheetId-nya)"""
+    sh = open_spreadsheet(spreadsheet_id)
+    own = [ws.id for ws in list_worksheets(sh, refresh=True) if ws.id in sheet_ids]
+    if own:
+        tracing.record_event("export.job_leftover_deleted")
+    _hapus_tab_by_id(sh, own)
+
+def _handle_rekap_export(payload: dict, blob_path: Optional[str]) -> dict:
+    """Handler antrean outbox untuk 'rekap_export' (idempotent per job lewat sheetId tetap)"""
+    sheet_ids = _job_sheet_ids(payload["idem_key"])
+    kwargs = dict(
+        spreadsheet_id=payload["spreadsheet_id"],
+        base_sheet_title_vendor=payload["title_vendor"],
+        base_sheet_title_pelanggan=payload["title_pelanggan"],
+        meta=payload["meta"],
+        df_pilih=pd.DataFrame(payload["df_pilih"]),
+        idpel=payload.get("idpel"),
+        gid=payload.get("gid"),
+        on_conflict="error",
+        values_mode=payload.get("values_mode"),
+        prepared=payload.get("prepared"),
+        sheet_ids=sheet_ids,
+    )
+    # Gagal biasa sudah di-rollback export_rekap_pair (hapus tab yang dibuatnya, per sheetId)
+    try:
+        return export_rekap_pair(**kwargs)
+    except Exception as e:
+        if "already exists" not in str(e):
+            raise
+    # Judul/sheetId sudah dipakai: tab bersheetId job ini adalah sisa percobaan yang
+    # terputus (proses mati) dan dihapus. Tab export lain dengan judul sama (nama
+    # pelanggan sama di menit yang sama) tidak disentuh; judul job ini diberi akhiran (n).
+    _hapus_tab_job(payload["spreadsheet_id"], sheet_ids)
+    kwargs["on_conflict"] = "rename"
+    return export_rekap_pair(**kwargs)
+
+outbox.register_handler("rekap_export", _handle_rekap_export)
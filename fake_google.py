@@ -0,0 +1,932 @@
+# fake_google.py - Stand-in lokal untuk subset gspread & Drive v3 yang dipakai aplikasi
+#
+# Dipakai oleh bench/ untuk mengukur alur Proses/Eksekusi/Data Pelanggan tanpa
+# akses Google. Setiap panggilan yang di Google berarti satu HTTP request dihitung
+# sebagai satu round-trip, bisa diberi latensi buatan dan error kuota (429).
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+FOLDER_MIME = "application/vnd.google-apps.folder"
+SPREADSHEET_MIME = "application/vnd.google-apps.spreadsheet"
+
+PELANGGAN_HEADER = [
+    "Timestamp",
+    "ID Pelanggan",
+    "Nama",
+    "Alamat kWH Meter",
+    "Tarif / Daya",
+    "Foto KTP",
+    "Tanggal Survey",
+    "TanggalEksekusi",
+]
+
+# Baris item template (B14:B26 di Template Vendor/Pelanggan)
+TEMPLATE_ITEMS = [
+    "Jasa Kegiatan Geser APP",
+    "Jasa Kegiatan Geser Perubahan Situasi SR",
+    "Service wedge clamp 2/4 x 6/10 mm",
+    "Strainhook / ekor babi",
+    "Imundex klem",
+    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover",
+    "Paku Beton",
+    "Pole Bracket 3-9\"",
+    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover",
+    "Segel Plastik",
+    "Twisted Cable 2 x 10 mm² - Al",
+    "Asuransi",
+    "Twisted Cable 2x10 mm² - Al",
+]
+
+
+class QuotaExceeded(Exception):
+    """Meniru APIError 429 'Quota exceeded' dari Google."""
+
+    status_code = 429
+
+    def __init__(self, op: str):
+        super().__init__(f"APIError: [429]: Quota exceeded for quota metric '{op}'")
+        self.op = op
+
+
+class FakeAPIError(Exception):
+    """Error 4xx non-kuota (mis. nama sheet sudah ada, range tidak valid)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"APIError: [{code}]: {message}")
+        self.status_code = code
+
+
+# === A1 notation ===
+_RE_A1_CELL = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def col_to_letter(col: int) -> str:
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def letter_to_col(letters: str) -> int:
+    col = 0
+    for ch in letters.upper():
+        col = col * 26 + (ord(ch) - 64)
+    return col
+
+
+def split_range(range_name: str) -> Tuple[Optional[str], str]:
+    """"'Sheet 1'!A1:B2" -> ("Sheet 1", "A1:B2")"""
+    if "!" not in range_name:
+        return None, range_name
+    title, cells = range_name.rsplit("!", 1)
+    if title.startswith("'") and title.endswith("'"):
+        quoted = title[1:-1]
+        if "'" in quoted.replace("''", ""):
+            # seperti Sheets: kutip tunggal di judul harus digandakan
+            raise FakeAPIError(400, f"Unable to parse range: {range_name}")
+        title = quoted.replace("''", "'")
+    return title, cells
+
+
+def parse_a1(cells: str) -> Tuple[int, int, Optional[int], Optional[int]]:
+    """'C3:C8' -> (3, 3, 8, 3); batas yang terbuka ('A2:H') -> None."""
+    parts = cells.split(":")
+    m1 = _RE_A1_CELL.match(parts[0])
+    if not m1:
+        raise FakeAPIError(400, f"Unable to parse range: {cells}")
+    c1 = letter_to_col(m1.group(1)) if m1.group(1) else 1
+    r1 = int(m1.group(2)) if m1.group(2) else 1
+    if len(parts) == 1:
+        return r1, c1, r1, c1
+    m2 = _RE_A1_CELL.match(parts[1])
+    if not m2:
+        raise FakeAPIError(400, f"Unable to parse range: {cells}")
+    c2 = letter_to_col(m2.group(1)) if m2.group(1) else None
+    r2 = int(m2.group(2)) if m2.group(2) else None
+    return r1, c1, r2, c2
+
+
+# === Formula sederhana (cukup untuk template rekap) ===
+_RE_SUM = re.compile(r"SUM\(\s*([A-Za-z]+\d+)\s*:\s*([A-Za-z]+\d+)\s*\)", re.IGNORECASE)
+_RE_REF = re.compile(r"\b([A-Za-z]+)(\d+)\b")
+_RE_PCT = re.compile(r"(\d+(?:\.\d+)?)%")
+_RE_ARITH = re.compile(r"[\d\s.+\-*/()eE]*")
+
+
+def _evaluate_formula(tab: "_Tab", expr: str) -> Any:
+    """Hitung formula berisi angka, referensi sel, SUM(A1:B2), + - * / dan persen.
+
+    Formula lain mengembalikan "#NAME?" seperti Sheets untuk fungsi yang tidak dikenal.
+    """
+    def sum_range(m: "re.Match") -> str:
+        r1, c1, r2, c2 = parse_a1(f"{m.group(1)}:{m.group(2)}")
+        return repr(sum(tab.number_at(r, c) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1)))
+
+    expr = _RE_SUM.sub(sum_range, expr)
+    expr = _RE_REF.sub(lambda m: repr(tab.number_at(int(m.group(2)), letter_to_col(m.group(1)))), expr)
+    expr = _RE_PCT.sub(r"(\1/100)", expr)
+    if not _RE_ARITH.fullmatch(expr):
+        return "#NAME?"
+    try:
+        result = eval(expr, {"__builtins__": {}}, {})  # hanya angka & operator (dicek di atas)
+    except ZeroDivisionError:
+        return "#DIV/0!"
+    except SyntaxError:
+        return "#ERROR!"
+    return int(result) if float(result).is_integer() else result
+
+
+def _numericise(v: Any) -> Any:
+    """Seperti gspread.utils.numericise (default get_all_records)."""
+    if isinstance(v, str) and v:
+        try:
+            return int(v)
+        except ValueError:
+            try:
+                return float(v)
+            except ValueError:
+                return v
+    return v
+
+
+# === Backend ===
+class FakeBackend:
+    """Penyimpanan bersama untuk spreadsheet & Drive palsu + statistik round-trip."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        quota_error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        upload_drop_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.quota_error_rate = quota_error_rate
+        self.upload_drop_rate = upload_drop_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self.calls: Counter = Counter()
+        self.quota_errors = 0
+        self.spreadsheets: Dict[str, "_SpreadsheetData"] = {}
+        self.files: Dict[str, dict] = {}
+        self.upload_sessions: Dict[str, dict] = {}
+        self.bytes_received = 0
+        self._watchers: List[Any] = []
+
+    # -- statistik --
+    @property
+    def round_trips(self) -> int:
+        return sum(self.calls.values())
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.quota_errors = 0
+            self.bytes_received = 0
+
+    def _call(self, op: str) -> None:
+        with self._lock:
+            self.calls[op] += 1
+            fail = self.quota_error_rate > 0 and self._rng.random() < self.quota_error_rate
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            if fail:
+                self.quota_errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise QuotaExceeded(op)
+
+    # -- notifikasi perubahan (stub push notification Drive files.watch) --
+    def watch(self, callback) -> None:
+        """callback(file_id, version) dipanggil setiap spreadsheet berubah"""
+        self._watchers.append(callback)
+
+    def _changed(self, key: str) -> None:
+        with self._lock:
+            data = self.spreadsheets[key]
+            data.version += 1
+            data.modified_time = datetime.now(tz=timezone.utc).isoformat()
+            version = data.version
+        for callback in list(self._watchers):
+            callback(key, str(version))
+
+    def _file_changed(self, file_id: str) -> None:
+        """Hook setelah file Drive dibuat/diubah/dihapus (local_backend menyimpannya ke disk)"""
+
+    # -- entry point seperti gspread.authorize(...) / build('drive', 'v3', ...) --
+    def client(self) -> "FakeClient":
+        return FakeClient(self)
+
+    def drive_service(self) -> "FakeDriveService":
+        return FakeDriveService(self)
+
+    # -- seeding --
+    def create_spreadsheet(self, title: str, tabs: Dict[str, List[List[Any]]], key: Optional[str] = None) -> str:
+        key = key or uuid.uuid4().hex
+        data = _SpreadsheetData(key, title)
+        for title_, values in tabs.items():
+            data.add_tab(title_, values)
+        with self._lock:
+            self.spreadsheets[key] = data
+        return key
+
+    def create_folder(self, name: str, parent: Optional[str] = None) -> str:
+        meta = {"name": name, "mimeType": FOLDER_MIME, "parents": [parent] if parent else []}
+        return self._insert_file(meta, b"")["id"]
+
+    def _insert_file(self, metadata: dict, content: bytes) -> dict:
+        now = datetime.now(tz=timezone.utc).isoformat()
+        with self._lock:
+            file_id = uuid.uuid4().hex[:28]
+            rec = {
+                "id": file_id,
+                "name": metadata.get("name", "Untitled"),
+                "mimeType": metadata.get("mimeType", "application/octet-stream"),
+                "parents": list(metadata.get("parents", [])),
+                "appProperties": dict(metadata.get("appProperties", {}) or {}),
+                "trashed": False,
+                "createdTime": now,
+                "modifiedTime": now,
+                "version": "1",
+                "size": str(len(content)),
+                "webViewLink": f"https://drive.local/file/d/{file_id}/view",
+                "_content": content,
+            }
+            self.files[file_id] = rec
+        self._file_changed(file_id)
+        return rec
+
+
+class _Tab:
+    def __init__(self, sheet_id: int, title: str, index: int, values: List[List[Any]]):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.index = index
+        self.values = [list(r) for r in values]
+
+    @property
+    def properties(self) -> dict:
+        rows = max(len(self.values), 1000)
+        cols = max((len(r) for r in self.values), default=0)
+        return {
+            "sheetId": self.sheet_id,
+            "title": self.title,
+            "index": self.index,
+            "gridProperties": {"rowCount": rows, "columnCount": max(cols, 26)},
+        }
+
+    def _render(self, v: Any, render: str) -> Any:
+        if v is None:
+            return ""
+        if render != "FORMULA" and isinstance(v, str) and v.startswith("="):
+            return _evaluate_formula(self, v[1:])
+        return v
+
+    def number_at(self, r: int, c: int) -> float:
+        """Nilai numerik sel (formula dihitung, teks/kosong = 0) untuk formula."""
+        if r - 1 >= len(self.values) or c - 1 >= len(self.values[r - 1]):
+            return 0
+        v = self._render(self.values[r - 1][c - 1], "UNFORMATTED_VALUE")
+        if isinstance(v, (int, float)):
+            return v
+        try:
+            return float(str(v).replace(",", ""))
+        except ValueError:
+            return 0
+
+    def read(self, r1: int, c1: int, r2: Optional[int], c2: Optional[int],
+             render: str = "FORMATTED_VALUE") -> List[List[Any]]:
+        last_row = len(self.values) if r2 is None else min(r2, len(self.values))
+        out = []
+        for r in range(r1, last_row + 1):
+            row = self.values[r - 1]
+            end = len(row) if c2 is None else min(c2, len(row))
+            out.append([self._render(v, render) for v in row[c1 - 1:end]])
+        # seperti API: buang baris & sel kosong di ujung
+        for row in out:
+            while row and row[-1] in ("", None):
+                row.pop()
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def write(self, r1: int, c1: int, values: List[List[Any]]) -> None:
+        for i, row_vals in enumerate(values):
+            r = r1 + i
+            while len(self.values) < r:
+                self.values.append([])
+            row = self.values[r - 1]
+            for j, v in enumerate(row_vals):
+                c = c1 + j
+                while len(row) < c:
+                    row.append("")
+                row[c - 1] = v
+
+
+class _SpreadsheetData:
+    def __init__(self, key: str, title: str):
+        self.key = key
+        self.title = title
+        self.tabs: List[_Tab] = []
+        self.named_ranges: List[dict] = []
+        self._next_id = 0
+        self.version = 1
+        self.modified_time = datetime.now(tz=timezone.utc).isoformat()
+
+    def add_tab(self, title: str, values: List[List[Any]], index: Optional[int] = None, sheet_id: Optional[int] = None) -> _Tab:
+        if any(t.title == title for t in self.tabs):
+            raise FakeAPIError(400, f'A sheet with the name "{title}" already exists. Please enter another name.')
+        if sheet_id is not None and any(t.sheet_id == sheet_id for t in self.tabs):
+            raise FakeAPIError(400, f"Invalid requests[0].duplicateSheet: Sheet with id {sheet_id} already exists.")
+        if sheet_id is None:
+            sheet_id = self._next_id
+            self._next_id += random.randint(1, 10_000_000)
+        tab = _Tab(sheet_id, title, 0, values)
+        pos = len(self.tabs) if index is None else max(0, min(index, len(self.tabs)))
+        self.tabs.insert(pos, tab)
+        self._reindex()
+        return tab
+
+    def _reindex(self) -> None:
+        for i, t in enumerate(self.tabs):
+            t.index = i
+
+    def tab_by_id(self, sheet_id: Any) -> _Tab:
+        for t in self.tabs:
+            if str(t.sheet_id) == str(sheet_id):
+                return t
+        raise FakeAPIError(400, f"No grid with id: {sheet_id}")
+
+    def tab_by_title(self, title: str) -> _Tab:
+        for t in self.tabs:
+            if t.title == title:
+                return t
+        raise FakeAPIError(400, f"Unable to parse range: '{title}'")
+
+
+# === gspread subset ===
+class FakeClient:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def open_by_key(self, key: str) -> "FakeSpreadsheet":
+        self.backend._call("sheets.open_by_key")
+        if key not in self.backend.spreadsheets:
+            raise FakeAPIError(404, f"Requested entity was not found: {key}")
+        return FakeSpreadsheet(self.backend, self.backend.spreadsheets[key])
+
+    def open(self, title: str) -> "FakeSpreadsheet":
+        self.backend._call("sheets.open")
+        for data in self.backend.spreadsheets.values():
+            if data.title == title:
+                return FakeSpreadsheet(self.backend, data)
+        raise FakeAPIError(404, f"Spreadsheet not found: {title}")
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend: FakeBackend, data: _SpreadsheetData):
+        self.backend = backend
+        self._data = data
+
+    @property
+    def id(self) -> str:
+        return self._data.key
+
+    @property
+    def title(self) -> str:
+        return self._data.title
+
+    def _ws(self, tab: _Tab) -> "FakeWorksheet":
+        return FakeWorksheet(self, tab)
+
+    def worksheets(self) -> List["FakeWorksheet"]:
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return [self._ws(t) for t in self._data.tabs]
+
+    def worksheet(self, title: str) -> "FakeWorksheet":
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return self._ws(self._data.tab_by_title(title))
+
+    def get_worksheet_by_id(self, sheet_id: Any) -> "FakeWorksheet":
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return self._ws(self._data.tab_by_id(sheet_id))
+
+    @property
+    def sheet1(self) -> "FakeWorksheet":
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return self._ws(self._data.tabs[0])
+
+    def worksheet_from_properties(self, properties: dict) -> "FakeWorksheet":
+        """Padanan gspread.Worksheet(sh, properties, ...): tanpa round-trip."""
+        with self.backend._lock:
+            return self._ws(self._data.tab_by_id(properties["sheetId"]))
+
+    def fetch_sheet_metadata(self, params: Optional[dict] = None) -> dict:
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return {
+                "spreadsheetId": self.id,
+                "properties": {"title": self.title},
+                "sheets": [{"properties": t.properties} for t in self._data.tabs],
+                "namedRanges": copy.deepcopy(self._data.named_ranges),
+            }
+
+    def list_named_ranges(self) -> List[dict]:
+        self.backend._call("sheets.fetch_metadata")
+        with self.backend._lock:
+            return copy.deepcopy(self._data.named_ranges)
+
+    def batch_update(self, body: dict) -> dict:
+        self.backend._call("sheets.batch_update")
+        replies = []
+        with self.backend._lock:
+            for req in body.get("requests", []):
+                if "duplicateSheet" in req:
+                    spec = req["duplicateSheet"]
+                    src = self._data.tab_by_id(spec["sourceSheetId"])
+                    new_title = spec.get("newSheetName") or f"Copy of {src.title}"
+                    tab = self._data.add_tab(
+                        new_title, src.values, index=spec.get("insertSheetIndex"), sheet_id=spec.get("newSheetId")
+                    )
+                    replies.append({"duplicateSheet": {"properties": tab.properties}})
+                elif "deleteSheet" in req:
+                    tab = self._data.tab_by_id(req["deleteSheet"]["sheetId"])
+                    self._data.tabs.remove(tab)
+                    self._data._reindex()
+                    replies.append({})
+                elif "updateSheetProperties" in req:
+                    props = req["updateSheetProperties"]["properties"]
+                    tab = self._data.tab_by_id(props["sheetId"])
+                    if "title" in props:
+                        tab.title = props["title"]
+                    replies.append({})
+                else:
+                    raise FakeAPIError(400, f"Request tidak didukung fake: {list(req)}")
+        self.backend._changed(self.id)
+        return {"spreadsheetId": self.id, "replies": replies}
+
+    def del_worksheet(self, worksheet: "FakeWorksheet") -> dict:
+        return self.batch_update({"requests": [{"deleteSheet": {"sheetId": worksheet.id}}]})
+
+    def _resolve(self, range_name: str) -> Tuple[_Tab, Tuple[int, int, Optional[int], Optional[int]]]:
+        title, cells = split_range(range_name)
+        tab = self._data.tab_by_title(title) if title else self._data.tabs[0]
+        return tab, parse_a1(cells)
+
+    def values_get(self, range: str, params: Optional[dict] = None) -> dict:
+        self.backend._call("sheets.values_get")
+        render = (params or {}).get("valueRenderOption", "FORMATTED_VALUE")
+        with self.backend._lock:
+            tab, (r1, c1, r2, c2) = self._resolve(range)
+            values = tab.read(r1, c1, r2, c2, render)
+        out = {"range": range, "majorDimension": "ROWS"}
+        if values:
+            out["values"] = values
+        return out
+
+    def values_batch_get(self, ranges: List[str], params: Optional[dict] = None) -> dict:
+        self.backend._call("sheets.values_batch_get")
+        render = (params or {}).get("valueRenderOption", "FORMATTED_VALUE")
+        result = []
+        with self.backend._lock:
+            for rng in ranges:
+                tab, (r1, c1, r2, c2) = self._resolve(rng)
+                vr = {"range": rng, "majorDimension": "ROWS"}
+                values = tab.read(r1, c1, r2, c2, render)
+                if values:
+                    vr["values"] = values
+                result.append(vr)
+        return {"spreadsheetId": self.id, "valueRanges": result}
+
+    def values_update(self, range: str, params: Optional[dict] = None, body: Optional[dict] = None) -> dict:
+        self.backend._call("sheets.values_update")
+        values = (body or {}).get("values", [])
+        with self.backend._lock:
+            tab, (r1, c1, _, _) = self._resolve(range)
+            tab.write(r1, c1, values)
+        self.backend._changed(self.id)
+        return {"updatedRange": range, "updatedCells": sum(len(r) for r in values)}
+
+    def values_batch_update(self, body: dict) -> dict:
+        self.backend._call("sheets.values_batch_update")
+        total = 0
+        with self.backend._lock:
+            for item in body.get("data", []):
+                tab, (r1, c1, _, _) = self._resolve(item["range"])
+                tab.write(r1, c1, item.get("values", []))
+                total += sum(len(r) for r in item.get("values", []))
+        self.backend._changed(self.id)
+        return {"spreadsheetId": self.id, "totalUpdatedCells": total}
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: FakeSpreadsheet, tab: _Tab):
+        self.spreadsheet = spreadsheet
+        self._tab = tab
+
+    @property
+    def backend(self) -> FakeBackend:
+        return self.spreadsheet.backend
+
+    @property
+    def id(self) -> int:
+        return self._tab.sheet_id
+
+    @property
+    def title(self) -> str:
+        return self._tab.title
+
+    @property
+    def index(self) -> int:
+        return self._tab.index
+
+    @property
+    def row_count(self) -> int:
+        return self._tab.properties["gridProperties"]["rowCount"]
+
+    @property
+    def col_count(self) -> int:
+        return self._tab.properties["gridProperties"]["columnCount"]
+
+    def get_all_values(self) -> List[List[Any]]:
+        self.backend._call("sheets.values_get")
+        with self.backend._lock:
+            values = self._tab.read(1, 1, None, None)
+        width = max((len(r) for r in values), default=0)
+        return [r + [""] * (width - len(r)) for r in values]
+
+    def get_all_records(self, head: int = 1) -> List[dict]:
+        values = self.get_all_values()
+        if len(values) < head:
+            return []
+        keys = values[head - 1]
+        return [dict(zip(keys, (_numericise(v) for v in row))) for row in values[head:]]
+
+    def row_values(self, row: int) -> List[Any]:
+        self.backend._call("sheets.values_get")
+        with self.backend._lock:
+            values = self._tab.read(row, 1, row, None)
+        return values[0] if values else []
+
+    def col_values(self, col: int) -> List[Any]:
+        self.backend._call("sheets.values_get")
+        with self.backend._lock:
+            values = self._tab.read(1, col, None, col)
+        return [r[0] if r else "" for r in values]
+
+    def update_cell(self, row: int, col: int, value: Any) -> dict:
+        self.backend._call("sheets.values_update")
+        with self.backend._lock:
+            self._tab.write(row, col, [[value]])
+        self.backend._changed(self.spreadsheet.id)
+        return {"updatedCells": 1}
+
+    def update(self, range_name: str, values: List[List[Any]], **kwargs) -> dict:
+        self.backend._call("sheets.values_update")
+        with self.backend._lock:
+            r1, c1, _, _ = parse_a1(range_name)
+            self._tab.write(r1, c1, values)
+        self.backend._changed(self.spreadsheet.id)
+        return {"updatedRange": range_name}
+
+    def batch_update(self, data: List[dict], **kwargs) -> dict:
+        self.backend._call("sheets.values_batch_update")
+        with self.backend._lock:
+            for item in data:
+                r1, c1, _, _ = parse_a1(split_range(item["range"])[1])
+                self._tab.write(r1, c1, item.get("values", []))
+        self.backend._changed(self.spreadsheet.id)
+        return {"totalUpdatedRanges": len(data)}
+
+    def append_row(self, values: List[Any], **kwargs) -> dict:
+        self.backend._call("sheets.values_append")
+        with self.backend._lock:
+            self._tab.values.append(list(values))
+        self.backend._changed(self.spreadsheet.id)
+        return {"updates": {"updatedRows": 1}}
+
+
+# === Drive v3 subset ===
+class _FakeRequest:
+    def __init__(self, backend: FakeBackend, op: str, fn):
+        self.backend = backend
+        self.op = op
+        self._fn = fn
+
+    def execute(self, num_retries: int = 0):
+        self.backend._call(self.op)
+        return self._fn()
+
+
+_RE_APP_PROP = re.compile(r"appProperties\s+has\s*\{\s*key\s*=\s*'([^']*)'\s+and\s+value\s*=\s*'([^']*)'\s*\}")
+_RE_CLAUSE = re.compile(r"^(name|mimeType|trashed)\s*(=|!=)\s*'?([^']*)'?$")
+_RE_PARENT = re.compile(r"^'([^']+)'\s+in\s+parents$")
+
+
+def _match_query(rec: dict, q: Optional[str]) -> bool:
+    if not q:
+        return not rec["trashed"]
+    for key, value in _RE_APP_PROP.findall(q):
+        if rec["appProperties"].get(key) != value:
+            return False
+    q = _RE_APP_PROP.sub("true", q)
+    for clause in (c.strip() for c in q.split(" and ")):
+        if clause in ("", "true"):
+            continue
+        m = _RE_PARENT.match(clause)
+        if m:
+            if m.group(1) not in rec["parents"]:
+                return False
+            continue
+        m = _RE_CLAUSE.match(clause)
+        if not m:
+            raise FakeAPIError(400, f"Invalid Value: q ({clause})")
+        field, op, value = m.groups()
+        actual = str(rec[field]).lower() if field == "trashed" else rec[field]
+        if (actual == value) != (op == "="):
+            return False
+    return True
+
+
+def _public(rec: dict) -> dict:
+    return {k: copy.deepcopy(v) for k, v in rec.items() if not k.startswith("_")}
+
+
+class _FakeFiles:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def list(self, q: Optional[str] = None, spaces: str = "drive", fields: Optional[str] = None,
+             pageSize: int = 100, pageToken: Optional[str] = None, **kwargs) -> _FakeRequest:
+        def run():
+            with self.backend._lock:
+                matched = [_public(r) for r in self.backend.files.values() if _match_query(r, q)]
+            start = int(pageToken or 0)
+            page = matched[start:start + pageSize]
+            out = {"files": page}
+            if start + pageSize < len(matched):
+                out["nextPageToken"] = str(start + pageSize)
+            return out
+        return _FakeRequest(self.backend, "drive.files.list", run)
+
+    def create(self, body: Optional[dict] = None, media_body: Any = None, fields: Optional[str] = None,
+               **kwargs) -> _FakeRequest:
+        if media_body is not None and getattr(media_body, "resumable", lambda: False)():
+            return _FakeUploadRequest(self.backend, dict(body or {}), media_body)
+
+        def run():
+            content = b""
+            if media_body is not None:
+                content = bytes(media_body.getbytes(0, media_body.size()))
+            meta = dict(body or {})
+            if media_body is not None and "mimeType" not in meta:
+                meta["mimeType"] = getattr(media_body, "mimetype", lambda: "application/octet-stream")()
+            return _public(self.backend._insert_file(meta, content))
+        return _FakeRequest(self.backend, "drive.files.create", run)
+
+    def get(self, fileId: str, fields: Optional[str] = None, **kwargs) -> _FakeRequest:
+        def run():
+            with self.backend._lock:
+                data = self.backend.spreadsheets.get(fileId)
+                if data is not None:
+                    return {"id": fileId, "name": data.title, "mimeType": SPREADSHEET_MIME,
+                            "version": str(data.version), "modifiedTime": data.modified_time}
+                if fileId not in self.backend.files:
+                    raise FakeAPIError(404, f"File not found: {fileId}")
+                return _public(self.backend.files[fileId])
+        return _FakeRequest(self.backend, "drive.files.get", run)
+
+    def update(self, fileId: str, body: Optional[dict] = None, **kwargs) -> _FakeRequest:
+        def run():
+            with self.backend._lock:
+                rec = self.backend.files[fileId]
+                for k, v in (body or {}).items():
+                    if k == "appProperties":
+                        rec["appProperties"].update(v)
+                    else:
+                        rec[k] = v
+                rec["version"] = str(int(rec["version"]) + 1)
+                rec["modifiedTime"] = datetime.now(tz=timezone.utc).isoformat()
+                out = _public(rec)
+            self.backend._file_changed(fileId)
+            return out
+        return _FakeRequest(self.backend, "drive.files.update", run)
+
+    def delete(self, fileId: str, **kwargs) -> _FakeRequest:
+        def run():
+            with self.backend._lock:
+                self.backend.files.pop(fileId, None)
+            self.backend._file_changed(fileId)
+            return ""
+        return _FakeRequest(self.backend, "drive.files.delete", run)
+
+
+class _FakeUploadProgress:
+    def __init__(self, received: int, total: int):
+        self.resumable_progress = received
+        self.total_size = total
+
+    def progress(self) -> float:
+        return self.resumable_progress / self.total_size if self.total_size else 1.0
+
+
+class _FakeHttpResponse(dict):
+    def __init__(self, status: int, headers: Optional[dict] = None):
+        super().__init__(headers or {})
+        self.status = status
+
+
+class _FakeHttp:
+    """Cukup untuk query status sesi upload (PUT 'Content-Range: bytes */N')."""
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def request(self, uri: str, method: str = "GET", body: Any = None, headers: Optional[dict] = None):
+        self.backend._call("drive.upload.status")
+        with self.backend._lock:
+            sess = self.backend.upload_sessions.get(uri)
+            if sess is None:
+                return _FakeHttpResponse(404), b""
+            if sess["file_id"] is not None:
+                return _FakeHttpResponse(200), json.dumps(_public(self.backend.files[sess["file_id"]])).encode()
+            received = len(sess["data"])
+        headers = {"range": f"bytes=0-{received - 1}"} if received else {}
+        return _FakeHttpResponse(308, headers), b""
+
+
+class _FakeUploadRequest:
+    """Upload resumable ala googleapiclient HttpRequest: next_chunk(), resumable_uri/progress.
+
+    Dengan upload_drop_rate > 0, koneksi putus di tengah potongan (Drive hanya
+    menerima sebagian) untuk meniru jaringan seluler yang tidak stabil.
+    """
+
+    def __init__(self, backend: FakeBackend, body: dict, media_body: Any):
+        self.backend = backend
+        self.body = body
+        self.media = media_body
+        self.resumable_uri: Optional[str] = None
+        self.resumable_progress = 0
+        self.http = _FakeHttp(backend)
+        self._in_error_state = False
+
+    def next_chunk(self, num_retries: int = 0):
+        size = self.media.size()
+        if self.resumable_uri is None:
+            self.backend._call("drive.upload.start")
+            self.resumable_uri = f"https://drive.local/upload/{uuid.uuid4().hex}"
+            with self.backend._lock:
+                self.backend.upload_sessions[self.resumable_uri] = {"data": bytearray(), "file_id": None}
+        if self._in_error_state:
+            resp, _ = self.http.request(self.resumable_uri, method="PUT")
+            if resp.status == 404:
+                raise FakeAPIError(404, "Upload session expired")
+            rng = resp.get("range")
+            self.resumable_progress = int(rng.rsplit("-", 1)[1]) + 1 if rng else 0
+            self._in_error_state = False
+
+        chunk = self.media.getbytes(self.resumable_progress, self.media.chunksize())
+        try:
+            self.backend._call("drive.upload.chunk")
+        except Exception:
+            self._in_error_state = True
+            raise
+        with self.backend._lock:
+            sess = self.backend.upload_sessions[self.resumable_uri]
+            drop = self._dropped()
+            accepted = chunk[: len(chunk) // 2] if drop else chunk
+            sess["data"] += accepted
+            self.backend.bytes_received += len(accepted)
+            self.resumable_progress = len(sess["data"])
+            if drop:
+                self._in_error_state = True
+                raise ConnectionError("Connection reset by peer (fake upload drop)")
+            if self.resumable_progress < size:
+                return _FakeUploadProgress(self.resumable_progress, size), None
+            rec = self.backend._insert_file(
+                {**self.body, "mimeType": self.body.get("mimeType") or self.media.mimetype()},
+                bytes(sess["data"]),
+            )
+            sess["file_id"] = rec["id"]
+            sess["data"] = bytearray()
+        return None, _public(rec)
+
+    def _dropped(self) -> bool:
+        rate = self.backend.upload_drop_rate
+        return rate > 0 and self.backend._rng.random() < rate
+
+    def execute(self, num_retries: int = 0):
+        response = None
+        while response is None:
+            _, response = self.next_chunk(num_retries=num_retries)
+        return response
+
+
+class FakeDriveService:
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+
+    def files(self) -> _FakeFiles:
+        return _FakeFiles(self.backend)
+
+
+# === Data dummy ===
+_NAMA_DEPAN = ["Sofia", "Budi", "Siti", "Agus", "Dewi", "Rizky", "Putri", "Andi", "Wahyu", "Rina", "Eko", "Lestari"]
+_NAMA_BELAKANG = ["Pratama", "Wijaya", "Santoso", "Hidayat", "Lestari", "Saputra", "Nugroho", "Kusuma", "Rahmawati"]
+_JALAN = ["Jl. Pandan", "Jl. Bendungan Sutami", "Jl. MT Haryono", "Jl. Soekarno Hatta", "Jl. Veteran", "Jl. Gajayana"]
+_DAYA = ["R1/450 VA", "R1/900 VA", "R1/1300 VA", "R1/2200 VA", "R2/3500 VA", "B1/5500 VA"]
+
+
+def make_pelanggan_rows(n: int, seed: int = 0) -> List[List[Any]]:
+    """Header + n baris form response yang menyerupai sheet pelanggan asli."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, 8, 0, 0)
+    rows: List[List[Any]] = [list(PELANGGAN_HEADER)]
+    for i in range(n):
+        ts = start + timedelta(minutes=7 * i + rng.randint(0, 6))
+        idpel = str(513100000000 + i * 7 + rng.randint(0, 6))
+        nama = f"{rng.choice(_NAMA_DEPAN)} {rng.choice(_NAMA_BELAKANG)}"
+        alamat = f"{rng.choice(_JALAN)} No.{rng.randint(1, 200)}, Malang"
+        foto = f"https://drive.google.com/open?id={uuid.UUID(int=rng.getrandbits(128)).hex[:28]}"
+        survey = (ts + timedelta(days=rng.randint(1, 5))).strftime("%d/%m/%Y %H:%M:%S") if rng.random() < 0.4 else ""
+        eksekusi = (ts + timedelta(days=rng.randint(6, 14))).strftime("%d/%m/%Y") if survey and rng.random() < 0.5 else ""
+        rows.append([ts.strftime("%d/%m/%Y %H:%M:%S"), idpel, nama, alamat, rng.choice(_DAYA), foto, survey, eksekusi])
+    return rows
+
+
+def make_template_rows(kind: str) -> List[List[Any]]:
+    """Kerangka Template Vendor/Pelanggan.
+
+    Identitas C3:C8, item B14:B26, volume C14:C26, harga satuan D14:D26,
+    formula total per baris E14:E26 dan Subtotal/PPN/Total di E27:E29.
+    """
+    from harga import HARGA_PELANGGAN, HARGA_VENDOR, PPN_RATE
+
+    harga = HARGA_VENDOR if kind.lower() == "vendor" else HARGA_PELANGGAN
+    rows: List[List[Any]] = [[""] for _ in range(30)]
+    rows[0] = ["", f"REKAP HARGA PEKERJAAN - {kind.upper()}"]
+    for i, label in enumerate(["PEKERJAAN", "NAMA", "LOKASI", "ULP", "NO SPK", "VENDOR PELAKSANA"]):
+        rows[2 + i] = ["", label, ""]
+    rows[12] = ["NO", "RINCIAN", "VOL", "HARGA SATUAN", "HARGA TOTAL"]
+    for i, item in enumerate(TEMPLATE_ITEMS):
+        r = 14 + i
+        rows[r - 1] = [i + 1, item, "", harga.get(item, 0), f"=C{r}*D{r}"]
+    last = 13 + len(TEMPLATE_ITEMS)
+    rows[last] = ["", "SUBTOTAL", "", "", f"=SUM(E14:E{last})"]
+    rows[last + 1] = ["", "PPN", "", "", f"=E{last + 1}*{round(PPN_RATE * 100)}%"]
+    rows[last + 2] = ["", "TOTAL BIAYA", "", "", f"=E{last + 1}+E{last + 2}"]
+    return rows
+
+
+def seed_workbook(backend: FakeBackend, n_rows: int, seed: int = 0,
+                  pelanggan_rows: Optional[List[List[Any]]] = None) -> dict:
+    """Buat spreadsheet pelanggan + template + folder Drive eksekusi; kembalikan ID-nya.
+
+    pelanggan_rows (header + baris, mis. dari CSV) menggantikan n_rows baris dummy.
+    """
+    key = backend.create_spreadsheet("Permohonan Geser Meter", {
+        "Form Responses 1": pelanggan_rows if pelanggan_rows is not None else make_pelanggan_rows(n_rows, seed),
+        "Template Vendor": make_template_rows("Vendor"),
+        "Template Pelanggan": make_template_rows("Pelanggan"),
+    })
+    data = backend.spreadsheets[key]
+    # Kedua template memakai named range (HARGA/TOTAL wajib untuk values mode);
+    # layout default tanpa named range diuji dengan menghapus named_ranges
+    last = 13 + len(TEMPLATE_ITEMS)
+    for kind in ("Vendor", "Pelanggan"):
+        sheet_id = data.tab_by_title(f"Template {kind}").sheet_id
+        for name, (r1, r2, c1, c2) in {
+            "IDENTITAS": (3, 8, 3, 3),
+            "ITEM_NAMA": (14, last, 2, 2),
+            "VOLUME": (14, last, 3, 3),
+            "HARGA": (14, last, 4, 5),
+            "TOTAL": (last + 1, last + 3, 5, 5),
+        }.items():
+            data.named_ranges.append({
+                "namedRangeId": uuid.uuid4().hex[:10],
+                "name": f"{kind}_{name}",
+                "range": {"sheetId": sheet_id, "startRowIndex": r1 - 1, "endRowIndex": r2,
+                          "startColumnIndex": c1 - 1, "endColumnIndex": c2},
+            })
+    root = backend.create_folder("Foto Eksekusi")
+    return {
+        "spreadsheet_id": key,
+        "gid": str(data.tabs[0].sheet_id),
+        "drive_folder_eksekusi": root,
+    }
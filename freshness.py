@@ -0,0 +1,299 @@
+# freshness.py - Sinyal perubahan sheet pelanggan (pengganti refetch TTL tetap)
+#
+# Snapshot pelanggan tidak lagi di-refetch penuh tiap 180 detik. Yang dicek
+# adalah sinyal murah:
+#   poll    - versi file Drive (files.get version/modifiedTime), fallback jumlah
+#             baris grid tab (metadata Sheets); dicek paling sering tiap
+#             FRESHNESS_POLL_INTERVAL detik, dibagi semua sesi & replika
+#   webhook - tanpa polling: receiver push notification (Drive files.watch atau
+#             POST dari Apps Script onFormSubmit) menaikkan penghitung di
+#             shared_cache lewat notify()
+#   ttl     - perilaku lama (refetch penuh tiap PELANGGAN_TTL)
+# Snapshot hanya dimuat ulang bila sinyal berubah (pelanggan.py: delta baris
+# baru bila bisa, penuh bila tidak). FRESHNESS_MAX_AGE tetap jadi batas atas
+# umur snapshot bila sinyal tidak pernah berubah / tidak tersedia. Jumlah baris
+# tidak berubah saat sel diedit, jadi dengan sinyal itu batasnya
+# FRESHNESS_ROWS_MAX_AGE (sama dengan TTL lama). Versi Drive yang naik karena
+# tulisan sel aplikasi sendiri diterima tanpa muat ulang, hanya di proses
+# penulisnya (pelanggan.own_write + fresh_signal).
+#
+# Receiver webhook berjalan sebagai proses terpisah (Streamlit tidak bisa
+# menerima POST):  python freshness.py --port 8765
+# Receiver menolak jalan tanpa FRESHNESS_WEBHOOK_TOKEN atau tanpa shared_cache
+# bersama (SHARED_CACHE_URL); app dengan mode webhook tanpa shared_cache
+# bersama memakai poll, karena push dari proses lain tidak akan pernah sampai.
+import argparse
+import hmac
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Mapping, Optional, Tuple
+
+import streamlit as st
+
+import shared_cache
+import tracing
+
+try:
+    FRESHNESS_MODE = str(st.secrets.get("FRESHNESS_MODE", "poll")).lower()
+    FRESHNESS_POLL_INTERVAL = float(st.secrets.get("FRESHNESS_POLL_INTERVAL", 15))
+    FRESHNESS_MAX_AGE = float(st.secrets.get("FRESHNESS_MAX_AGE", 1800))
+    FRESHNESS_ROWS_MAX_AGE = float(st.secrets.get("FRESHNESS_ROWS_MAX_AGE", 180))
+    FRESHNESS_WEBHOOK_TOKEN = str(st.secrets.get("FRESHNESS_WEBHOOK_TOKEN", ""))
+except Exception:
+    FRESHNESS_MODE = "poll"
+    FRESHNESS_POLL_INTERVAL = 15.0
+    FRESHNESS_MAX_AGE = 1800.0
+    FRESHNESS_ROWS_MAX_AGE = 180.0
+    FRESHNESS_WEBHOOK_TOKEN = ""
+
+CHANNEL_PREFIX = "geser-meter"
+PUSH_TTL = 7 * 24 * 3600
+
+_stub_attached = False
+
+
+def mode() -> str:
+    """Mode efektif; webhook hanya bila push bisa sampai (shared_cache bersama / stub lokal)"""
+    if FRESHNESS_MODE == "webhook" and not _stub_attached and _local_only():
+        tracing.record_event("freshness.webhook_without_shared_cache")
+        return "poll"
+    return FRESHNESS_MODE
+
+
+def _local_only() -> bool:
+    return isinstance(shared_cache.get_backend(), shared_cache.LocalCache)
+
+
+def enabled() -> bool:
+    return mode() in ("poll", "webhook")
+
+
+# === Sinyal poll ===
+def _drive_version(spreadsheet_id: str) -> Optional[str]:
+    from auth import drive_available, get_drive_service
+
+    if not drive_available():
+        return None
+    service = get_drive_service()
+    with tracing.span("drive.files.get", payload=spreadsheet_id):
+        meta = service.files().get(fileId=spreadsheet_id, fields="version,modifiedTime").execute()
+    version = meta.get("version") or meta.get("modifiedTime")
+    return f"drive:{version}" if version else None
+
+
+def grid_rows(spreadsheet_id: str, gid: str) -> Optional[int]:
+    """rowCount grid tab saat ini (metadata Sheets, tanpa cache registry)"""
+    from auth import open_spreadsheet
+
+    sh = open_spreadsheet(spreadsheet_id)
+    with tracing.span("sheets.fetch_metadata"):
+        metadata = sh.fetch_sheet_metadata(params={"fields": "sheets.properties(sheetId,gridProperties.rowCount)"})
+    for s in metadata.get("sheets", []):
+        props = s.get("properties", {})
+        if str(props.get("sheetId")) == str(gid):
+            return props.get("gridProperties", {}).get("rowCount")
+    return None
+
+
+def _row_count(spreadsheet_id: str, gid: str) -> Optional[str]:
+    rows = grid_rows(spreadsheet_id, gid)
+    return None if rows is None else f"rows:{rows}"
+
+
+def _poll_signal(spreadsheet_id: str, gid: str) -> Optional[str]:
+    # Scope drive.file bisa tidak melihat spreadsheet: jatuh ke jumlah baris
+    try:
+        signal = _drive_version(spreadsheet_id)
+        if signal:
+            return signal
+    except Exception:
+        tracing.record_event("freshness.drive_signal_failed")
+    try:
+        return _row_count(spreadsheet_id, gid)
+    except Exception:
+        tracing.record_event("freshness.row_signal_failed")
+        return None
+
+
+# === Sinyal webhook ===
+# Push dari onFormSubmit Apps Script ({"append": true}) hanya menambah baris;
+# push lain (Drive files.watch, edit) bisa mengubah baris lama. Token push
+# terakhir yang BUKAN append disimpan terpisah, sehingga pemuat snapshot tahu
+# apakah sejak snapshotnya hanya ada baris baru (cukup ambil delta).
+def _push_key(spreadsheet_id: str) -> str:
+    return f"freshness:push:{spreadsheet_id}"
+
+
+def _edit_key(spreadsheet_id: str) -> str:
+    return f"freshness:push_edit:{spreadsheet_id}"
+
+
+def _push_time(token: Optional[str]) -> float:
+    try:
+        return float(str(token).split(":")[1])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+def notify(spreadsheet_id: str, append: bool = False) -> str:
+    """Tandai spreadsheet berubah (dipanggil receiver webhook / stub lokal)"""
+    token = f"push:{time.time():.6f}:{uuid.uuid4().hex[:8]}"
+    if not append:
+        # ditulis sebelum token push: siapa pun yang melihat token baru juga melihat edit ini
+        shared_cache.set(_edit_key(spreadsheet_id), token, PUSH_TTL)
+    shared_cache.set(_push_key(spreadsheet_id), token, PUSH_TTL)
+    tracing.record_event("freshness.notify")
+    return token
+
+
+def appended_only(spreadsheet_id: str, since: Optional[str]) -> bool:
+    """True bila semua perubahan sejak sinyal `since` dikenal hanya menambah baris.
+
+    Hanya push webhook yang bisa membedakannya; versi Drive / jumlah baris
+    tidak (edit sel bisa terjadi bersamaan), jadi selain itu selalu False.
+    """
+    if mode() != "webhook" or not since or not since.startswith("push:"):
+        return False
+    edit = shared_cache.get(_edit_key(spreadsheet_id))
+    if edit is None:
+        # catatan edit hidup PUSH_TTL: bila `since` lebih muda, edit sesudahnya pasti tercatat
+        return 0 < time.time() - _push_time(since) < PUSH_TTL
+    return _push_time(edit) <= _push_time(since)
+
+
+def attach_stub(backend) -> None:
+    """Stub lokal untuk uji/bench: perubahan di fake_google.FakeBackend -> notify()"""
+    global _stub_attached
+    _stub_attached = True
+    backend.watch(lambda file_id, version: notify(file_id))
+
+
+def signal(spreadsheet_id: str, gid: str) -> Optional[str]:
+    """Token versi saat ini; berubah bila isi sheet (mungkin) berubah. None = tidak tersedia"""
+    current = mode()
+    if current == "webhook":
+        return shared_cache.get(_push_key(spreadsheet_id)) or "push:0"
+    if current != "poll":
+        return None
+    return shared_cache.get_or_set(
+        f"freshness:signal:{spreadsheet_id}:{gid}",
+        lambda: _poll_signal(spreadsheet_id, gid),
+        ttl=FRESHNESS_POLL_INTERVAL,
+        name="freshness.signal",
+    )
+
+
+def max_age(signal_value: Optional[str]) -> float:
+    """Batas umur snapshot untuk jenis sinyal ini (detik)"""
+    if not signal_value or signal_value.startswith("rows:"):
+        # edit sel tidak mengubah jumlah baris (dan tanpa sinyal tidak ada yang
+        # bisa dicek): jangan tunggu sampai FRESHNESS_MAX_AGE
+        return min(FRESHNESS_MAX_AGE, FRESHNESS_ROWS_MAX_AGE)
+    return FRESHNESS_MAX_AGE
+
+
+def fresh_signal(spreadsheet_id: str, gid: str) -> Optional[str]:
+    """Sinyal versi Drive terbaru tanpa cache (mode poll) atau None.
+
+    Dipakai di sekitar tulisan aplikasi sendiri: versi naik karena tulisan itu,
+    padahal isinya sudah ditimpakan lokal (write-through), jadi kenaikannya
+    bisa diterima tanpa memuat ulang snapshot.
+    """
+    if mode() != "poll":
+        return None
+    shared_cache.delete(f"freshness:signal:{spreadsheet_id}:{gid}")
+    value = signal(spreadsheet_id, gid)
+    return value if value and value.startswith("drive:") else None
+
+
+# === Receiver webhook ===
+def channel_id(spreadsheet_id: str) -> str:
+    return f"{CHANNEL_PREFIX}.{spreadsheet_id}.{uuid.uuid4().hex[:8]}"
+
+
+def watch_spreadsheet(spreadsheet_id: str, address: str, ttl_seconds: int = 6 * 24 * 3600) -> dict:
+    """Daftarkan channel push Drive (files.watch) untuk spreadsheet ke `address`"""
+    from auth import get_drive_service
+
+    body = {
+        "id": channel_id(spreadsheet_id),
+        "type": "web_hook",
+        "address": address,
+        "token": FRESHNESS_WEBHOOK_TOKEN,
+        "expiration": int((time.time() + ttl_seconds) * 1000),
+    }
+    with tracing.span("drive.files.watch", payload=body):
+        return get_drive_service().files().watch(fileId=spreadsheet_id, body=body).execute()
+
+
+def handle_push(headers: Mapping[str, str], body: bytes = b"") -> Tuple[int, str]:
+    """Proses satu request webhook -> (status HTTP, pesan).
+
+    Menerima header push Drive (X-Goog-Channel-ID/-Token/Resource-State) atau
+    JSON {"spreadsheet_id", "token", "append"} dari Apps Script (append=true
+    dari onFormSubmit: hanya baris baru).
+    """
+    h = {k.lower(): v for k, v in headers.items()}
+    if "x-goog-channel-id" in h:
+        token = h.get("x-goog-channel-token", "")
+        parts = h["x-goog-channel-id"].split(".")
+        spreadsheet_id = parts[1] if len(parts) == 3 and parts[0] == CHANNEL_PREFIX else ""
+        state = h.get("x-goog-resource-state", "")
+    else:
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            return 400, "body bukan JSON"
+        token = str(data.get("token", ""))
+        spreadsheet_id = str(data.get("spreadsheet_id", ""))
+        state = "append" if data.get("append") is True else "update"
+    if not FRESHNESS_WEBHOOK_TOKEN:
+        return 403, "FRESHNESS_WEBHOOK_TOKEN belum diatur"
+    if not hmac.compare_digest(token.encode("utf-8"), FRESHNESS_WEBHOOK_TOKEN.encode("utf-8")):
+        return 403, "token salah"
+    if not spreadsheet_id:
+        return 400, "spreadsheet tidak dikenal"
+    if state == "sync":
+        return 200, "sync"  # pesan pertama saat channel dibuat, bukan perubahan
+    notify(spreadsheet_id, append=state == "append")
+    return 200, "ok"
+
+
+class _PushHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        status, msg = handle_push(dict(self.headers.items()), self.rfile.read(length) if length else b"")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(msg.encode("utf-8"))
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def make_server(host: str = "0.0.0.0", port: int = 8765) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), _PushHandler)
+
+
+def receiver_config_error() -> Optional[str]:
+    """Alasan receiver tidak boleh jalan, atau None"""
+    if not FRESHNESS_WEBHOOK_TOKEN:
+        return "FRESHNESS_WEBHOOK_TOKEN belum diatur; receiver tanpa token ditolak"
+    if _local_only():
+        return "SHARED_CACHE_URL belum diatur; push di LocalCache tidak akan pernah sampai ke app"
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Receiver push notification perubahan sheet pelanggan")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    error = receiver_config_error()
+    if error:
+        parser.error(error)
+    print(f"Receiver freshness di http://{args.host}:{args.port}/")
+    make_server(args.host, args.port).serve_forever()
@@ -0,0 +1,115 @@
+# harga.py - Daftar harga satuan Vendor/Pelanggan & perhitungan rekap
+#
+# Dipakai halaman Proses (preview) dan export_rekap_sheets (values mode),
+# sehingga angka di preview dan di tab rekap berasal dari sumber yang sama.
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+PPN_RATE = 0.11
+
+# Harga VENDOR (base price)
+HARGA_VENDOR: Dict[str, float] = {
+    "Jasa Kegiatan Geser APP": 93000,
+    "Jasa Kegiatan Geser Perubahan Situasi SR": 79000,
+    "Service wedge clamp 2/4 x 6/10 mm": 3990,
+    "Strainhook / ekor babi": 8000,
+    "Imundex klem": 454,
+    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover": 11999,
+    "Paku Beton": 74,
+    "Pole Bracket 3-9\"": 36823,
+    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover": 29400,
+    "Segel Plastik": 1754,
+    "Twisted Cable 2 x 10 mm² - Al": 4339,
+    "Asuransi": 0,
+    "Twisted Cable 2x10 mm² - Al": 0,
+}
+
+# Harga PELANGGAN (1.11x dari vendor)
+HARGA_PELANGGAN: Dict[str, float] = {
+    "Jasa Kegiatan Geser APP": 103230,
+    "Jasa Kegiatan Geser Perubahan Situasi SR": 87690,
+    "Service wedge clamp 2/4 x 6/10 mm": 4428.90,
+    "Strainhook / ekor babi": 8880.00,
+    "Imundex klem": 503.94,
+    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover": 13318.89,
+    "Paku Beton": 82.14,
+    "Pole Bracket 3-9\"": 40873.53,
+    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover": 32634.00,
+    "Segel Plastik": 1946.94,
+    "Twisted Cable 2 x 10 mm² - Al": 4816.29,
+    "Asuransi": 0,
+    "Twisted Cable 2x10 mm² - Al": 0,
+}
+
+
+def hitung_rekap(items: List[str], qty: List[Optional[int]], harga: Dict[str, float]) -> dict:
+    """Harga satuan, total per baris, subtotal, PPN & total untuk baris template"""
+    unit = [float(harga.get(name, 0) or 0) for name in items]
+    line_total = [u * (q or 0) for u, q in zip(unit, qty)]
+    subtotal = sum(line_total)
+    ppn = subtotal * PPN_RATE
+    return {
+        "unit": unit,
+        "line_total": line_total,
+        "subtotal": subtotal,
+        "ppn": ppn,
+        "total": subtotal + ppn,
+    }
+
+
+# Katalog form Proses (urutan = urutan input). Harga = HARGA_PELANGGAN.
+KATALOG_BARANG: List[Tuple[str, str]] = [
+    ("Jasa Kegiatan Geser APP", "PLG"),
+    ("Jasa Kegiatan Geser Perubahan Situasi SR", "PLG"),
+    ("Service wedge clamp 2/4 x 6/10 mm", "B"),
+    ("Strainhook / ekor babi", "B"),
+    ("Imundex klem", "B"),
+    ("Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover", "B"),
+    ("Paku Beton", "B"),
+    ("Pole Bracket 3-9\"", "B"),
+    ("Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover", "B"),
+]
+KATALOG_TAMBAHAN: List[Tuple[str, str]] = [
+    ("Segel Plastik", "B"),
+    ("Twisted Cable 2 x 10 mm² - Al", "M"),
+    ("Asuransi", ""),
+    ("Twisted Cable 2x10 mm² - Al", "B"),
+]
+
+
+class Katalog:
+    """Katalog kolumnar: volume satu sesi cukup satu array int32 sejajar urutan item.
+
+    rekap_df() menurunkan tabel rekap (Rincian/SAT/Vol/harga) dari array volume
+    dengan operasi vektor, jadi session_state tidak perlu menyimpan list of dict.
+    """
+
+    def __init__(self, items: Sequence[Tuple[str, str]], harga: Dict[str, float]):
+        self.names = np.array([n for n, _ in items], dtype=object)
+        self.sat = np.array([s for _, s in items], dtype=object)
+        self.harga = np.array([float(harga.get(n, 0) or 0) for n, _ in items], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def empty_qty(self) -> np.ndarray:
+        return np.zeros(len(self), dtype=np.int32)
+
+    def rekap_df(self, qty: Optional[np.ndarray]) -> pd.DataFrame:
+        """Baris dengan volume > 0: Rincian, SAT, Vol, Harga Satuan Material, Harga Total"""
+        qty = self.empty_qty() if qty is None else np.asarray(qty, dtype=np.int64)
+        mask = qty > 0
+        vol = qty[mask]
+        unit = self.harga[mask]
+        return pd.DataFrame({
+            "Rincian": self.names[mask],
+            "SAT": self.sat[mask],
+            "Vol": vol,
+            "Harga Satuan Material": unit,
+            "Harga Total": vol * unit,
+        })
+
+
+KATALOG = Katalog(KATALOG_BARANG + KATALOG_TAMBAHAN, HARGA_PELANGGAN)
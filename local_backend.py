@@ -0,0 +1,270 @@
+# local_backend.py - Backend lokal berbasis file pengganti Google Sheets & Drive
+#
+# BACKEND = "local" di secrets (atau env GESER_METER_BACKEND=local bila belum ada
+# secrets.toml) membuat auth.py memakai LocalBackend alih-alih Sheets/Drive asli,
+# sehingga aplikasi bisa dijalankan, diprofil dan diuji beban tanpa akses Google.
+# Jalur kodenya sama dengan mode google (subset gspread & Drive v3 dari
+# fake_google); hanya penyimpanannya yang berupa file:
+#   LOCAL_DATA_DIR/local.sqlite3  - spreadsheet, tab (nilai sel JSON per tab),
+#                                   named range & metadata file Drive
+#   LOCAL_DATA_DIR/drive/<id>     - isi file Drive (foto eksekusi)
+# Data awal dibuat sekali: sheet pelanggan dari LOCAL_SEED_CSV bila ada, selain
+# itu LOCAL_SEED_ROWS baris dummy, plus Template Vendor/Pelanggan dan folder
+# Foto Eksekusi. SHEET_ID/SHEET_GID/DRIVE_FOLDER_EKSEKUSI diambil dari data ini.
+#
+# Satu proses memegang satu salinan di memori; perubahan sheet ditulis ke
+# SQLite setelah LOCAL_FLUSH_DELAY detik (beberapa perubahan digabung). Proses
+# lain baru melihat perubahan itu setelah dimulai ulang.
+#
+#   python local_backend.py --rows 1000          # siapkan data & tampilkan ID
+#   python local_backend.py --csv pelanggan.csv --reset
+import argparse
+import atexit
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+from fake_google import FakeBackend, _SpreadsheetData, _Tab, _public, seed_workbook
+
+try:
+    LOCAL_DATA_DIR = str(st.secrets.get("LOCAL_DATA_DIR", os.environ.get("GESER_METER_LOCAL_DIR", ".data/local")))
+    LOCAL_SEED_CSV = str(st.secrets.get("LOCAL_SEED_CSV", ""))
+    LOCAL_SEED_ROWS = int(st.secrets.get("LOCAL_SEED_ROWS", 1000))
+    LOCAL_LATENCY = float(st.secrets.get("LOCAL_LATENCY", 0.0))
+    LOCAL_FLUSH_DELAY = float(st.secrets.get("LOCAL_FLUSH_DELAY", 0.5))
+except Exception:
+    LOCAL_DATA_DIR = os.environ.get("GESER_METER_LOCAL_DIR", ".data/local")
+    LOCAL_SEED_CSV = ""
+    LOCAL_SEED_ROWS = 1000
+    LOCAL_LATENCY = 0.0
+    LOCAL_FLUSH_DELAY = 0.5
+
+SETTING_KEYS = ("SHEET_ID", "SHEET_GID", "DRIVE_FOLDER_EKSEKUSI")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS spreadsheets (
+    key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    next_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    named_ranges TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tabs (
+    spreadsheet_key TEXT NOT NULL,
+    sheet_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    cells TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_key, sheet_id)
+);
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL
+);
+"""
+
+
+def read_csv_rows(path: str) -> List[List[str]]:
+    """CSV (header + baris, mis. unduhan sheet form response) -> list of list"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [row for row in csv.reader(f)]
+
+
+class LocalBackend(FakeBackend):
+    """FakeBackend yang isinya disimpan di LOCAL_DATA_DIR dan dimuat ulang saat start"""
+
+    def __init__(
+        self,
+        data_dir: str,
+        seed_rows: int = LOCAL_SEED_ROWS,
+        seed_csv: str = LOCAL_SEED_CSV,
+        latency: float = LOCAL_LATENCY,
+        flush_delay: float = LOCAL_FLUSH_DELAY,
+    ):
+        super().__init__(latency=latency, seed=0)
+        self.data_dir = data_dir
+        self.drive_dir = os.path.join(data_dir, "drive")
+        self.db_path = os.path.join(data_dir, "local.sqlite3")
+        self.flush_delay = flush_delay
+        self._db_lock = threading.Lock()
+        self._dirty: set = set()
+        self._timer: Optional[threading.Timer] = None
+        self._loading = True
+
+        os.makedirs(self.drive_dir, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        conn.close()
+
+        self.settings: Dict[str, str] = self._load()
+        self._loading = False
+        if not all(k in self.settings for k in SETTING_KEYS):
+            self.settings = self._seed(seed_rows, seed_csv)
+        self.watch(lambda key, version: self._mark_dirty(key))
+        atexit.register(self.flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -- muat & seed --
+    def _load(self) -> Dict[str, str]:
+        conn = self._connect()
+        try:
+            for row in conn.execute("SELECT * FROM spreadsheets"):
+                data = _SpreadsheetData(row["key"], row["title"])
+                data._next_id = row["next_id"]
+                data.version = row["version"]
+                data.named_ranges = json.loads(row["named_ranges"])
+                tabs = conn.execute(
+                    "SELECT sheet_id, idx, title, cells FROM tabs WHERE spreadsheet_key = ? ORDER BY idx",
+                    (row["key"],),
+                )
+                data.tabs = [_Tab(t["sheet_id"], t["title"], t["idx"], json.loads(t["cells"])) for t in tabs]
+                self.spreadsheets[data.key] = data
+            for row in conn.execute("SELECT meta FROM files"):
+                rec = json.loads(row["meta"])
+                rec["_content"] = b""  # isi tetap di disk (drive/<id>), tidak dibaca aplikasi
+                self.files[rec["id"]] = rec
+            return {r["name"]: r["value"] for r in conn.execute("SELECT name, value FROM settings")}
+        finally:
+            conn.close()
+
+    def _seed(self, seed_rows: int, seed_csv: str) -> Dict[str, str]:
+        rows = read_csv_rows(seed_csv) if seed_csv and os.path.exists(seed_csv) else None
+        ids = seed_workbook(self, seed_rows, seed=0, pelanggan_rows=rows)
+        self._save_spreadsheet(ids["spreadsheet_id"])
+        settings = {
+            "SHEET_ID": ids["spreadsheet_id"],
+            "SHEET_GID": ids["gid"],
+            "DRIVE_FOLDER_EKSEKUSI": ids["drive_folder_eksekusi"],
+        }
+        conn = self._connect()
+        try:
+            conn.executemany("INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)", settings.items())
+        finally:
+            conn.close()
+        return settings
+
+    # -- simpan perubahan --
+    def _mark_dirty(self, key: str) -> None:
+        if self.flush_delay <= 0:
+            self._save_spreadsheet(key)
+            return
+        with self._db_lock:
+            self._dirty.add(key)
+            if self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        """Tulis semua spreadsheet yang berubah sekarang (dipanggil juga saat proses keluar)"""
+        with self._db_lock:
+            keys, self._dirty = self._dirty, set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for key in keys:
+            self._save_spreadsheet(key)
+
+    def _save_spreadsheet(self, key: str) -> None:
+        # Snapshot di bawah lock backend, tulis ke SQLite di luar lock itu
+        with self._lock:
+            data = self.spreadsheets.get(key)
+            if data is None:
+                return
+            head = (data.key, data.title, data._next_id, data.version, json.dumps(data.named_ranges))
+            tabs = [(data.key, t.sheet_id, t.index, t.title, json.dumps(t.values, default=str)) for t in data.tabs]
+        with self._db_lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("INSERT OR REPLACE INTO spreadsheets VALUES (?, ?, ?, ?, ?)", head)
+                conn.execute("DELETE FROM tabs WHERE spreadsheet_key = ?", (key,))
+                conn.executemany("INSERT INTO tabs VALUES (?, ?, ?, ?, ?)", tabs)
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+    def _file_changed(self, file_id: str) -> None:
+        if self._loading:
+            return
+        with self._lock:
+            rec = self.files.get(file_id)
+            content = rec.get("_content", b"") if rec is not None else b""
+            meta = json.dumps(_public(rec)) if rec is not None else None
+            if rec is not None:
+                rec["_content"] = b""  # sudah di disk; memori tidak menumpuk foto
+        path = os.path.join(self.drive_dir, file_id)
+        with self._db_lock:
+            conn = self._connect()
+            try:
+                if meta is None:
+                    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                    if os.path.exists(path):
+                        os.remove(path)
+                    return
+                if content:
+                    with open(path + ".tmp", "wb") as f:
+                        f.write(content)
+                    os.replace(path + ".tmp", path)
+                conn.execute("INSERT OR REPLACE INTO files (id, meta) VALUES (?, ?)", (file_id, meta))
+            finally:
+                conn.close()
+
+
+# === Instance per proses (dipakai auth.py saat BACKEND = "local") ===
+_instance: Optional[LocalBackend] = None
+_instance_lock = threading.Lock()
+
+
+def get() -> LocalBackend:
+    global _instance
+    with _instance_lock:
+        if _instance is None:
+            _instance = LocalBackend(LOCAL_DATA_DIR)
+        return _instance
+
+
+def settings() -> Dict[str, str]:
+    return dict(get().settings)
+
+
+def reset(data_dir: str = LOCAL_DATA_DIR) -> None:
+    """Hapus seluruh data lokal (seed ulang saat start berikutnya)"""
+    global _instance
+    with _instance_lock:
+        if _instance is not None:
+            _instance.flush()
+            _instance = None
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Siapkan data backend lokal (BACKEND = \"local\")")
+    parser.add_argument("--dir", default=LOCAL_DATA_DIR)
+    parser.add_argument("--rows", type=int, default=LOCAL_SEED_ROWS, help="jumlah baris pelanggan dummy")
+    parser.add_argument("--csv", default=LOCAL_SEED_CSV, help="CSV sheet pelanggan (header + baris)")
+    parser.add_argument("--reset", action="store_true", help="hapus data lama dulu")
+    args = parser.parse_args()
+    if args.reset:
+        reset(args.dir)
+    backend = LocalBackend(args.dir, seed_rows=args.rows, seed_csv=args.csv)
+    data = backend.spreadsheets[backend.settings["SHEET_ID"]]
+    print(f"Data lokal di {os.path.abspath(args.dir)}: {len(data.tabs[0].values) - 1} baris pelanggan, {len(data.tabs)} tab")
+    for k in SETTING_KEYS:
+        print(f'{k} = "{backend.settings[k]}"')
+    print('Jalankan dengan BACKEND = "local" di .streamlit/secrets.toml atau GESER_METER_BACKEND=local')
@@ -0,0 +1,470 @@
+# outbox.py - Antrean write-ahead (SQLite) untuk penulisan Sheets & upload Drive
+#
+# Submit Eksekusi dan export rekap dicatat dulu ke disk lokal (payload + file foto),
+# baru kemudian dikirim ke Google oleh drain(). Gagal karena jaringan/kuota tidak
+# membuat petugas mengulang form: item tetap "pending" dan dicoba lagi oleh worker
+# latar belakang dengan backoff. Setiap item punya idempotency key unik
+# (mis. IDPEL + tanggal + hash file) sehingga enqueue/retry tidak menggandakan baris
+# maupun file. Item dengan `requires` baru dikirim setelah semua item prasyarat
+# (idem key) selesai, dan ikut gagal bila salah satunya gagal permanen.
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import streamlit as st
+
+import tracing
+
+try:
+    OUTBOX_DIR = str(st.secrets.get("OUTBOX_DIR", ".data/outbox"))
+except Exception:
+    OUTBOX_DIR = ".data/outbox"
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5        # detik, dikali 2^attempt
+BACKOFF_MAX = 600
+WORKER_INTERVAL = 15    # detik antar drain di worker latar belakang
+_COPY_CHUNK = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idem_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    group_key TEXT,
+    payload TEXT NOT NULL,
+    blob_path TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_group ON outbox(group_key, id);
+"""
+
+_handlers: Dict[str, Callable[[dict, Optional[str]], dict]] = {}
+_init_lock = threading.Lock()
+_initialized = set()
+_worker: Optional[threading.Thread] = None
+
+
+class PermanentError(Exception):
+    """Error yang tidak akan sembuh dengan retry (data salah, kolom hilang, dll.)."""
+
+
+def _db_path() -> str:
+    return os.path.join(OUTBOX_DIR, "outbox.sqlite3")
+
+
+def _connect() -> sqlite3.Connection:
+    path = _db_path()
+    if path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                os.makedirs(os.path.join(OUTBOX_DIR, "blobs"), exist_ok=True)
+                conn = sqlite3.connect(path, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                conn.close()
+                _initialized.add(path)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def content_hash(data: Any) -> str:
+    """SHA-256 hex dari bytes/memoryview (tanpa menyalin buffer)."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _store_blob(blob: Any, digest: Optional[str] = None) -> str:
+    """Simpan bytes / file-like ke blobs/<sha256> (content-addressed, atomic).
+
+    digest: content_hash(blob) yang sudah dihitung pemanggil (isi tidak di-hash ulang).
+    """
+    blob_dir = os.path.join(OUTBOX_DIR, "blobs")
+    h = hashlib.sha256() if digest is None else None
+    fd, tmp = tempfile.mkstemp(dir=blob_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(blob, (bytes, bytearray, memoryview)):
+                if h is not None:
+                    h.update(blob)
+                out.write(blob)
+            else:
+                if hasattr(blob, "seek"):
+                    blob.seek(0)
+                while True:
+                    chunk = blob.read(_COPY_CHUNK)
+                    if not chunk:
+                        break
+                    if h is not None:
+                        h.update(chunk)
+                    out.write(chunk)
+        final = os.path.join(blob_dir, digest or h.hexdigest())
+        if os.path.exists(final):
+            os.remove(tmp)
+        else:
+            os.replace(tmp, final)
+        return final
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Jaringan putus, timeout, 429/5xx → layak dicoba lagi."""
+    if isinstance(exc, PermanentError):
+        return False
+    if isinstance(exc, (ConnectionError, TimeoutError, OSError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        resp = getattr(exc, "resp", None) or getattr(exc, "response", None)
+        status = getattr(resp, "status", None) or getattr(resp, "status_code", None)
+    try:
+        status = int(status) if status is not None else None
+    except (TypeError, ValueError):
+        status = None
+    if status is not None:
+        return status == 429 or status >= 500
+    msg = str(exc).lower()
+    return any(s in msg for s in ("quota", "rate limit", "timed out", "timeout", "connection", "[429]", "[500]", "[503]"))
+
+
+def register_handler(kind: str, fn: Callable[[dict, Optional[str]], dict]) -> None:
+    """fn(payload, blob_path) -> dict hasil; raise untuk gagal (transient/permanent)."""
+    _handlers[kind] = fn
+
+
+def enqueue(
+    kind: str,
+    payload: dict,
+    idem_key: str,
+    blob: Any = None,
+    group_key: Optional[str] = None,
+    requires: Optional[Iterable[str]] = None,
+    blob_digest: Optional[str] = None,
+) -> int:
+    """Catat satu operasi; idem_key yang sama tidak pernah diantrekan dua kali.
+
+    requires: idem key item yang harus 'done' dulu (mis. upload foto sebelum
+    TanggalEksekusi); bila salah satunya gagal, item ini ikut gagal.
+    blob_digest: content_hash(blob) bila sudah dihitung untuk idem_key.
+    """
+    if requires:
+        payload = {**payload, "requires": list(dict.fromkeys(requires))}
+    with tracing.span("outbox.enqueue", payload=payload):
+        conn = _connect()
+        blob_path = _store_blob(blob, blob_digest) if blob is not None else None
+        now = time.time()
+        try:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO outbox (idem_key, kind, group_key, payload, blob_path, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (idem_key, kind, group_key, json.dumps(payload, default=str), blob_path, now, now),
+            ).rowcount
+            if not inserted:
+                # Submit ulang oleh petugas: item yang sempat gagal permanen dicoba lagi
+                revived = conn.execute(
+                    "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0, "
+                    "blob_path = COALESCE(?, blob_path), payload = ?, updated_at = ? "
+                    "WHERE idem_key = ? AND status = 'failed'",
+                    (blob_path, json.dumps(payload, default=str), now, idem_key),
+                ).rowcount
+                if not revived:
+                    tracing.record_event("outbox.duplicate_enqueue")
+                    _release_blob(conn, blob_path)
+            row = conn.execute("SELECT id FROM outbox WHERE idem_key = ?", (idem_key,)).fetchone()
+            return int(row["id"])
+        finally:
+            conn.close()
+
+
+def _row_dict(row: sqlite3.Row) -> dict:
+    d = dict(row)
+    d["payload"] = json.loads(d["payload"])
+    d["result"] = json.loads(d["result"]) if d.get("result") else None
+    return d
+
+
+def items(
+    group_key: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 200,
+    idem_keys: Optional[Iterable[str]] = None,
+) -> List[dict]:
+    """Item antrean; idem_keys membatasi ke item satu submit (group bisa berisi submit lain)"""
+    sql, args = "SELECT * FROM outbox WHERE 1=1", []
+    if group_key is not None:
+        sql += " AND group_key = ?"
+        args.append(group_key)
+    if idem_keys is not None:
+        keys = list(dict.fromkeys(idem_keys))
+        if not keys:
+            return []
+        sql += f" AND idem_key IN ({', '.join('?' * len(keys))})"
+        args.extend(keys)
+    if status is not None:
+        sql += " AND status = ?"
+        args.append(status)
+    sql += " ORDER BY id LIMIT ?"
+    args.append(limit)
+    conn = _connect()
+    try:
+        return [_row_dict(r) for r in conn.execute(sql, args).fetchall()]
+    finally:
+        conn.close()
+
+
+def pending_count() -> int:
+    conn = _connect()
+    try:
+        return int(conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'running')").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def _release_blob(conn: sqlite3.Connection, blob_path: Optional[str]) -> None:
+    if not blob_path:
+        return
+    still_used = conn.execute(
+        "SELECT 1 FROM outbox WHERE blob_path = ? AND status IN ('pending', 'running') LIMIT 1", (blob_path,)
+    ).fetchone()
+    if not still_used and os.path.exists(blob_path):
+        try:
+            os.remove(blob_path)
+        except OSError:
+            pass
+
+
+def drain(max_items: int = 100, group_key: Optional[str] = None, deadline: Optional[float] = None) -> dict:
+    """Kirim item yang jatuh tempo, urut per group; berhenti di deadline (detik)."""
+    stats = {"done": 0, "retry": 0, "failed": 0}
+    started = time.monotonic()
+    conn = _connect()
+    try:
+        sql = "SELECT * FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?"
+        args: list = [time.time()]
+        if group_key is not None:
+            sql += " AND group_key = ?"
+            args.append(group_key)
+        sql += " ORDER BY id LIMIT ?"
+        args.append(max_items)
+        rows = conn.execute(sql, args).fetchall()
+
+        for row in rows:
+            if deadline is not None and time.monotonic() - started > deadline:
+                break
+            if row["kind"] not in _handlers:
+                continue  # handler terdaftar di proses/halaman lain
+            if row["group_key"] and conn.execute(
+                "SELECT 1 FROM outbox WHERE group_key = ? AND id < ? AND status IN ('pending', 'running') LIMIT 1",
+                (row["group_key"], row["id"]),
+            ).fetchone():
+                continue  # jaga urutan: item sebelumnya di group masih tertunda
+            payload = json.loads(row["payload"])
+            requires = payload.get("requires") or []
+            if requires:
+                states = dict(conn.execute(
+                    f"SELECT idem_key, status FROM outbox WHERE idem_key IN ({', '.join('?' * len(requires))})",
+                    requires,
+                ).fetchall())
+                gagal = [k for k in requires if states.get(k) == "failed"]
+                if gagal:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'failed', last_error = ?, updated_at = ? WHERE id = ? AND status = 'pending'",
+                        (f"PermanentError: {len(gagal)} operasi prasyarat gagal", time.time(), row["id"]),
+                    )
+                    stats["failed"] += 1
+                    continue
+                if any(states.get(k) != "done" for k in requires):
+                    continue  # prasyarat (mungkin di group lain) belum selesai
+            claimed = conn.execute(
+                "UPDATE outbox SET status = 'running', updated_at = ? WHERE id = ? AND status = 'pending'",
+                (time.time(), row["id"]),
+            ).rowcount
+            if not claimed:
+                continue
+
+            payload.setdefault("idem_key", row["idem_key"])
+            try:
+                with tracing.span(f"outbox.{row['kind']}"):
+                    result = _handlers[row["kind"]](payload, row["blob_path"])
+            except Exception as e:
+                attempts = row["attempts"] + 1
+                if is_transient(e) and attempts < MAX_ATTEMPTS:
+                    tracing.record_retry(f"outbox.{row['kind']}")
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+                    conn.execute(
+                        "UPDATE outbox SET status = 'pending', attempts = ?, next_attempt_at = ?, last_error = ?, "
+                        "updated_at = ? WHERE id = ?",
+                        (attempts, time.time() + delay, f"{type(e).__name__}: {e}", time.time(), row["id"]),
+                    )
+                    stats["retry"] += 1
+                else:
+                    conn.execute(
+                        "UPDATE outbox SET status = 'failed', attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                        (attempts, f"{type(e).__name__}: {e}", time.time(), row["id"]),
+                    )
+                    _release_blob(conn, row["blob_path"])
+                    stats["failed"] += 1
+                continue
+
+            conn.execute(
+                "UPDATE outbox SET status = 'done', attempts = attempts + 1, result = ?, last_error = NULL, "
+                "updated_at = ? WHERE id = ?",
+                (json.dumps(result, default=str), time.time(), row["id"]),
+            )
+            _release_blob(conn, row["blob_path"])
+            stats["done"] += 1
+    finally:
+        conn.close()
+    return stats
+
+
+def drain_many(group_keys: Iterable[str], workers: int = 4, deadline: Optional[float] = None) -> dict:
+    """Drain beberapa group sekaligus: paralel antar group, tetap urut di dalam group."""
+    keys = list(dict.fromkeys(group_keys))
+    stats = {"done": 0, "retry": 0, "failed": 0}
+    if not keys:
+        return stats
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(keys))), thread_name_prefix="outbox-drain") as pool:
+        for result in pool.map(lambda g: drain(group_key=g, deadline=deadline), keys):
+            for k in stats:
+                stats[k] += result[k]
+    return stats
+
+
+def drain_async(group_key: str) -> threading.Thread:
+    """Drain satu group di thread latar belakang; halaman cukup memantau statusnya (wait/items)."""
+    t = threading.Thread(target=drain, kwargs={"group_key": group_key}, name="outbox-drain-async", daemon=True)
+    t.start()
+    return t
+
+
+def wait(group_key: str, timeout: float, poll: float = 0.2) -> List[dict]:
+    """Item group setelah selesai diproses (done/failed/dijadwalkan ulang) atau setelah timeout detik."""
+    deadline = time.monotonic() + timeout
+    while True:
+        group = items(group_key=group_key)
+        # pending dengan attempts > 0 = sudah dicoba, menunggu backoff worker
+        busy = [it for it in group if it["status"] == "running" or (it["status"] == "pending" and not it["attempts"])]
+        if not busy or time.monotonic() >= deadline:
+            return group
+        time.sleep(poll)
+
+
+def retry_failed(group_key: Optional[str] = None) -> int:
+    """Kembalikan item 'failed' ke antrean (mis. setelah kolom sheet diperbaiki)."""
+    conn = _connect()
+    try:
+        sql = "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0 WHERE status = 'failed'"
+        args = []
+        if group_key is not None:
+            sql += " AND group_key = ?"
+            args.append(group_key)
+        return conn.execute(sql, args).rowcount
+    finally:
+        conn.close()
+
+
+def _recover_running() -> None:
+    """Item 'running' dari proses yang mati dikembalikan ke pending (aman: idempotent)."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE outbox SET status = 'pending' WHERE status = 'running' AND updated_at < ?",
+            (time.time() - 300,),
+        )
+    finally:
+        conn.close()
+
+
+def _worker_loop() -> None:
+    while True:
+        try:
+            _recover_running()
+            drain()
+        except Exception:
+            pass
+        time.sleep(WORKER_INTERVAL)
+
+
+def ensure_worker() -> None:
+    """Jalankan satu worker drain per proses server."""
+    global _worker
+    with _init_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name="outbox-worker", daemon=True)
+            _worker.start()
+
+
+# === Handler bawaan (Eksekusi) ===
+DRIVE_IDEM_PROPERTY = "wal_key"
+
+
+def _idem_digest(idem_key: str) -> str:
+    # appProperties dibatasi 124 byte per key+value
+    return hashlib.sha1(idem_key.encode("utf-8")).hexdigest()
+
+
+def _handle_drive_upload(payload: dict, blob_path: Optional[str]) -> dict:
+    from auth import get_or_create_folder, upload_file_to_drive
+
+    folder_id = get_or_create_folder(payload["parent_folder_id"], payload["folder_name"])
+    if not blob_path or not os.path.exists(blob_path):
+        raise PermanentError("File foto di antrean hilang")
+    # Upload sebelumnya yang sukses (walau status belum 'done') dikenali
+    # upload_file_to_drive lewat hash isi, jadi retry tidak menduplikasi file;
+    # file blob di-stream langsung (mmap) tanpa dibaca utuh ke memori, dan nama
+    # blob sudah berupa sha256 isinya sehingga tidak di-hash ulang
+    with open(blob_path, "rb") as fh:
+        return upload_file_to_drive(
+            file_content=fh,
+            filename=payload["filename"],
+            folder_id=folder_id,
+            mime_type=payload["mime_type"],
+            app_properties={DRIVE_IDEM_PROPERTY: _idem_digest(payload["idem_key"])},
+            digest=os.path.basename(blob_path),
+        )
+
+
+def _handle_tanggal_eksekusi(payload: dict, blob_path: Optional[str]) -> dict:
+    from pelanggan import update_tanggal_eksekusi
+
+    result = update_tanggal_eksekusi(payload["spreadsheet_id"], payload["gid"], payload["idpel"], payload["tanggal"])
+    if not result["success"]:
+        err = result["message"]
+        if err.startswith("Error: "):
+            raise RuntimeError(err[len("Error: "):])
+        raise PermanentError(err)
+    return result
+
+
+def _handle_tanggal_eksekusi_batch(payload: dict, blob_path: Optional[str]) -> dict:
+    from pelanggan import update_tanggal_eksekusi_batch
+
+    result = update_tanggal_eksekusi_batch(payload["spreadsheet_id"], payload["gid"], payload["updates"])
+    if not result["success"]:
+        err = result["message"]
+        if err.startswith("Error: "):
+            raise RuntimeError(err[len("Error: "):])
+        raise PermanentError(err)
+    return result
+
+
+register_handler("drive_upload", _handle_drive_upload)
+register_handler("sheets_tanggal_eksekusi", _handle_tanggal_eksekusi)
+register_handler("sheets_tanggal_eksekusi_batch", _handle_tanggal_eksekusi_batch)
@@ -0,0 +1,584 @@
+# pelanggan.py - Akses data pelanggan (sheet form response) yang dipakai semua halaman
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import freshness
+import shared_cache
+import sheet_columns
+import sheet_ingest
+import tracing
+from auth import open_spreadsheet, get_worksheet
+
+# Mode ttl: snapshot disimpan 3 menit di shared_cache (bersama antar replika);
+# setelah itu snapshot lama masih disajikan hingga PELANGGAN_STALE_TTL sambil
+# di-refresh. Mode poll/webhook (freshness.py): snapshot dimuat ulang hanya
+# saat sinyal perubahan berganti, dengan freshness.max_age() sebagai batas atas.
+PELANGGAN_TTL = 180
+PELANGGAN_STALE_TTL = 600
+
+# Dengan backend Redis tiap get() meng-unpickle seluruh DataFrame. Tiap snapshot
+# yang disimpan diberi versi (kunci kecil terpisah), dan proses ini memegang
+# snapshot terakhir per versi: rerun hanya membaca versinya.
+_memo_lock = threading.Lock()
+_memo: Dict[str, Tuple[str, Tuple[pd.DataFrame, float]]] = {}
+
+
+def load_sheet_by_gid(spreadsheet_id, gid):
+    sh = open_spreadsheet(spreadsheet_id)
+    target = get_worksheet(sh, gid=gid)
+    if target is None:
+        target = sh.sheet1
+    return target
+
+
+def _fetch_pelanggan(spreadsheet_id: str, gid: str) -> Tuple[pd.DataFrame, float]:
+    fetched_at = time.time()
+    ws = load_sheet_by_gid(spreadsheet_id, gid)
+    if sheet_ingest.INGEST_CHUNK_ROWS > 0:
+        # per potongan baris langsung ke kolom bertipe (tanpa dict per baris)
+        df = sheet_ingest.read_frame(open_spreadsheet(spreadsheet_id), ws).fillna("")
+    else:
+        with tracing.span("sheets.get_all_records") as sp:
+            data = ws.get_all_records()
+            sp.bytes_in = tracing.payload_size(data)
+        df = pd.DataFrame(data).fillna("")
+    if len(df.columns):
+        # header ikut terbaca: simpan peta kolomnya untuk penulis, lalu samakan
+        # nama kolom ke label kanonik yang dipakai halaman
+        cmap = sheet_columns.remember(spreadsheet_id, gid, list(df.columns))
+        df = df.rename(columns=cmap.renames())
+    return df, fetched_at
+
+
+def _fetch_delta(spreadsheet_id: str, gid: str, df: pd.DataFrame, fetched_at: float) -> Optional[Tuple[pd.DataFrame, float]]:
+    """Ambil hanya baris setelah snapshot (respons form baru); None bila tidak ada.
+
+    Hanya sah bila sejak snapshot tidak ada baris lama yang diubah
+    (freshness.appended_only)."""
+    cmap = sheet_columns.cached_map(spreadsheet_id, gid)
+    renames = cmap.renames() if cmap is not None else {}
+    if cmap is None or df.empty or [renames.get(h, h) for h in cmap.header] != list(df.columns):
+        return None
+    ws = load_sheet_by_gid(spreadsheet_id, gid)
+    # row_count worksheet dari registry bisa tertinggal: baca rowCount terkini
+    last_row = freshness.grid_rows(spreadsheet_id, gid) or ws.row_count
+    chunks = sheet_ingest.iter_chunks(
+        open_spreadsheet(spreadsheet_id).values_get, ws.title, len(df) + 2, last_row=last_row
+    )
+    new = sheet_ingest.frame_from_rows(list(df.columns), chunks)
+    if new.empty:
+        return None
+    new = new.fillna("")
+    tracing.record_event("pelanggan.delta_reload")
+    # fetched_at lama dipertahankan: baris lama tidak dibaca ulang, jadi
+    # penulisan lokal yang masih pending tetap ditimpakan (write-through)
+    return pd.concat([df, new], ignore_index=True), fetched_at
+
+
+def _reload(spreadsheet_id: str, gid: str, signal: str, seen: Optional[str]) -> Tuple[pd.DataFrame, float]:
+    """Sinyal berubah: delta bila sejak `seen` hanya ada baris baru, selain itu fetch penuh"""
+    result = None
+    entry = None
+    if freshness.appended_only(spreadsheet_id, seen):
+        entry = shared_cache.get(f"pelanggan:{spreadsheet_id}:{gid}")
+    if entry is not None:
+        try:
+            result = _fetch_delta(spreadsheet_id, gid, *entry[0][:2])
+        except Exception:
+            tracing.record_event("pelanggan.delta_failed")
+    if result is None:
+        result = _fetch_pelanggan(spreadsheet_id, gid)
+    shared_cache.set(f"pelanggan:signal:{spreadsheet_id}:{gid}", signal, 2 * freshness.FRESHNESS_MAX_AGE)
+    return result
+
+
+def _versioned(key: str, loader, ttl: float, stale_ttl: Optional[float] = None):
+    """loader() -> (df, fetched_at, versi); versi + batas segar dicatat di kunci kecil"""
+    def load():
+        df, fetched_at = loader()
+        version = uuid.uuid4().hex
+        shared_cache.set(f"{key}:version", (version, time.time() + ttl), ttl + (stale_ttl or 0))
+        return df, fetched_at, version
+    return load
+
+
+def _cached(key: str, loader, ttl: float, stale_ttl: Optional[float] = None, force: bool = False):
+    """get_or_set snapshot, tanpa unpickle bila versi di cache sama dengan memo proses ini"""
+    if not force:
+        current = shared_cache.get(f"{key}:version")
+        with _memo_lock:
+            memo = _memo.get(key)
+        if current is not None and memo is not None and memo[0] == current[0] and current[1] > time.time():
+            tracing.record_cache("pelanggan.fetch_pelanggan_df", hit=True)
+            return memo[1]
+    df, fetched_at, version = shared_cache.get_or_set(
+        key,
+        _versioned(key, loader, ttl, stale_ttl),
+        ttl=ttl,
+        name="pelanggan.fetch_pelanggan_df",
+        stale_ttl=stale_ttl,
+        force=force,
+    )
+    with _memo_lock:
+        _memo[key] = (version, (df, fetched_at))
+    return df, fetched_at
+
+
+def _snapshot(spreadsheet_id: str, gid: str) -> Tuple[pd.DataFrame, float]:
+    key = f"pelanggan:{spreadsheet_id}:{gid}"
+    signal = freshness.signal(spreadsheet_id, gid) if freshness.enabled() else None
+    if signal is None:
+        return _cached(key, lambda: _fetch_pelanggan(spreadsheet_id, gid), PELANGGAN_TTL, PELANGGAN_STALE_TTL)
+    shared_seen = shared_cache.get(f"pelanggan:signal:{spreadsheet_id}:{gid}")
+    changed = _local_seen(spreadsheet_id, gid, shared_seen) != signal
+    if changed:
+        tracing.record_event("pelanggan.signal_changed")
+    return _cached(
+        key, lambda: _reload(spreadsheet_id, gid, signal, shared_seen), freshness.max_age(signal), force=changed
+    )
+
+
+# Tulisan sel aplikasi sendiri menaikkan versi Drive padahal isinya sudah
+# ditimpakan lokal (write-through). Kenaikan itu diterima HANYA di proses ini:
+# kunci sinyal bersama tidak disentuh, jadi replika lain tetap memuat ulang
+# (dan ikut melihat perubahan pihak lain yang mungkin jatuh di jendela yang sama).
+_adopted_lock = threading.Lock()
+_adopted: Dict[Tuple[str, str], Tuple[Optional[str], str]] = {}
+
+
+def _local_seen(spreadsheet_id: str, gid: str, seen: Optional[str]) -> Optional[str]:
+    """Sinyal yang sudah tercermin di snapshot proses ini (kunci bersama + tulisan sendiri)"""
+    with _adopted_lock:
+        adopted = _adopted.get((str(spreadsheet_id), str(gid)))
+    if adopted is not None and adopted[0] == seen:
+        return adopted[1]
+    return seen
+
+
+@contextmanager
+def own_write(spreadsheet_id: str, gid: str):
+    """Bungkus SATU panggilan tulis sel aplikasi sendiri agar proses ini tidak memuat ulang snapshot"""
+    before = None
+    if freshness.enabled():
+        try:
+            before = freshness.fresh_signal(spreadsheet_id, gid)
+        except Exception:
+            tracing.record_event("freshness.own_write_failed")
+    yield
+    if before is None:
+        return
+    try:
+        after = freshness.fresh_signal(spreadsheet_id, gid)
+    except Exception:
+        tracing.record_event("freshness.own_write_failed")
+        return
+    seen = shared_cache.get(f"pelanggan:signal:{spreadsheet_id}:{gid}")
+    # hanya bila snapshot proses ini sudah sesuai sinyal tepat sebelum tulisan ini
+    if after and after != before and _local_seen(spreadsheet_id, gid, seen) == before:
+        with _adopted_lock:
+            _adopted[(str(spreadsheet_id), str(gid))] = (seen, after)
+        tracing.record_event("pelanggan.own_write_adopted")
+
+
+def fetch_pelanggan_df(spreadsheet_id: str, gid: str) -> pd.DataFrame:
+    """DataFrame pelanggan (cached) - dipakai Proses, Eksekusi & Data Pelanggan"""
+    df, fetched_at = _snapshot(spreadsheet_id, gid)
+    # salinan dangkal: kolom tambahan halaman (mis. Date) tidak mengubah snapshot
+    return _apply_pending_writes((str(spreadsheet_id), str(gid)), df.copy(deep=False), fetched_at)
+
+
+# === Write-through lokal ===
+# Tulisan sel yang sudah sukses (Tanggal Survey / TanggalEksekusi) langsung
+# ditimpakan ke snapshot cache, jadi halaman tidak perlu refresh penuh. Entri
+# tetap "pending" sampai snapshot yang diambil SETELAH penulisan mengonfirmasi
+# nilainya; bila nilai di sheet berbeda, sheet yang menang (ditulis pihak lain).
+PENDING_MAX_AGE = 3600  # detik; entri yang barisnya tidak pernah muncul dibuang
+
+_pending_lock = threading.Lock()
+_pending: Dict[Tuple[str, str], Dict[Tuple[str, str], dict]] = {}
+
+
+def record_local_write(spreadsheet_id: str, gid: str, idpel: str, column: str, value) -> None:
+    """Catat penulisan sel yang sukses agar langsung terlihat di snapshot lokal"""
+    key = (str(spreadsheet_id), str(gid))
+    with _pending_lock:
+        _pending.setdefault(key, {})[(str(idpel).strip(), column)] = {
+            "value": value,
+            "written_at": time.time(),
+        }
+
+
+def pending_writes(spreadsheet_id: str, gid: str, idpel: Optional[str] = None) -> List[dict]:
+    """Daftar penulisan yang belum terkonfirmasi oleh fetch berikutnya"""
+    key = (str(spreadsheet_id), str(gid))
+    with _pending_lock:
+        entries = dict(_pending.get(key, {}))
+    return [
+        {"idpel": pid, "column": col, **w}
+        for (pid, col), w in entries.items()
+        if idpel is None or pid == str(idpel).strip()
+    ]
+
+
+def _apply_pending_writes(key: Tuple[str, str], df: pd.DataFrame, fetched_at: float) -> pd.DataFrame:
+    with _pending_lock:
+        entries = dict(_pending.get(key, {}))
+    if not entries or df.empty or "ID Pelanggan" not in df.columns:
+        return df
+
+    df = df.copy()
+    ids = df["ID Pelanggan"].astype(str).str.strip()
+    now = time.time()
+    settled = []
+    for (idpel, column), w in entries.items():
+        mask = ids == idpel
+        if column not in df.columns or not mask.any():
+            if now - w["written_at"] > PENDING_MAX_AGE:
+                settled.append(((idpel, column), w))
+            continue
+        # Writer selalu menulis baris terakhir yang cocok (pencarian dari bawah)
+        idx = df.index[mask][-1]
+        if fetched_at >= w["written_at"]:
+            if str(df.at[idx, column]) != str(w["value"]):
+                tracing.record_event("pelanggan.write_through_conflict")
+            settled.append(((idpel, column), w))
+            continue
+        df.at[idx, column] = w["value"]
+
+    if settled:
+        with _pending_lock:
+            bucket = _pending.get(key, {})
+            for k, w in settled:
+                # jangan buang entri yang ditimpa penulisan lebih baru
+                if bucket.get(k) is w:
+                    bucket.pop(k, None)
+    return df
+
+
+def clear_cache() -> None:
+    shared_cache.delete_prefix("pelanggan:")
+    with _memo_lock:
+        _memo.clear()
+    with _adopted_lock:
+        _adopted.clear()
+
+
+def with_date_column(df: pd.DataFrame) -> pd.DataFrame:
+    """Tambah kolom Date dari Timestamp (format form Google: dd/mm/YYYY HH:MM:SS)"""
+    if "Timestamp" not in df.columns:
+        return df
+    try:
+        df["Date"] = pd.to_datetime(
+            df["Timestamp"],
+            format="%d/%m/%Y %H:%M:%S",
+            errors="coerce"
+        ).dt.date
+    except Exception:
+        df["Date"] = pd.to_datetime(
+            df["Timestamp"],
+            errors="coerce"
+        ).dt.date
+    return df
+
+
+# === Indeks pencarian ===
+# Dibangun sekali per snapshot (per proses) dan dipakai ulang tiap rerun: kolom
+# ID/Nama sudah di-lowercase, tanggal sudah diparse. Hasil pencarian dibatasi
+# SEARCH_LIMIT opsi teratas sehingga biaya rerun & isi selectbox tidak ikut
+# membesar bersama jumlah pelanggan.
+SEARCH_LIMIT = 50
+_SEARCH_MEMO_SIZE = 256
+
+
+class SearchIndex:
+    """Pencarian IDPEL/Nama berperingkat di atas satu snapshot pelanggan.
+
+    Urutan hasil: ID sama persis, awalan ID, awalan Nama, ID mengandung query,
+    lalu Nama mengandung query; di dalam tiap peringkat mengikuti urutan sheet.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if df.empty or "ID Pelanggan" not in df.columns:
+            df = pd.DataFrame({"ID Pelanggan": pd.Series(dtype=str)})
+        ids = df["ID Pelanggan"].astype(str).str.strip()
+        if "Nama" in df.columns:
+            names = df["Nama"].astype(str).str.strip()
+        else:
+            names = pd.Series("-", index=df.index)
+        keep = (ids != "").to_numpy()
+        if "Timestamp" in df.columns:
+            dates = with_date_column(df[["Timestamp"]].copy())["Date"]
+            dates = dates.astype(str).where(dates.notna(), "")
+        else:
+            dates = pd.Series("", index=df.index)
+
+        self.ids = ids.to_numpy()[keep]
+        self.names = names.to_numpy()[keep]
+        self.labels = (ids + " (" + names + ")").to_numpy()[keep]
+        self.dates = dates.to_numpy()[keep]
+        self._ids_lower = pd.Series(self.ids, dtype=object).str.lower()
+        self._names_lower = pd.Series(self.names, dtype=object).str.lower()
+        self._name_of = dict(zip(self.ids, self.names))
+        self.date_options = sorted({d for d in self.dates if d}, reverse=True)
+        self._memo: "OrderedDict[tuple, Tuple[List[str], int]]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def name_of(self, idpel: str, default: str = "-") -> str:
+        return self._name_of.get(str(idpel).strip(), default)
+
+    def _contains(self, col: pd.Series, q: str) -> np.ndarray:
+        return col.str.contains(q, regex=False, na=False).to_numpy()
+
+    def search(
+        self,
+        search_text: str = "",
+        search_id: str = "",
+        search_nama: str = "",
+        selected_date: Optional[str] = None,
+        limit: int = SEARCH_LIMIT,
+    ) -> Tuple[List[str], int]:
+        """Label 'IDPEL (Nama)' teratas (maks limit) + jumlah total yang cocok"""
+        key = (search_text.strip().lower(), search_id.strip().lower(), search_nama.strip().lower(),
+               selected_date or "", limit)
+        with self._memo_lock:
+            hit = self._memo.get(key)
+            if hit is not None:
+                self._memo.move_to_end(key)
+        tracing.record_cache("pelanggan.search", hit=hit is not None)
+        if hit is not None:
+            return hit
+
+        text, q_id, q_nama = key[:3]
+        mask = np.ones(len(self.ids), dtype=bool)
+        if selected_date:
+            mask &= self.dates == selected_date
+        if text:
+            mask &= self._contains(self._ids_lower, text) | self._contains(self._names_lower, text)
+        if q_id:
+            mask &= self._contains(self._ids_lower, q_id)
+        if q_nama:
+            mask &= self._contains(self._names_lower, q_nama)
+        idx = np.flatnonzero(mask)
+
+        rank_id, rank_nama = text or q_id, text or q_nama
+        if len(idx) and (rank_id or rank_nama):
+            ids_l = self._ids_lower.iloc[idx]
+            names_l = self._names_lower.iloc[idx]
+            rank = np.full(len(idx), 4, dtype=np.int8)
+            if rank_id:
+                rank[ids_l.str.contains(rank_id, regex=False).to_numpy()] = 3
+            if rank_nama:
+                rank[names_l.str.startswith(rank_nama).to_numpy()] = 2
+            if rank_id:
+                rank[ids_l.str.startswith(rank_id).to_numpy()] = 1
+                rank[(ids_l == rank_id).to_numpy()] = 0
+            idx = idx[np.argsort(rank, kind="stable")]
+
+        result = (self.labels[idx[:limit]].tolist(), int(len(idx)))
+        with self._memo_lock:
+            self._memo[key] = result
+            if len(self._memo) > _SEARCH_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return result
+
+
+_indexes: Dict[Tuple[str, str], Tuple[Tuple[float, int], SearchIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def search_index(spreadsheet_id: str, gid: str) -> SearchIndex:
+    """SearchIndex untuk snapshot pelanggan saat ini (dibangun ulang bila snapshot baru)"""
+    df, fetched_at = _snapshot(spreadsheet_id, gid)
+    key = (str(spreadsheet_id), str(gid))
+    version = (fetched_at, len(df))  # reload delta mempertahankan fetched_at
+    with _indexes_lock:
+        cached = _indexes.get(key)
+    if cached is not None and cached[0] == version:
+        tracing.record_cache("pelanggan.search_index", hit=True)
+        return cached[1]
+    tracing.record_cache("pelanggan.search_index", hit=False)
+    with tracing.span("pelanggan.build_search_index"):
+        index = SearchIndex(df)
+    with _indexes_lock:
+        _indexes[key] = (version, index)
+    return index
+
+
+def prepare_display_df(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """Siapkan tabel Data Pelanggan (aman untuk Arrow) + rekap jumlah per daya"""
+    df = df.fillna("")
+    # khusus kolom yang bermasalah
+    if "Tarif / Daya" in df.columns:
+        df["Tarif / Daya"] = df["Tarif / Daya"].astype(str)
+
+    # jadikan semua kolom object -> string supaya aman di Arrow
+    for c in df.columns:
+        if df[c].dtype == "object":
+            df[c] = df[c].astype(str)
+
+    if "Foto KTP" in df.columns:
+        def ktp_link(v):
+            v = str(v).strip()
+            if v and v.lower() not in ["nan", "none", ""]:
+                return f'<a href="{v}" target="_blank">📷 Lihat KTP</a>'
+            return ""
+        df["Foto KTP"] = df["Foto KTP"].apply(ktp_link)
+
+    daya_count = None
+    if "Tarif / Daya" in df.columns:
+        daya_count = df["Tarif / Daya"].value_counts().reset_index()
+        daya_count.columns = ["Tarif / Daya", "Jumlah Pengguna"]
+
+    return df, daya_count
+
+
+# Penulisan per pelanggan diserialkan (dua petugas pada IDPEL yang sama): cari
+# baris + tulis sel + catat penulisan lokal terjadi di dalam satu lease, jadi
+# urutan nilai di sheet sama dengan urutan di penulisan lokal (tidak ada yang hilang).
+IDPEL_LEASE_TTL = 60
+IDPEL_LEASE_WAIT = 30
+
+
+def idpel_lease(spreadsheet_id: str, gid: str, idpel: str):
+    """Lease eksklusif untuk penulisan satu IDPEL (dalam proses + antar replika)"""
+    return shared_cache.lease(
+        f"idpel:{spreadsheet_id}:{gid}:{str(idpel).strip()}", ttl=IDPEL_LEASE_TTL, timeout=IDPEL_LEASE_WAIT
+    )
+
+
+def _lease_busy(what: str) -> str:
+    # awalan "Error: ... timeout" -> handler outbox menganggapnya transient (dicoba lagi)
+    return f"Error: timeout - {what} sedang diperbarui proses lain"
+
+
+def locate_rows(
+    ws, spreadsheet_id: str, gid: str, idpels: Sequence[str], field: str
+) -> Tuple[Dict[str, int], int, Optional[str]]:
+    """({idpel: baris terakhir}, kolom `field`, pesan_error) untuk banyak IDPEL.
+
+    Peta kolom diambil dari cache sheet_columns (tanpa baca header). Sel header
+    kolom ID ikut terbaca lewat col_values; bila tidak cocok lagi (kolom
+    disisipkan/dipindah), header dibaca ulang sekali dan peta diperbarui.
+    IDPEL yang tidak ada di sheet tidak muncul di hasil.
+    """
+    wanted = {str(i).strip() for i in idpels}
+    for refresh in (False, True):
+        cmap = sheet_columns.for_worksheet(ws, spreadsheet_id, gid, refresh=refresh)
+        missing = cmap.missing(field, "id_pelanggan")
+        if missing:
+            if not refresh:
+                continue
+            return {}, 0, f"Kolom '{sheet_columns.label(missing[0])}' tidak ditemukan"
+
+        with tracing.span("sheets.col_values") as sp:
+            id_values = ws.col_values(cmap.col("id_pelanggan"))
+            sp.bytes_in = tracing.payload_size(id_values)
+        if not id_values or not sheet_columns.matches("id_pelanggan", id_values[0]):
+            tracing.record_event("sheet_columns.header_changed")
+            sheet_columns.forget(spreadsheet_id, gid)
+            continue
+
+        rows: Dict[str, int] = {}
+        for i in range(1, len(id_values)):
+            v = str(id_values[i]).strip()
+            if v in wanted:
+                rows[v] = i + 1  # baris terakhir yang cocok menang
+        return rows, cmap.col(field), None
+    return {}, 0, "Kolom 'ID Pelanggan' tidak ditemukan"
+
+
+def locate_cell(ws, spreadsheet_id: str, gid: str, idpel: str, field: str) -> Tuple[int, int, Optional[str]]:
+    """(baris, kolom, pesan_error) sel `field` untuk baris terakhir IDPEL"""
+    rows, col, error = locate_rows(ws, spreadsheet_id, gid, [idpel], field)
+    if error:
+        return 0, 0, error
+    row = rows.get(str(idpel).strip())
+    if row is None:
+        return 0, 0, f"ID Pelanggan {idpel} tidak ditemukan"
+    return row, col, None
+
+
+@tracing.traced("pelanggan.update_tanggal_eksekusi")
+def update_tanggal_eksekusi(spreadsheet_id: str, gid: str, idpel: str, tanggal: str) -> dict:
+    try:
+        sh = open_spreadsheet(spreadsheet_id)
+        target_ws = get_worksheet(sh, gid=gid)
+
+        if target_ws is None:
+            return {"success": False, "message": "Worksheet tidak ditemukan"}
+
+        with idpel_lease(spreadsheet_id, gid, idpel):
+            matched_row, eksekusi_col, error = locate_cell(target_ws, spreadsheet_id, gid, idpel, "tanggal_eksekusi")
+            if error:
+                return {"success": False, "message": error}
+
+            with own_write(spreadsheet_id, gid), tracing.span("sheets.update_cell", payload=tanggal):
+                target_ws.update_cell(matched_row, eksekusi_col, tanggal)
+            record_local_write(spreadsheet_id, gid, idpel, sheet_columns.label("tanggal_eksekusi"), tanggal)
+
+        return {"success": True, "message": f"Berhasil update row {matched_row}"}
+
+    except shared_cache.LeaseTimeout:
+        return {"success": False, "message": _lease_busy(f"ID Pelanggan {idpel}")}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}"}
+
+
+@tracing.traced("pelanggan.update_tanggal_eksekusi_batch")
+def update_tanggal_eksekusi_batch(spreadsheet_id: str, gid: str, updates: Dict[str, str]) -> dict:
+    """Tulis TanggalEksekusi banyak IDPEL ({idpel: tanggal}) dalam satu values_batch_update"""
+    try:
+        sh = open_spreadsheet(spreadsheet_id)
+        target_ws = get_worksheet(sh, gid=gid)
+
+        if target_ws is None:
+            return {"success": False, "message": "Worksheet tidak ditemukan", "rows": {}, "missing": list(updates)}
+
+        updates = {str(k).strip(): v for k, v in updates.items()}
+        with ExitStack() as leases:
+            # urutan tetap (terurut) agar dua batch yang beririsan tidak saling menunggu
+            for idpel in sorted(updates):
+                leases.enter_context(idpel_lease(spreadsheet_id, gid, idpel))
+
+            rows, eksekusi_col, error = locate_rows(target_ws, spreadsheet_id, gid, list(updates), "tanggal_eksekusi")
+            if error:
+                return {"success": False, "message": error, "rows": {}, "missing": list(updates)}
+            missing = [idpel for idpel in updates if idpel not in rows]
+            if not rows:
+                return {"success": False, "message": "Tidak ada ID Pelanggan yang ditemukan", "rows": {}, "missing": missing}
+
+            letter = sheet_columns.col_letter(eksekusi_col)
+            body = {
+                "valueInputOption": "USER_ENTERED",
+                "data": [
+                    {"range": sheet_columns.a1_range(target_ws.title, f"{letter}{row}"), "values": [[updates[idpel]]]}
+                    for idpel, row in rows.items()
+                ],
+            }
+            with own_write(spreadsheet_id, gid), tracing.span("sheets.values_batch_update", payload=body):
+                sh.values_batch_update(body=body)
+            label = sheet_columns.label("tanggal_eksekusi")
+            for idpel in rows:
+                record_local_write(spreadsheet_id, gid, idpel, label, updates[idpel])
+
+        return {
+            "success": True,
+            "message": f"Berhasil update {len(rows)} baris",
+            "rows": rows,
+            "missing": missing,
+        }
+
+    except shared_cache.LeaseTimeout:
+        return {"success": False, "message": _lease_busy("salah satu ID Pelanggan"), "rows": {}, "missing": list(updates)}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {str(e)}", "rows": {}, "missing": list(updates)}
@@ -0,0 +1,154 @@
+# rekap_ledger.py - Riwayat rekap lokal (SQLite), terindeks per IDPEL & tanggal
+#
+# Hasil rekap selama ini hanya ada sebagai tab "REKAP <nama> - <ts>_Vendor/Pelanggan"
+# dan yang lebih lama dari KEEP_LATEST_TABS dihapus cleanup_old_rekap. Setiap
+# export yang berhasil juga dicatat di sini: IDPEL, waktu, meta, volume item,
+# total Vendor/Pelanggan dan sheetId tab. Halaman Proses membaca riwayat dari
+# sini (tanpa memindai judul tab) dan bisa export ulang tanpa membaca Sheets.
+#
+# Append-only: baris tidak pernah dihapus. Export ulang dengan judul yang sama
+# (retry antrean outbox) hanya memperbarui sheetId baris tersebut.
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import streamlit as st
+
+import tracing
+
+try:
+    REKAP_LEDGER_PATH = str(st.secrets.get("REKAP_LEDGER_PATH", ".data/rekap_ledger.sqlite3"))
+except Exception:
+    REKAP_LEDGER_PATH = ".data/rekap_ledger.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rekap (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spreadsheet_id TEXT NOT NULL,
+    idpel TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    tanggal TEXT NOT NULL,
+    title_vendor TEXT NOT NULL,
+    title_pelanggan TEXT NOT NULL,
+    meta TEXT NOT NULL,
+    items TEXT NOT NULL,
+    total_vendor REAL NOT NULL,
+    total_pelanggan REAL NOT NULL,
+    sheet_id_vendor INTEGER,
+    sheet_id_pelanggan INTEGER,
+    values_mode INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (spreadsheet_id, title_vendor)
+);
+CREATE INDEX IF NOT EXISTS idx_rekap_idpel ON rekap(idpel, created_at);
+CREATE INDEX IF NOT EXISTS idx_rekap_tanggal ON rekap(tanggal, created_at);
+"""
+
+WIB = timezone(timedelta(hours=7))  # tanggal ledger mengikuti Asia/Jakarta
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def _connect() -> sqlite3.Connection:
+    path = REKAP_LEDGER_PATH
+    if path not in _initialized:
+        with _init_lock:
+            if path not in _initialized:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                conn = sqlite3.connect(path, timeout=30)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                conn.close()
+                _initialized.add(path)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def record(
+    spreadsheet_id: str,
+    idpel: str,
+    title_vendor: str,
+    title_pelanggan: str,
+    meta: dict,
+    items: List[dict],
+    total_vendor: float,
+    total_pelanggan: float,
+    sheet_id_vendor: Optional[int] = None,
+    sheet_id_pelanggan: Optional[int] = None,
+    values_mode: bool = False,
+    created_at: Optional[float] = None,
+) -> int:
+    """Catat satu rekap yang berhasil diexport; return id baris ledger"""
+    created_at = time.time() if created_at is None else created_at
+    tanggal = datetime.fromtimestamp(created_at, tz=WIB).strftime("%Y-%m-%d")
+    with tracing.span("rekap_ledger.record"):
+        conn = _connect()
+        try:
+            conn.execute(
+                "INSERT INTO rekap (spreadsheet_id, idpel, created_at, tanggal, title_vendor, title_pelanggan, "
+                "meta, items, total_vendor, total_pelanggan, sheet_id_vendor, sheet_id_pelanggan, values_mode) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (spreadsheet_id, title_vendor) DO UPDATE SET "
+                "sheet_id_vendor = excluded.sheet_id_vendor, sheet_id_pelanggan = excluded.sheet_id_pelanggan",
+                (
+                    str(spreadsheet_id), str(idpel).strip(), created_at, tanggal, title_vendor, title_pelanggan,
+                    json.dumps(meta, default=str), json.dumps(items, default=str),
+                    float(total_vendor), float(total_pelanggan),
+                    sheet_id_vendor, sheet_id_pelanggan, int(bool(values_mode)),
+                ),
+            )
+            row = conn.execute(
+                "SELECT id FROM rekap WHERE spreadsheet_id = ? AND title_vendor = ?",
+                (str(spreadsheet_id), title_vendor),
+            ).fetchone()
+            return int(row["id"])
+        finally:
+            conn.close()
+
+
+def _row_dict(row: sqlite3.Row) -> dict:
+    d = dict(row)
+    d["meta"] = json.loads(d["meta"])
+    d["items"] = json.loads(d["items"])
+    d["values_mode"] = bool(d["values_mode"])
+    return d
+
+
+def history(idpel: str, limit: int = 50) -> List[dict]:
+    """Rekap sebelumnya untuk satu IDPEL, terbaru dulu (lewat idx_rekap_idpel)"""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM rekap WHERE idpel = ? ORDER BY created_at DESC LIMIT ?",
+            (str(idpel).strip(), limit),
+        ).fetchall()
+        return [_row_dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def by_date(tanggal_from: str, tanggal_to: Optional[str] = None, limit: int = 1000) -> List[dict]:
+    """Rekap dalam rentang tanggal YYYY-MM-DD (inklusif), terbaru dulu"""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM rekap WHERE tanggal BETWEEN ? AND ? ORDER BY created_at DESC LIMIT ?",
+            (tanggal_from, tanggal_to or tanggal_from, limit),
+        ).fetchall()
+        return [_row_dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
+def get(entry_id: int) -> Optional[dict]:
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM rekap WHERE id = ?", (int(entry_id),)).fetchone()
+        return _row_dict(row) if row else None
+    finally:
+        conn.close()
@@ -0,0 +1,176 @@
+# rekap_pdf.py - Render PDF rekap harga (halaman Proses GGAL)
+#
+# Style & font ReportLab disiapkan sekali saat import, bukan per render. PDF
+# hanya dibuat saat diminta dan di-memo berdasarkan hash input, jadi rerun
+# halaman tanpa perubahan tidak membangun ulang dokumen. Mode batch merender
+# banyak pelanggan sekaligus: satu PDF multi-halaman atau ZIP per pelanggan
+# (ZIP dirender paralel di satu process pool "spawn" yang dipakai ulang
+# sepanjang umur server; fork di dalam server Streamlit yang multi-thread
+# tidak aman). Teks dari sheet di-escape sebelum masuk markup Paragraph.
+import atexit
+import hashlib
+import io
+import json
+import os
+import multiprocessing
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Sequence
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+import tracing
+
+PDF_MEMO_SIZE = 64
+BATCH_MIN_PARALLEL = 4  # di bawah ini render inline; antre ke process lebih mahal
+BATCH_POOL_WORKERS = max(1, min(os.cpu_count() or 1, 4))
+
+# === Disiapkan sekali per proses ===
+_STYLES = getSampleStyleSheet()
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+_COL_WIDTHS = [1.5 * cm, 7 * cm, 2 * cm, 3 * cm, 3 * cm]
+for _font in ("Helvetica", "Helvetica-Bold"):
+    pdfmetrics.getFont(_font)  # muat metrik font sekarang, bukan saat render pertama
+
+_memo: "OrderedDict[str, bytes]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _rekap_elements(pelanggan: Dict, rows: Sequence[Dict], total, ppn, grand_total) -> list:
+    elements = []
+
+    # Judul
+    elements.append(Paragraph("<b>REKAP HARGA PEKERJAAN</b>", _STYLES['Title']))
+    elements.append(Spacer(1, 12))
+
+    # Data pelanggan
+    elements.append(Paragraph(f"Nama: {escape(str(pelanggan['Nama']))}", _STYLES['Normal']))
+    elements.append(Paragraph(f"Alamat: {escape(str(pelanggan['Alamat']))}", _STYLES['Normal']))
+    elements.append(Spacer(1, 12))
+
+    # Tabel barang
+    table_data = [["No", "Barang", "Qty", "Harga Satuan", "Subtotal"]]
+    for i, row in enumerate(rows):
+        table_data.append([
+            i + 1,
+            row["Barang"],
+            row["Qty"],
+            f"Rp {row['Harga Satuan']:,}",
+            f"Rp {row['Subtotal']:,}",
+        ])
+    table = Table(table_data, colWidths=_COL_WIDTHS)
+    table.setStyle(_TABLE_STYLE)
+    elements.append(table)
+    elements.append(Spacer(1, 12))
+
+    # Total
+    elements.append(Paragraph(f"<b>TOTAL MATERIAL: Rp {total:,}</b>", _STYLES['Normal']))
+    elements.append(Paragraph(f"PPN (11%): Rp {ppn:,}", _STYLES['Normal']))
+    elements.append(Paragraph(f"<b>TOTAL BIAYA SETELAH PPN: Rp {grand_total:,}</b>", _STYLES['Heading2']))
+    return elements
+
+
+def _build(elements: list) -> bytes:
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4).build(elements)
+    return buffer.getvalue()
+
+
+def render_rekap_pdf(job: Dict) -> bytes:
+    """job = {pelanggan, rows, total, ppn, grand_total} -> bytes PDF (tanpa memo)"""
+    return _build(_rekap_elements(job["pelanggan"], job["rows"], job["total"], job["ppn"], job["grand_total"]))
+
+
+def job_digest(job: Dict) -> str:
+    return hashlib.sha256(json.dumps(job, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def rekap_pdf(job: Dict) -> bytes:
+    """PDF rekap, di-memo per hash input (rerun dengan input sama tidak render ulang)"""
+    key = job_digest(job)
+    with _memo_lock:
+        pdf = _memo.get(key)
+        if pdf is not None:
+            _memo.move_to_end(key)
+    tracing.record_cache("rekap_pdf.rekap_pdf", hit=pdf is not None)
+    if pdf is not None:
+        return pdf
+    with tracing.span("rekap_pdf.render"):
+        pdf = render_rekap_pdf(job)
+    with _memo_lock:
+        _memo[key] = pdf
+        if len(_memo) > PDF_MEMO_SIZE:
+            _memo.popitem(last=False)
+    return pdf
+
+
+@tracing.traced("rekap_pdf.render_batch_pdf")
+def render_batch_pdf(jobs: List[Dict]) -> bytes:
+    """Banyak rekap dalam satu PDF, satu pelanggan per halaman"""
+    elements = []
+    for i, job in enumerate(jobs):
+        if i:
+            elements.append(PageBreak())
+        elements.extend(_rekap_elements(job["pelanggan"], job["rows"], job["total"], job["ppn"], job["grand_total"]))
+    return _build(elements)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Process pool bersama (spawn), dibuat sekali saat batch pertama"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=BATCH_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@tracing.traced("rekap_pdf.render_batch_zip")
+def render_batch_zip(jobs: List[Dict], names: List[str], workers: int = 0) -> bytes:
+    """ZIP berisi satu PDF per pelanggan; render paralel di process pool bersama"""
+    workers = min(workers or BATCH_POOL_WORKERS, BATCH_POOL_WORKERS, len(jobs))
+    if len(jobs) < BATCH_MIN_PARALLEL or workers <= 1:
+        pdfs = [rekap_pdf(job) for job in jobs]
+    else:
+        pool = _get_pool()
+        try:
+            pdfs = list(pool.map(render_rekap_pdf, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        except BrokenProcessPool:
+            # worker mati (mis. OOM): buang pool, render sisanya inline
+            tracing.record_event("rekap_pdf.pool_broken")
+            _drop_pool(pool)
+            pdfs = [rekap_pdf(job) for job in jobs]
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, pdf in zip(names, pdfs):
+            zf.writestr(name, pdf)
+    return buffer.getvalue()
@@ -0,0 +1,73 @@
+# session_stats.py - Perkiraan memori session_state per sesi Streamlit
+#
+# Dipakai halaman Admin (laporan memori sesi) dan bench/ (uji beban banyak sesi).
+# Ukuran adalah perkiraan: array/DataFrame dihitung dari buffer datanya, nilai
+# lain dari ukuran pickle-nya (fallback sys.getsizeof).
+import pickle
+import sys
+from typing import Any, Dict, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+
+def value_size(value: Any) -> int:
+    """Perkiraan byte untuk satu nilai session_state"""
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def footprint(state: Mapping[str, Any]) -> List[dict]:
+    """Ukuran per key session_state, terbesar dulu"""
+    rows = []
+    for key in list(state.keys()):
+        try:
+            value = state[key]
+        except Exception:
+            continue
+        rows.append({"key": str(key), "type": type(value).__name__, "bytes": value_size(value)})
+    rows.sort(key=lambda r: r["bytes"], reverse=True)
+    return rows
+
+
+def total_bytes(state: Mapping[str, Any]) -> int:
+    return sum(r["bytes"] for r in footprint(state))
+
+
+def active_sessions() -> List[Dict[str, Any]]:
+    """Ringkasan semua sesi aktif di proses ini (best-effort, API internal Streamlit).
+
+    Return [] bila runtime tidak tersedia (mis. dijalankan di luar `streamlit run`).
+    """
+    try:
+        from streamlit import runtime
+
+        if not runtime.exists():
+            return []
+        mgr = runtime.get_instance()._session_mgr
+        infos = mgr.list_active_sessions()
+    except Exception:
+        return []
+    rows = []
+    for info in infos:
+        try:
+            state = info.session.session_state.filtered_state
+        except Exception:
+            continue
+        sizes = footprint(state)
+        rows.append({
+            "session": str(info.session.id)[:8],
+            "keys": len(sizes),
+            "bytes": sum(r["bytes"] for r in sizes),
+            "largest_key": sizes[0]["key"] if sizes else "",
+        })
+    rows.sort(key=lambda r: r["bytes"], reverse=True)
+    return rows
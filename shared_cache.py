@@ -0,0 +1,476 @@
+# shared_cache.py - Cache bersama antar replika Streamlit
+#
+# Snapshot pelanggan, registry worksheet, peta folder Drive dan token bucket
+# rate-limit Sheets disimpan di sini, bukan di st.cache_data/lru_cache per proses.
+# Default-nya lokal (satu proses). Dengan SHARED_CACHE_URL = "redis://..." semua
+# replika di belakang load balancer berbagi cache & kuota yang sama, sehingga
+# jumlah panggilan API tidak ikut berlipat saat replika ditambah.
+#
+#   SHARED_CACHE_URL = ""            -> LocalCache (default)
+#   SHARED_CACHE_URL = "redis://..." -> RedisCache (butuh paket redis)
+#   SHARED_CACHE_URL = "fake-redis"  -> RedisCache di atas FakeRedis (tanpa server)
+import fnmatch
+import pickle
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager, nullcontext
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import streamlit as st
+
+import tracing
+
+try:
+    SHARED_CACHE_URL = str(st.secrets.get("SHARED_CACHE_URL", "") or "")
+    SHARED_CACHE_PREFIX = str(st.secrets.get("SHARED_CACHE_PREFIX", "geser_meter:"))
+except Exception:
+    SHARED_CACHE_URL = ""
+    SHARED_CACHE_PREFIX = "geser_meter:"
+
+
+class LeaseTimeout(TimeoutError):
+    """Lock/lease per kunci tidak didapat dalam batas waktu"""
+
+
+class KeyedLock:
+    """Lock dalam proses per kunci; entri dibuang lagi saat tidak ada pemegang/penunggu.
+
+    Aman untuk kunci yang jumlahnya tidak terbatas (mis. satu per IDPEL).
+    """
+
+    def __init__(self):
+        self._mu = threading.Lock()
+        self._entries: Dict[str, list] = {}  # kunci -> [Lock, jumlah pemegang + penunggu]
+
+    def acquire(self, key: str, timeout: float) -> bool:
+        with self._mu:
+            entry = self._entries.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        if entry[0].acquire(timeout=max(0.0, timeout)):
+            return True
+        self._unref(key, entry)
+        return False
+
+    def release(self, key: str) -> None:
+        with self._mu:
+            entry = self._entries[key]
+        entry[0].release()
+        self._unref(key, entry)
+
+    def _unref(self, key: str, entry: list) -> None:
+        with self._mu:
+            entry[1] -= 1
+            if entry[1] == 0 and self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        with self._mu:
+            return len(self._entries)
+
+
+class LocalCache:
+    """Cache dalam proses (dict + TTL). Nilai disimpan apa adanya, tanpa pickle."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+        self._lock = threading.RLock()
+        self._locks = KeyedLock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 10.0, ttl: Optional[float] = None):
+        # ttl (lama lease) tidak relevan dalam satu proses: lock dilepas oleh pemegangnya
+        if not self._locks.acquire(name, timeout):
+            raise LeaseTimeout(f"Lock '{name}' tidak didapat dalam {timeout} detik")
+        try:
+            yield
+        finally:
+            self._locks.release(name)
+
+
+# Lepas lock hanya bila token masih milik kita, dalam satu langkah atomik di
+# server (seperti Lock redis-py): GET lalu DELETE terpisah bisa menghapus lock
+# yang sudah kedaluwarsa dan diambil replika lain di antara keduanya.
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class RedisCache:
+    """Cache di Redis (atau klien yang kompatibel); nilai di-pickle."""
+
+    LOCK_POLL = 0.02
+
+    def __init__(self, client: Any):
+        self.client = client
+        self._release = client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raw = self.client.get(key)
+        return default if raw is None else pickle.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        px = int(ttl * 1000) if ttl else None
+        self.client.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=px)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    @contextmanager
+    def lock(self, name: str, timeout: float = 10.0, ttl: Optional[float] = None):
+        """Lock antar replika: SET NX PX dengan token, lepas hanya bila masih milik kita.
+
+        ttl = lama lease (default = timeout); lewat dari itu lock berakhir sendiri
+        (pemegang mati/terlalu lama) dan replika lain boleh mengambilnya.
+        """
+        key = f"lock:{name}"
+        token = uuid.uuid4().hex.encode()
+        deadline = time.monotonic() + timeout
+        while not self.client.set(key, token, nx=True, px=int((ttl or timeout) * 1000)):
+            if time.monotonic() >= deadline:
+                raise LeaseTimeout(f"Lock '{name}' tidak didapat dalam {timeout} detik")
+            time.sleep(self.LOCK_POLL)
+        try:
+            yield
+        finally:
+            if not self._release(keys=[key], args=[token]):
+                tracing.record_event("shared_cache.lease_expired")
+
+
+class FakeRedis:
+    """Stand-in lokal untuk subset redis-py yang dipakai RedisCache (tanpa server)."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.RLock()
+        self.commands = 0
+
+    def _alive(self, key: str) -> bool:
+        item = self._data.get(key)
+        if item is None:
+            return False
+        if item[1] is not None and item[1] <= time.time():
+            del self._data[key]
+            return False
+        return True
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            self.commands += 1
+            return self._data[name][0] if self._alive(name) else None
+
+    def set(self, name: str, value: Any, ex: Optional[float] = None, px: Optional[int] = None,
+            nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            self.commands += 1
+            if nx and self._alive(name):
+                return None
+            if isinstance(value, str):
+                value = value.encode()
+            ttl = px / 1000 if px else ex
+            self._data[name] = (bytes(value), time.time() + ttl if ttl else None)
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            self.commands += 1
+            return sum(1 for n in names if self._data.pop(n, None) is not None)
+
+    def register_script(self, script: str):
+        """Hanya skrip yang dipakai RedisCache, dijalankan sebagai fungsi Python"""
+        if script != RELEASE_LOCK_SCRIPT:
+            raise NotImplementedError("FakeRedis hanya mendukung RELEASE_LOCK_SCRIPT")
+
+        def release(keys, args) -> int:
+            with self._lock:
+                self.commands += 1
+                token = args[0].encode() if isinstance(args[0], str) else args[0]
+                if self._alive(keys[0]) and self._data[keys[0]][0] == token:
+                    del self._data[keys[0]]
+                    return 1
+                return 0
+        return release
+
+    def scan_iter(self, match: Optional[str] = None):
+        with self._lock:
+            self.commands += 1
+            keys = [k for k in list(self._data) if self._alive(k)]
+        return iter([k for k in keys if match is None or fnmatch.fnmatchcase(k, match)])
+
+
+# === Backend aktif ===
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _build_backend(url: str):
+    if not url or url == "local":
+        return LocalCache()
+    if url == "fake-redis":
+        return RedisCache(FakeRedis())
+    import redis  # opsional, hanya untuk deployment multi-replika
+
+    return RedisCache(redis.Redis.from_url(url))
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _build_backend(SHARED_CACHE_URL)
+    return _backend
+
+
+def set_backend(backend) -> None:
+    """Ganti backend cache (mis. RedisCache(FakeRedis()) di bench/); None = dari secrets"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _key(key: str) -> str:
+    return SHARED_CACHE_PREFIX + key
+
+
+def get(key: str, default: Any = None) -> Any:
+    return get_backend().get(_key(key), default)
+
+
+def set(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    get_backend().set(_key(key), value, ttl)
+
+
+def delete(key: str) -> None:
+    get_backend().delete(_key(key))
+
+
+def delete_prefix(prefix: str) -> None:
+    get_backend().delete_prefix(_key(prefix))
+
+
+def lock(name: str, timeout: float = 10.0):
+    return get_backend().lock(_key(name), timeout)
+
+
+# === Lease per kunci (penulisan per IDPEL, retensi tab REKAP) ===
+# Di dalam proses, thread yang berebut kunci yang sama antre di KeyedLock (tanpa
+# polling). Dengan backend Redis pemegang juga mengambil lease di Redis sehingga
+# replika lain ikut menunggu; lease berakhir sendiri setelah ttl bila pemegangnya
+# mati. Reentrant per thread: lease yang sudah dipegang thread ini dilewati.
+LEASE_TTL = 60
+LEASE_WAIT = 30
+
+_leases = KeyedLock()
+_held = threading.local()
+
+
+@contextmanager
+def lease(name: str, ttl: float = LEASE_TTL, timeout: float = LEASE_WAIT):
+    """Pegang kunci `name` secara eksklusif; LeaseTimeout bila tidak didapat dalam timeout detik"""
+    held = _held.__dict__.setdefault("names", {})  # dict sebagai set: `set` di modul ini = shared_cache.set
+    if name in held:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    if not _leases.acquire(name, timeout):
+        tracing.record_event("shared_cache.lease_timeout")
+        raise LeaseTimeout(f"Lease '{name}' tidak didapat dalam {timeout} detik")
+    try:
+        backend = get_backend()
+        shared = (
+            backend.lock(_key(f"lease:{name}"), max(0.0, deadline - time.monotonic()), ttl=ttl)
+            if isinstance(backend, RedisCache)
+            else nullcontext()
+        )
+        with shared:
+            held[name] = True
+            try:
+                yield
+            finally:
+                held.pop(name, None)
+    finally:
+        _leases.release(name)
+
+
+# === Single-flight & stale-while-revalidate ===
+# Saat TTL habis, banyak sesi bisa rerun bersamaan. Hanya satu loader per key
+# yang jalan di proses ini (yang lain menunggu hasilnya), dan antar replika
+# dikoordinasi lewat lock() + cek ulang cache. Dengan stale_ttl, nilai lama
+# tetap disajikan selama refresh berjalan di thread latar belakang.
+LOAD_LOCK_TIMEOUT = 60
+
+_flights: Dict[str, "_Flight"] = {}
+_flights_lock = threading.Lock()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+def _single_flight(key: str, fn: Callable[[], Any]) -> Any:
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        tracing.record_event("shared_cache.coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = fn()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.done.set()
+
+
+def _load(key: str, loader: Callable[[], Any], ttl: Optional[float], stale_ttl: Optional[float], force: bool) -> Any:
+    def store():
+        value = loader()
+        fresh_until = time.time() + ttl if ttl else float("inf")
+        set(key, (value, fresh_until), ttl + (stale_ttl or 0) if ttl else None)
+        return value
+
+    def run():
+        with ExitStack() as stack:
+            # hanya gagal ambil lock yang memuat tanpa lock; TimeoutError dari
+            # loader sendiri diteruskan ke pemanggil
+            try:
+                stack.enter_context(lock(f"flight:{key}", timeout=LOAD_LOCK_TIMEOUT))
+            except LeaseTimeout:
+                tracing.record_event("shared_cache.flight_lock_timeout")
+                return store()
+            if not force:
+                # replika lain mungkin sudah mengisi selagi kita menunggu lock
+                entry = get(key)
+                if entry is not None and entry[1] > time.time():
+                    return entry[0]
+            return store()
+
+    return _single_flight(key, run)
+
+
+def _refresh_in_background(key: str, loader: Callable[[], Any], ttl: Optional[float], stale_ttl: Optional[float]) -> None:
+    with _flights_lock:
+        if key in _flights:
+            return
+
+    def run():
+        try:
+            _load(key, loader, ttl, stale_ttl, force=False)
+        except Exception:
+            tracing.record_event("shared_cache.refresh_failed")
+
+    threading.Thread(target=run, name=f"refresh:{key}", daemon=True).start()
+
+
+def get_or_set(
+    key: str,
+    loader: Callable[[], Any],
+    ttl: Optional[float] = None,
+    name: Optional[str] = None,
+    stale_ttl: Optional[float] = None,
+    force: bool = False,
+) -> Any:
+    """Ambil dari cache bersama; bila tidak ada, panggil loader() dan simpan.
+
+    stale_ttl: setelah ttl lewat, nilai lama masih dikembalikan selama stale_ttl
+    detik sambil di-refresh di latar belakang. force=True selalu memuat ulang
+    (tetap single-flight). loader tidak boleh memakai st.* bila stale_ttl diset.
+    """
+    entry = None if force else get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if name:
+            tracing.record_cache(name, hit=True)
+        if fresh_until <= time.time():
+            tracing.record_event("shared_cache.served_stale")
+            _refresh_in_background(key, loader, ttl, stale_ttl)
+        return value
+    if name:
+        tracing.record_cache(name, hit=False)
+    return _load(key, loader, ttl, stale_ttl, force)
+
+
+# === Rate limit bersama ===
+class TokenBucket:
+    """Token bucket yang state-nya di cache bersama: kuota dibagi semua replika.
+
+    rate = token per detik, capacity = burst maksimum. acquire() menunggu sampai
+    token tersedia (maks max_wait detik), lalu mengembalikan lama menunggu.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+
+    def _take(self, tokens: float) -> float:
+        key = f"bucket:{self.name}"
+        with lock(key):
+            now = time.time()
+            state = get(key) or {"tokens": self.capacity, "updated": now}
+            available = min(self.capacity, state["tokens"] + (now - state["updated"]) * self.rate)
+            if available >= tokens:
+                set(key, {"tokens": available - tokens, "updated": now}, ttl=3600)
+                return 0.0
+            set(key, {"tokens": available, "updated": now}, ttl=3600)
+            return (tokens - available) / self.rate
+
+    def acquire(self, tokens: float = 1.0, max_wait: float = 60.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                if waited:
+                    tracing.record_event(f"ratelimit.{self.name}.throttled")
+                return waited
+            if waited + wait > max_wait:
+                raise TimeoutError(f"Rate limit '{self.name}': menunggu lebih dari {max_wait} detik")
+            time.sleep(wait)
+            waited += wait
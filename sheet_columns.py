@@ -0,0 +1,151 @@
+# sheet_columns.py - Peta kolom sheet pelanggan (field logis -> indeks & huruf A1)
+#
+# Header form response bisa bervariasi ("ID pelanggan ", "Tanggal Survey",
+# "TanggalEksekusi", ...). Pencocokan dilakukan di satu tempat: header
+# dinormalisasi (huruf kecil, tanpa spasi/tanda baca) lalu harus sama persis
+# dengan salah satu alias field. Tidak ada pencocokan "mengandung": kolom lain
+# seperti "Alamat Email" atau "Nama Petugas" tidak boleh terbaca sebagai
+# Alamat/Nama; varian header baru ditambahkan ke FIELDS. Peta dibangun sekali per versi header (tuple header yang sama
+# -> objek yang sama) dan dipakai bersama oleh pembaca (snapshot pelanggan,
+# kolom diganti ke label kanonik) maupun penulis (update Tanggal Survey /
+# TanggalEksekusi), sehingga penulis tidak perlu row_values(1) setiap kali.
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import tracing
+
+# field logis -> (label kanonik, alias header ternormalisasi, dicocokkan persis)
+FIELDS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "timestamp": ("Timestamp", ("timestamp", "capwaktu")),
+    "id_pelanggan": ("ID Pelanggan", ("idpelanggan", "idpel")),
+    "nama": ("Nama", ("nama", "namapelanggan")),
+    "alamat": ("Alamat kWH Meter", ("alamatkwhmeter", "alamat")),
+    "tarif_daya": ("Tarif / Daya", ("tarifdaya", "daya")),
+    "foto_ktp": ("Foto KTP", ("fotoktp",)),
+    "tanggal_survey": ("Tanggal Survey", ("tanggalsurvey", "tglsurvey")),
+    "tanggal_eksekusi": ("TanggalEksekusi", ("tanggaleksekusi", "tgleksekusi")),
+}
+
+_RE_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_header(name) -> str:
+    return _RE_NON_ALNUM.sub("", str(name).strip().lower())
+
+
+def a1_range(title: str, cells: str) -> str:
+    """Judul tab + sel -> "'Judul'!A1:B2" (kutip tunggal di judul digandakan)"""
+    return "'" + str(title).replace("'", "''") + "'!" + cells
+
+
+def col_letter(col: int) -> str:
+    """1 -> 'A', 27 -> 'AA'"""
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def matches(field: str, header_cell) -> bool:
+    """Apakah satu sel header cocok dengan field logis"""
+    return normalize_header(header_cell) in FIELDS[field][1]
+
+
+class ColumnMap:
+    """Field logis -> posisi kolom untuk satu versi header (read-only)"""
+
+    def __init__(self, header: Sequence[str]):
+        self.header: Tuple[str, ...] = tuple(str(h) for h in header)
+        norm = [normalize_header(h) for h in self.header]
+        taken = set()
+        self._idx: Dict[str, int] = {}
+        for field, (_, keys) in FIELDS.items():
+            found = next((i for i, n in enumerate(norm) if n in keys and i not in taken), None)
+            if found is not None:
+                self._idx[field] = found
+                taken.add(found)
+
+    def index(self, field: str) -> Optional[int]:
+        """Indeks 0-based (posisi kolom DataFrame), None bila tidak ada"""
+        return self._idx.get(field)
+
+    def col(self, field: str) -> Optional[int]:
+        """Nomor kolom 1-based untuk update_cell/col_values"""
+        i = self._idx.get(field)
+        return None if i is None else i + 1
+
+    def letter(self, field: str) -> Optional[str]:
+        i = self._idx.get(field)
+        return None if i is None else col_letter(i + 1)
+
+    def a1(self, field: str, row: int) -> Optional[str]:
+        letter = self.letter(field)
+        return None if letter is None else f"{letter}{row}"
+
+    def header_name(self, field: str) -> Optional[str]:
+        i = self._idx.get(field)
+        return None if i is None else self.header[i]
+
+    def missing(self, *fields: str) -> List[str]:
+        return [f for f in fields if f not in self._idx]
+
+    def renames(self) -> Dict[str, str]:
+        """Header asli -> label kanonik (hanya yang berbeda & tidak bentrok)"""
+        out = {}
+        for field, i in self._idx.items():
+            label = FIELDS[field][0]
+            if self.header[i] != label and label not in self.header:
+                out[self.header[i]] = label
+        return out
+
+
+def label(field: str) -> str:
+    return FIELDS[field][0]
+
+
+@lru_cache(maxsize=32)
+def _map_for_header(header: Tuple[str, ...]) -> ColumnMap:
+    return ColumnMap(header)
+
+
+def map_for_header(header: Sequence[str]) -> ColumnMap:
+    """ColumnMap untuk satu versi header (di-cache per tuple header)"""
+    return _map_for_header(tuple(str(h) for h in header))
+
+
+# === Peta terakhir per sheet (per proses) ===
+# Diisi saat snapshot pelanggan di-fetch (header ikut terbaca) atau saat penulis
+# terpaksa membaca header sendiri; dibuang bila verifikasi header gagal.
+_maps_lock = threading.Lock()
+_maps: Dict[Tuple[str, str], ColumnMap] = {}
+
+
+def remember(spreadsheet_id: str, gid: str, header: Sequence[str]) -> ColumnMap:
+    cmap = map_for_header(header)
+    with _maps_lock:
+        _maps[(str(spreadsheet_id), str(gid))] = cmap
+    return cmap
+
+
+def forget(spreadsheet_id: str, gid: str) -> None:
+    with _maps_lock:
+        _maps.pop((str(spreadsheet_id), str(gid)), None)
+
+
+def cached_map(spreadsheet_id: str, gid: str) -> Optional[ColumnMap]:
+    with _maps_lock:
+        return _maps.get((str(spreadsheet_id), str(gid)))
+
+
+def for_worksheet(ws, spreadsheet_id: str, gid: str, refresh: bool = False) -> ColumnMap:
+    """Peta kolom untuk worksheet; header hanya dibaca bila belum ada/refresh"""
+    cmap = None if refresh else cached_map(spreadsheet_id, gid)
+    tracing.record_cache("sheet_columns.for_worksheet", hit=cmap is not None)
+    if cmap is not None:
+        return cmap
+    with tracing.span("sheets.row_values"):
+        header = ws.row_values(1)
+    return remember(spreadsheet_id, gid, header)
@@ -0,0 +1,195 @@
+# sheet_ingest.py - Baca sheet besar per potongan baris langsung ke kolom bertipe
+#
+# get_all_records membuat satu dict Python per baris lalu pd.DataFrame(data)
+# menyalinnya lagi; puncak memori beberapa kali ukuran DataFrame akhir. Di sini
+# sheet dibaca per INGEST_CHUNK_ROWS baris dengan values.get, tiap potongan
+# langsung dipecah per kolom (array string Arrow bila pyarrow ada, selain itu
+# array object NumPy) dan list baris potongan dibuang sebelum potongan berikut.
+# Di akhir tiap kolom yang seluruhnya angka dijadikan int64/float64 (setara
+# numericise get_all_records untuk kolom angka murni).
+import os
+import sys
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import sheet_columns
+import tracing
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # opsional: tanpa pyarrow kolom disimpan sebagai object
+    pa = None
+    pc = None
+
+try:
+    INGEST_CHUNK_ROWS = int(st.secrets.get("INGEST_CHUNK_ROWS", 5000))
+except Exception:
+    INGEST_CHUNK_ROWS = 5000
+
+
+if pa is not None:
+    # Pool bawaan Arrow (mimalloc/jemalloc) menahan halaman bekas potongan
+    # sehingga RSS berakhir ~2,5x ukuran frame; malloc sistem mengembalikannya.
+    _POOL = pa.system_memory_pool()
+    try:
+        _STR_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)  # dtype "str" default pandas 3
+    except TypeError:
+        _STR_DTYPE = pd.StringDtype("pyarrow")
+
+
+def _cell(v) -> str:
+    return v if isinstance(v, str) else ("" if v is None else str(v))
+
+
+class _Column:
+    """Penampung satu kolom: potongan string yang sudah dikompakkan"""
+
+    def __init__(self):
+        self.chunks: list = []
+
+    def add(self, values: List[str]) -> None:
+        if pa is not None:
+            self.chunks.append(pa.array(values, type=pa.string(), memory_pool=_POOL))
+        else:
+            self.chunks.append(np.array(values, dtype=object))
+
+    def finish(self, n_rows: int) -> pd.Series:
+        if pa is not None:
+            data = pa.chunked_array(self.chunks, type=pa.string()) if self.chunks else pa.chunked_array([], pa.string())
+            self.chunks = []
+            for typ in (pa.int64(), pa.float64()):
+                try:
+                    return pd.Series(pc.cast(data, typ, memory_pool=_POOL).to_numpy())
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    continue
+            return pd.Series(pd.array(data, dtype=_STR_DTYPE))
+        data = np.concatenate(self.chunks) if self.chunks else np.array([], dtype=object)
+        self.chunks = []
+        try:
+            return pd.Series(pd.to_numeric(data, errors="raise"))
+        except (ValueError, TypeError):
+            return pd.Series(data, dtype=object)
+
+
+def check_header(header: Sequence[str]) -> None:
+    """Tolak header kembar (termasuk beberapa sel kosong), seperti get_all_records.
+
+    DataFrame dari dict kolom akan diam-diam menyisakan satu kolom per nama.
+    """
+    seen, dup = set(), []
+    for h in header:
+        if h in seen and h not in dup:
+            dup.append(h)
+        seen.add(h)
+    if dup:
+        names = ", ".join(repr(h) if h else "(kosong)" for h in dup)
+        raise ValueError(f"Header sheet tidak unik: {names}. Beri nama kolom yang berbeda di baris 1.")
+
+
+def frame_from_rows(header: Sequence[str], rows: Iterator[List[list]]) -> pd.DataFrame:
+    """Header + iterator potongan baris (list of list) -> DataFrame bertipe"""
+    check_header(header)
+    width = len(header)
+    columns = [_Column() for _ in range(width)]
+    n_rows = 0
+    for chunk in rows:
+        if not chunk:
+            continue
+        padded = [(r + [""] * width)[:width] if len(r) != width else r for r in chunk]
+        for j, col in enumerate(zip(*padded)):
+            columns[j].add([_cell(v) for v in col])
+        n_rows += len(padded)
+        del padded
+    return pd.DataFrame({name: col.finish(n_rows) for name, col in zip(header, columns)}) if width else pd.DataFrame()
+
+
+def iter_chunks(
+    values_get: Callable[[str], dict], title: str, start_row: int, chunk_rows: int = 0, last_row: int = 0
+) -> Iterator[List[list]]:
+    """Potongan baris mulai start_row ('Judul'!5001:10000, ...) sampai sheet habis.
+
+    API memotong baris kosong di ujung tiap range; celah itu dikembalikan
+    sebagai baris kosong bila masih ada data sesudahnya, supaya nomor baris
+    tetap sejajar (sama dengan get_all_records). last_row = rowCount grid
+    (boleh basi): pembacaan berhenti setelah melewatinya dan potongan tidak penuh.
+    """
+    chunk_rows = chunk_rows or INGEST_CHUNK_ROWS
+    row, gap = start_row, 0
+    while True:
+        end = row + chunk_rows - 1
+        rng = sheet_columns.a1_range(title, f"{row}:{end}")
+        with tracing.span("sheets.values_get", payload=rng) as sp:
+            values = values_get(rng).get("values", [])
+            sp.bytes_in = tracing.payload_size(values)
+        n = len(values)
+        if values:
+            if gap:
+                yield [[] for _ in range(gap)]
+            yield values
+            gap = chunk_rows - n
+        else:
+            gap += chunk_rows
+        if n < chunk_rows and end >= last_row:
+            return
+        row = end + 1
+
+
+@tracing.traced("sheet_ingest.read_frame")
+def read_frame(sh, ws, chunk_rows: int = 0) -> pd.DataFrame:
+    """Seluruh tab (baris 1 = header) sebagai DataFrame, dibaca per potongan"""
+    chunks = iter_chunks(sh.values_get, ws.title, 1, chunk_rows, last_row=ws.row_count)
+    first = next(chunks, [])
+    if not first:
+        return pd.DataFrame()
+    header = [_cell(h) for h in first[0]]
+    first[0:1] = []
+
+    def rows():
+        yield first
+        yield from chunks
+
+    return frame_from_rows(header, rows())
+
+
+# === Pengukuran memori proses (bench & halaman Admin) ===
+def peak_rss_bytes() -> Optional[int]:
+    """Puncak RSS proses (VmHWM di Linux, ru_maxrss di tempat lain); None bila tidak bisa"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def current_rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM ke RSS saat ini (Linux >= 4.0); False bila tidak didukung"""
+    try:
+        with open(f"/proc/{os.getpid()}/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,69 @@
+import streamlit as st
+import pandas as pd
+import tracing
+import session_stats
+
+# Halaman tersembunyi: hanya dimuat app.py jika ?admin=<ADMIN_KEY>
+st.title("🛠 Admin - Latensi Sheets/Drive")
+st.caption(
+    "Metrik per proses server sejak start terakhir. "
+    f"Persentil dihitung dari {tracing.MAX_SPANS} span terakhir."
+)
+
+rows = tracing.summary()
+
+if rows:
+    df_metrics = pd.DataFrame(rows)
+
+    prefixes = sorted({r["name"].split(".", 1)[0] for r in rows})
+    selected_prefix = st.multiselect("Filter grup:", prefixes, default=prefixes, key="admin_prefix")
+    df_view = df_metrics[df_metrics["name"].str.split(".").str[0].isin(selected_prefix)]
+
+    st.dataframe(
+        df_view.sort_values("p95_ms", ascending=False),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "📥 Export JSON",
+            data=tracing.export_json(),
+            file_name="trace_geser_meter.json",
+            mime="application/json",
+            use_container_width=True,
+        )
+    with col2:
+        st.download_button(
+            "📥 Export Prometheus",
+            data=tracing.export_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True,
+        )
+    with col3:
+        if st.button("🧹 Reset Metrik", use_container_width=True, key="admin_reset"):
+            tracing.reset()
+            st.rerun()
+
+    with st.expander("Teks Prometheus"):
+        st.code(tracing.export_prometheus(), language="text")
+else:
+    st.info("Belum ada panggilan yang tercatat. Buka halaman lain terlebih dahulu.")
+
+# === Memori sesi ===
+st.subheader("🧠 Memori Session State")
+sesi = session_stats.active_sessions()
+if sesi:
+    df_sesi = pd.DataFrame(sesi)
+    col_s1, col_s2, col_s3 = st.columns(3)
+    col_s1.metric("Sesi aktif", len(df_sesi))
+    col_s2.metric("Rata-rata per sesi", f"{df_sesi['bytes'].mean() / 1024:,.1f} KB")
+    col_s3.metric("Total", f"{df_sesi['bytes'].sum() / 2**20:,.2f} MB")
+    st.dataframe(df_sesi, use_container_width=True, hide_index=True)
+else:
+    st.caption("Daftar sesi lain tidak tersedia di runtime ini.")
+
+with st.expander("Sesi ini"):
+    st.dataframe(pd.DataFrame(session_stats.footprint(st.session_state)), use_container_width=True, hide_index=True)
@@ -1,68 +1,35 @@
+import os
 import streamlit as st
 import pandas as pd
 import altair as alt
-from auth import get_gspread_client
+from auth import setting
+from pelanggan import fetch_pelanggan_df, prepare_display_df
+import export_data
+from export_rekap_sheets import rekap_tab_history, now_jakarta
 
 st.set_page_config(page_title="Data dari Google Sheets", layout="wide")
 
 # Ambil dari secrets
 try:
-    SPREADSHEET_ID = str(st.secrets["SHEET_ID"])
-    GID = str(st.secrets["SHEET_GID"])  # simpan sebagai string untuk perbandingan
+    SPREADSHEET_ID = str(setting("SHEET_ID"))
+    GID = str(setting("SHEET_GID"))  # simpan sebagai string untuk perbandingan
 except Exception as e:
     st.error(f"Konfigurasi secrets tidak lengkap: {e}")
     st.stop()
 
-def load_sheet_by_gid(spreadsheet_id, gid):
-    gc = get_gspread_client()
-    sh = gc.open_by_key(spreadsheet_id)
-    target = None
-    for ws in sh.worksheets():
-        if str(ws.id) == str(gid):
-            target = ws
-            break
-    if target is None:
-        target = sh.sheet1
-    return target
-
-# Cache 3 menit agar tidak fetch berulang saat rerun
-@st.cache_data(ttl=180, show_spinner=False)
-def fetch_df(spreadsheet_id, gid) -> pd.DataFrame:
-    ws = load_sheet_by_gid(spreadsheet_id, gid)
-    data = ws.get_all_records()
-    return pd.DataFrame(data)
-
 try:
-    df = fetch_df(SPREADSHEET_ID, GID)
+    df = fetch_pelanggan_df(SPREADSHEET_ID, GID)
 except Exception as e:
     st.error(f"Gagal mengambil data dari Google Sheets: {e}")
     df = pd.DataFrame()
 
-if not df.empty:
-    # --- Tambahkan blok aman Arrow di bawah ini ---
-    df = df.fillna("")
-    # khusus kolom yang bermasalah
-    if "Tarif / Daya" in df.columns:
-        df["Tarif / Daya"] = df["Tarif / Daya"].astype(str)
-
-    # (opsional kuat) jadikan semua kolom object -> string supaya aman di Arrow
-    for c in df.columns:
-        if df[c].dtype == "object":
-            df[c] = df[c].astype(str)
-    # --- sampai sini ---
-
-    if "Foto KTP" in df.columns:
-        def ktp_link(v):
-            v = str(v).strip()
-            if v and v.lower() not in ["nan", "none", ""]:
-                return f'<a href="{v}" target="_blank">📷 Lihat KTP</a>'
-            return ""
-        df["Foto KTP"] = df["Foto KTP"].apply(ktp_link)
+df_raw = df
 
-    if "Tarif / Daya" in df.columns:
-        daya_count = df["Tarif / Daya"].value_counts().reset_index()
-        daya_count.columns = ["Tarif / Daya", "Jumlah Pengguna"]
+if not df.empty:
+    # Arrow-safe + link KTP + rekap per daya
+    df, daya_count = prepare_display_df(df)
 
+    if daya_count is not None:
         st.subheader("📈 Jumlah Pengguna berdasarkan Daya")
         chart = (
             alt.Chart(data=daya_count)
@@ -80,4 +47,45 @@ if not df.empty:
     st.subheader("📊 Data dari Google Sheets")
     st.write(df.to_html(escape=False, index=False), unsafe_allow_html=True)
 else:
-    st.info("Belum ada data untuk ditampilkan.")
\ No newline at end of file
+    st.info("Belum ada data untuk ditampilkan.")
+
+# === Unduh data ===
+# Dibangun dari snapshot yang sudah di-cache (tanpa panggilan API tambahan),
+# ditulis per potongan ke file lalu disajikan lewat tombol unduh. Tombol hanya
+# dirender di rerun yang membangun file: isinya dibaca sekali, file dihapus,
+# dan rerun berikutnya tidak membaca ulang file besar.
+st.subheader("⬇️ Unduh Data")
+col_src, col_fmt, col_btn = st.columns([2, 1, 1])
+with col_src:
+    sumber = st.selectbox("Data", ["Data Pelanggan", "Riwayat Tab Rekap"], key="unduh_sumber")
+with col_fmt:
+    fmt = st.selectbox("Format", export_data.available_formats(), key="unduh_format",
+                       format_func=str.upper)
+with col_btn:
+    st.write("")
+    siapkan = st.button("📦 Siapkan File", use_container_width=True)
+
+if siapkan:
+    try:
+        if sumber == "Data Pelanggan":
+            # snapshot mentah, bukan tabel tampilan (link HTML KTP)
+            df_unduh, nama_file = df_raw, "data_pelanggan"
+        else:
+            df_unduh, nama_file = rekap_tab_history(SPREADSHEET_ID), "riwayat_rekap"
+        with st.spinner("Menyiapkan file..."):
+            path = export_data.build_export(df_unduh, nama_file, fmt)
+            try:
+                with open(path, "rb") as f:
+                    isi = f.read()
+            finally:
+                os.remove(path)
+        nama_unduh = export_data.file_name(nama_file, fmt, now_jakarta().strftime("%Y%m%d_%H%M"))
+        st.download_button(
+            f"⬇️ Unduh {nama_unduh} ({len(df_unduh):,} baris)",
+            data=isi,
+            file_name=nama_unduh,
+            mime=export_data.MIME_TYPES[fmt],
+        )
+        st.caption("Tombol unduh hilang setelah halaman dimuat ulang; klik Siapkan File lagi bila perlu.")
+    except Exception as e:
+        st.error(f"Gagal menyiapkan file: {e}")
@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date
-from auth import get_gspread_client, get_or_create_folder, upload_file_to_drive
+import outbox
+import eksekusi_batch
+from auth import setting
+from pelanggan import fetch_pelanggan_df, search_index, SEARCH_LIMIT, pending_writes
 
 # === Konfigurasi ===
 try:
-    SPREADSHEET_ID = str(st.secrets["SHEET_ID"])
-    GID = str(st.secrets["SHEET_GID"])
-    DRIVE_FOLDER_EKSEKUSI = str(st.secrets.get("DRIVE_FOLDER_EKSEKUSI", ""))
+    SPREADSHEET_ID = str(setting("SHEET_ID"))
+    GID = str(setting("SHEET_GID"))
+    DRIVE_FOLDER_EKSEKUSI = str(setting("DRIVE_FOLDER_EKSEKUSI", ""))
     
     if not DRIVE_FOLDER_EKSEKUSI:
         st.error("DRIVE_FOLDER_EKSEKUSI tidak diset di secrets!")
@@ -17,81 +20,120 @@ except Exception as e:
     st.error(f"Konfigurasi secrets tidak lengkap: {e}")
     st.stop()
 
-def load_sheet_by_gid(spreadsheet_id, gid):
-    gc = get_gspread_client()
-    sh = gc.open_by_key(spreadsheet_id)
-    target = None
-    for ws in sh.worksheets():
-        if str(ws.id) == str(gid):
-            target = ws
-            break
-    if target is None:
-        target = sh.sheet1
-    return target
-
-@st.cache_data(ttl=180, show_spinner=False)
-def fetch_pelanggan_df(spreadsheet_id: str, gid: str) -> pd.DataFrame:
-    ws = load_sheet_by_gid(spreadsheet_id, gid)
-    data = ws.get_all_records()
-    return pd.DataFrame(data).fillna("")
-
-def update_tanggal_eksekusi(spreadsheet_id: str, gid: str, idpel: str, tanggal: str) -> dict:
-    try:
-        gc = get_gspread_client()
-        sh = gc.open_by_key(spreadsheet_id)
-        
-        target_ws = None
-        for ws in sh.worksheets():
-            if str(ws.id) == str(gid):
-                target_ws = ws
-                break
-        
-        if target_ws is None:
-            return {"success": False, "message": "Worksheet tidak ditemukan"}
-        
-        header = target_ws.row_values(1)
-        
-        eksekusi_col = None
-        for idx, col_name in enumerate(header):
-            if "tanggaleksekusi" in str(col_name).strip().lower().replace(" ", ""):
-                eksekusi_col = idx + 1
-                break
-        
-        if eksekusi_col is None:
-            return {"success": False, "message": "Kolom TanggalEksekusi tidak ditemukan"}
-        
-        id_col = None
-        for idx, col_name in enumerate(header):
-            if "id pelanggan" in str(col_name).strip().lower():
-                id_col = idx + 1
-                break
-        
-        if id_col is None:
-            return {"success": False, "message": "Kolom ID Pelanggan tidak ditemukan"}
-        
-        id_values = target_ws.col_values(id_col)
-        matched_row = None
-        
-        for i in reversed(range(1, len(id_values))):
-            if str(id_values[i]).strip() == str(idpel).strip():
-                matched_row = i + 1
-                break
-        
-        if matched_row is None:
-            return {"success": False, "message": f"ID Pelanggan {idpel} tidak ditemukan"}
-        
-        target_ws.update_cell(matched_row, eksekusi_col, tanggal)
-        
-        return {"success": True, "message": f"Berhasil update row {matched_row}"}
-        
-    except Exception as e:
-        return {"success": False, "message": f"Error: {str(e)}"}
+# Batas waktu kirim langsung saat submit; sisanya dilanjutkan worker antrean
+SUBMIT_DEADLINE = 60
+
+outbox.ensure_worker()
 
 # === UI ===
 st.title("📸 Upload Dokumentasi Eksekusi")
 
+jumlah_antrean = outbox.pending_count()
+if jumlah_antrean:
+    col_q1, col_q2 = st.columns([3, 1])
+    with col_q1:
+        st.info(f"📥 {jumlah_antrean} operasi masih di antrean, dikirim otomatis saat koneksi pulih.")
+    with col_q2:
+        if st.button("🔄 Kirim sekarang", use_container_width=True, key="outbox_drain_now"):
+            with st.spinner("Mengirim antrean..."):
+                outbox.drain()
+            st.rerun()
+
 df_sheets = fetch_pelanggan_df(SPREADSHEET_ID, GID)
 
+MODE_SATU = "Satu pelanggan"
+MODE_BATCH = "Banyak pelanggan (batch)"
+mode = st.radio("Mode:", [MODE_SATU, MODE_BATCH], horizontal=True, key="mode_eksekusi")
+
+STATUS_BATCH = {
+    "selesai": "✅ Selesai",
+    "tertunda": "📥 Di antrean",
+    "gagal": "❌ Gagal",
+    "tidak_ditemukan": "⚠️ IDPEL tidak ada di sheet",
+    "upload_ok": "📥 Di antrean",
+}
+
+if mode == MODE_BATCH:
+    st.subheader("📦 Eksekusi Banyak Pelanggan")
+    st.caption(
+        "Upload ZIP berisi satu folder per IDPEL (`513130665162/foto1.jpg`) atau foto "
+        "dengan nama berawalan IDPEL (`513130665162_1.jpg`). Semua pelanggan memakai tanggal yang sama."
+    )
+    
+    with st.form("form_eksekusi_batch"):
+        tanggal_batch = st.date_input(
+            "📅 Tanggal Eksekusi:",
+            value=date.today(),
+            key="tanggal_eksekusi_batch",
+            format="DD/MM/YYYY"
+        )
+        files_batch = st.file_uploader(
+            "📦 Upload ZIP / Foto (JPG/PNG):",
+            type=["zip", "jpg", "jpeg", "png"],
+            accept_multiple_files=True,
+            key="upload_foto_eksekusi_batch"
+        )
+        submitted_batch = st.form_submit_button("📤 Submit Batch Eksekusi")
+    
+    if submitted_batch:
+        if not files_batch:
+            st.error("⚠️ Upload minimal 1 ZIP atau foto!")
+            st.stop()
+        try:
+            groups, skipped = eksekusi_batch.group_photos(files_batch)
+            index_pelanggan = search_index(SPREADSHEET_ID, GID)
+            tidak_dikenal = [idpel for idpel in groups if index_pelanggan.name_of(idpel, None) is None]
+            for idpel in tidak_dikenal:
+                groups.pop(idpel)
+            if skipped:
+                st.warning(f"⚠️ {len(skipped)} file dilewati (bukan foto / tanpa IDPEL): " + ", ".join(skipped[:10]))
+            if tidak_dikenal:
+                st.warning(f"⚠️ IDPEL tidak ditemukan di data pelanggan: {', '.join(tidak_dikenal)}")
+            if not groups:
+                st.error("❌ Tidak ada foto yang bisa diproses.")
+                st.stop()
+            
+            jumlah_foto = sum(len(p) for p in groups.values())
+            with st.spinner(f"Mengupload {jumlah_foto} foto untuk {len(groups)} pelanggan..."):
+                hasil = eksekusi_batch.submit_batch(
+                    groups,
+                    {idpel: index_pelanggan.name_of(idpel) for idpel in groups},
+                    tanggal_batch,
+                    SPREADSHEET_ID,
+                    GID,
+                    DRIVE_FOLDER_EKSEKUSI,
+                    deadline=SUBMIT_DEADLINE,
+                )
+            
+            ringkasan = hasil["pelanggan"]
+            selesai = sum(1 for r in ringkasan.values() if r["status"] == "selesai")
+            if selesai == len(ringkasan):
+                st.success(f"✅ {selesai} pelanggan selesai, Tanggal Eksekusi {hasil['tanggal']} tercatat.")
+                st.balloons()
+            else:
+                st.warning(
+                    f"{selesai} dari {len(ringkasan)} pelanggan selesai. Operasi yang tertunda tetap di antrean "
+                    "dan dikirim otomatis - tidak perlu upload ulang."
+                )
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        "ID Pelanggan": idpel,
+                        "Nama": r["nama"],
+                        "Foto": r["foto"],
+                        "Terupload": r["diupload"],
+                        "Status": STATUS_BATCH.get(r["status"], r["status"]),
+                        "Keterangan": "; ".join(e for e in r["errors"] if e),
+                    }
+                    for idpel, r in ringkasan.items()
+                ]),
+                hide_index=True,
+                use_container_width=True,
+            )
+        except Exception as e:
+            st.error(f"❌ Terjadi kesalahan: {str(e)}")
+    st.stop()
+
 st.subheader("🔎 Pilih Pelanggan")
 
 col_filter1, col_filter2 = st.columns(2)
@@ -110,26 +152,12 @@ with col_filter2:
         key="search_nama_eksekusi"
     )
 
-df_filtered = df_sheets.copy()
-
-if search_id.strip():
-    df_filtered = df_filtered[
-        df_filtered["ID Pelanggan"].astype(str).str.contains(search_id.strip(), case=False, na=False)
-    ]
-
-if search_nama.strip():
-    if "Nama" in df_filtered.columns:
-        df_filtered = df_filtered[
-            df_filtered["Nama"].astype(str).str.contains(search_nama.strip(), case=False, na=False)
-        ]
+# Indeks pencarian cached: hanya SEARCH_LIMIT hasil teratas yang masuk selectbox
+hasil_cari, jumlah_cocok = search_index(SPREADSHEET_ID, GID).search(search_id=search_id, search_nama=search_nama)
 
-filtered_options = ["- Pilih ID Pelanggan -"]
-if not df_filtered.empty:
-    for _, row in df_filtered.iterrows():
-        pid = str(row["ID Pelanggan"]).strip()
-        pnama = str(row.get("Nama", "-")).strip()
-        if pid:
-            filtered_options.append(f"{pid} ({pnama})")
+filtered_options = ["- Pilih ID Pelanggan -"] + hasil_cari
+if jumlah_cocok > SEARCH_LIMIT:
+    st.caption(f"Ditemukan {jumlah_cocok} pelanggan, ditampilkan {SEARCH_LIMIT} teratas. Perjelas pencarian.")
 
 pilihan = st.selectbox(
     "🔑 Pilih ID Pelanggan:",
@@ -156,6 +184,18 @@ if idpel_selected:
         
         st.markdown(f"**Nama:** {nama}")
         st.markdown(f"**Alamat:** {alamat}")
+        
+        if "TanggalEksekusi" in df_selected.columns:
+            tgl_terakhir = str(df_selected.iloc[-1].get("TanggalEksekusi", "")).strip()
+            if tgl_terakhir:
+                menunggu = any(
+                    w["column"] == "TanggalEksekusi"
+                    for w in pending_writes(SPREADSHEET_ID, GID, idpel_selected)
+                )
+                st.markdown(
+                    f"**Tanggal Eksekusi:** {tgl_terakhir}"
+                    + (" ⏳ _menunggu sinkronisasi_" if menunggu else "")
+                )
     
     st.markdown("---")
     
@@ -203,45 +243,77 @@ if idpel_selected:
                     else:
                         nama = "-"
                     
-                    subfolder_id = get_or_create_folder(DRIVE_FOLDER_EKSEKUSI, idpel_selected)
-                    
-                    uploaded_links = []
+                    # Catat dulu ke antrean lokal (write-ahead), lalu kirim ke Google.
+                    # Jika jaringan/kuota bermasalah, item tetap di antrean dan worker
+                    # mengirimnya otomatis tanpa petugas mengulang form.
+                    group_key = f"eksekusi:{idpel_selected}:{tanggal_prefix}"
+                    upload_keys = []
                     for idx, file in enumerate(uploaded_files, 1):
                         ext = file.name.split(".")[-1]
                         # Format: IDPEL_YYYYMMDD_NAMA_01.ext
                         filename = f"{idpel_selected}_{tanggal_prefix}_{nama.replace(' ', '_')}_{idx:02d}.{ext}"
+                        data = file.getbuffer()
+                        file_hash = outbox.content_hash(data)
+                        upload_key = f"upload:{idpel_selected}:{tanggal_prefix}:{file_hash}"
+                        upload_keys.append(upload_key)
                         
-                        result = upload_file_to_drive(
-                            file_content=file.read(),
-                            filename=filename,
-                            folder_id=subfolder_id,
-                            mime_type=file.type
+                        outbox.enqueue(
+                            "drive_upload",
+                            {
+                                "parent_folder_id": DRIVE_FOLDER_EKSEKUSI,
+                                "folder_name": idpel_selected,
+                                "filename": filename,
+                                "mime_type": file.type,
+                            },
+                            idem_key=upload_key,
+                            blob=data,
+                            blob_digest=file_hash,
+                            group_key=group_key,
                         )
-                        
-                        uploaded_links.append({
-                            "name": filename,
-                            "link": result.get("webViewLink", "")
-                        })
                     
-                    update_result = update_tanggal_eksekusi(
-                        SPREADSHEET_ID,
-                        GID,
-                        idpel_selected,
-                        tanggal_str
+                    # Tanggal baru ditulis bila semua foto submit ini terupload
+                    update_key = f"eksekusi:{idpel_selected}:{tanggal_str}"
+                    outbox.enqueue(
+                        "sheets_tanggal_eksekusi",
+                        {"spreadsheet_id": SPREADSHEET_ID, "gid": GID, "idpel": idpel_selected, "tanggal": tanggal_str},
+                        idem_key=update_key,
+                        group_key=group_key,
+                        requires=upload_keys,
                     )
                     
-                    if update_result["success"]:
-                        st.success(f"✅ Berhasil upload {len(uploaded_files)} foto dan update tanggal eksekusi!")
+                    outbox.drain(group_key=group_key, deadline=SUBMIT_DEADLINE)
+                    # hanya item submit ini; group yang sama bisa berisi submit sebelumnya hari itu
+                    group_items = outbox.items(group_key=group_key, idem_keys=upload_keys + [update_key])
+                    
+                    uploads = [it for it in group_items if it["kind"] == "drive_upload"]
+                    update_item = next((it for it in group_items if it["kind"] == "sheets_tanggal_eksekusi"), None)
+                    gagal = [it for it in group_items if it["status"] == "failed"]
+                    tertunda = [it for it in group_items if it["status"] in ("pending", "running")]
+                    
+                    if gagal:
+                        for it in gagal:
+                            st.error(f"❌ Gagal ({it['kind']}): {it['last_error']}")
+                    elif tertunda:
+                        st.warning(
+                            f"📥 {len(tertunda)} operasi belum terkirim (koneksi/kuota Google). "
+                            "Data sudah tersimpan di antrean dan akan dikirim otomatis - tidak perlu upload ulang."
+                        )
+                    elif update_item is not None and update_item["status"] == "done":
+                        dilewati = sum(1 for it in uploads if (it["result"] or {}).get("skipped"))
+                        st.success(f"✅ Berhasil upload {len(uploads) - dilewati} foto dan update tanggal eksekusi!")
+                        if dilewati:
+                            st.info(f"♻️ {dilewati} foto sudah ada di Drive (isi identik) - tidak diupload ulang.")
                         st.info(f"📅 Tanggal Eksekusi: {tanggal_str}")
                         st.info(f"📁 Foto tersimpan di: Foto Eksekusi/{idpel_selected}/")
-                        
-                        with st.expander("📋 Detail Foto yang Diupload"):
-                            for item in uploaded_links:
-                                st.write(f"- [{item['name']}]({item['link']})")
-                        
                         st.balloons()
-                    else:
-                        st.error(f"❌ Upload foto berhasil, tapi gagal update sheets: {update_result['message']}")
+                    
+                    done_uploads = [it for it in uploads if it["status"] == "done"]
+                    if done_uploads:
+                        with st.expander("📋 Detail Foto yang Diupload"):
+                            for it in done_uploads:
+                                result = it["result"] or {}
+                                tanda = " (sudah ada)" if result.get("skipped") else ""
+                                st.write(f"- [{result.get('name', it['payload']['filename'])}]({result.get('webViewLink', '')}){tanda}")
                     
                 except Exception as e:
                     st.error(f"❌ Terjadi kesalahan: {str(e)}")
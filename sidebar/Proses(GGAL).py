@@ -1,20 +1,18 @@
 import streamlit as st
 import pandas as pd
-from auth import get_gspread_client
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-import io
-
-# Baca data pelanggan dari Google Sheets
-def load_pelanggan():
-    gc = get_gspread_client()
-    sh = gc.open("DataPelanggan")   # ganti sesuai nama sheet
-    ws = sh.worksheet("Sheet1")
-    data = ws.get_all_records()
-    return pd.DataFrame(data)
+from datetime import date
+import rekap_ledger
+from auth import setting
+from pelanggan import fetch_pelanggan_df, search_index
+from rekap_pdf import job_digest, rekap_pdf, render_batch_pdf, render_batch_zip
+
+# Konfigurasi Google Sheet dari secrets (sumber data sama dengan halaman lain)
+try:
+    SPREADSHEET_ID = str(setting("SHEET_ID"))
+    GID = str(setting("SHEET_GID"))
+except Exception as e:
+    st.error(f"Konfigurasi secrets tidak lengkap: {e}")
+    st.stop()
 
 # Data barang (contoh, bisa juga dari sheet lain)
 barang_list = {
@@ -28,60 +26,49 @@ barang_list = {
     "Twisted Cable 2 x 10 mm² – Al": 43714,
 }
 
-# Fungsi export PDF
-def create_pdf(pelanggan, df_rekap, total, ppn, grand_total):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Judul
-    elements.append(Paragraph("<b>REKAP HARGA PEKERJAAN</b>", styles['Title']))
-    elements.append(Spacer(1, 12))
-
-    # Data pelanggan
-    elements.append(Paragraph(f"Nama: {pelanggan['Nama']}", styles['Normal']))
-    elements.append(Paragraph(f"Alamat: {pelanggan['Alamat']}", styles['Normal']))
-    elements.append(Spacer(1, 12))
-
-    # Tabel barang
-    table_data = [["No", "Barang", "Qty", "Harga Satuan", "Subtotal"]]
-    for i, row in df_rekap.iterrows():
-        table_data.append([
-            i + 1,
-            row["Barang"],
-            row["Qty"],
-            f"Rp {row['Harga Satuan']:,}",
-            f"Rp {row['Subtotal']:,}",
-        ])
-    table = Table(table_data, colWidths=[1.5*cm, 7*cm, 2*cm, 3*cm, 3*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-    ]))
-    elements.append(table)
-    elements.append(Spacer(1, 12))
-
-    # Total
-    elements.append(Paragraph(f"<b>TOTAL MATERIAL: Rp {total:,}</b>", styles['Normal']))
-    elements.append(Paragraph(f"PPN (11%): Rp {ppn:,}", styles['Normal']))
-    elements.append(Paragraph(f"<b>TOTAL BIAYA SETELAH PPN: Rp {grand_total:,}</b>", styles['Heading2']))
-
-    doc.build(elements)
-    pdf = buffer.getvalue()
-    buffer.close()
-    return pdf
+def rekap_job(pelanggan, rows):
+    """Input PDF (juga kunci memo): data pelanggan, baris barang & total"""
+    total = int(sum(r["Subtotal"] for r in rows))
+    ppn = int(total * 0.11)
+    return {
+        "pelanggan": {"Nama": str(pelanggan["Nama"]), "Alamat": str(pelanggan["Alamat"])},
+        "rows": rows,
+        "total": total,
+        "ppn": ppn,
+        "grand_total": total + ppn,
+    }
+
+def ledger_job(entry):
+    """Rekap dari ledger (halaman Proses) -> input PDF"""
+    rows = [
+        {
+            "Barang": it.get("Rincian", ""),
+            "Qty": int(it.get("Vol") or 0),
+            "Harga Satuan": it.get("Harga Satuan Material", 0),
+            "Subtotal": it.get("Harga Total", 0),
+        }
+        for it in entry["items"]
+    ]
+    meta = entry["meta"]
+    return rekap_job({"Nama": meta.get("Nama", entry["idpel"]), "Alamat": meta.get("Lokasi", "-")}, rows)
 
 # Streamlit App
 st.title("Rekap Harga Pekerjaan")
 
-df_pelanggan = load_pelanggan()
-idpel = st.selectbox("Pilih ID Pelanggan:", df_pelanggan["IDPEL"].unique())
-pelanggan = df_pelanggan[df_pelanggan["IDPEL"] == idpel].iloc[0]
+# Data pelanggan dari loader bersama (cached), bukan gc.open per rerun
+df_pelanggan = fetch_pelanggan_df(SPREADSHEET_ID, GID)
+index_pelanggan = search_index(SPREADSHEET_ID, GID)
+
+cari = st.text_input("🔍 Cari IDPEL/Nama:", key="ggal_search")
+hasil_cari, _ = index_pelanggan.search(search_text=cari)
+pilihan = st.selectbox("Pilih ID Pelanggan:", hasil_cari) if hasil_cari else None
+if not pilihan:
+    st.info("Belum ada pelanggan yang cocok.")
+    st.stop()
+
+idpel = pilihan.split(" (", 1)[0].strip()
+baris = df_pelanggan[df_pelanggan["ID Pelanggan"].astype(str).str.strip() == idpel].iloc[0]
+pelanggan = {"Nama": baris.get("Nama", "-"), "Alamat": baris.get("Alamat kWH Meter", "-")}
 
 st.write("**Nama:**", pelanggan["Nama"])
 st.write("**Alamat:**", pelanggan["Alamat"])
@@ -95,20 +82,49 @@ for barang, harga in barang_list.items():
         kuantitas[barang] = {"qty": qty, "harga": harga, "subtotal": qty * harga}
 
 if kuantitas:
-    df_rekap = pd.DataFrame([
-        {"Barang": b, "Qty": v["qty"], "Harga Satuan": v["harga"], "Subtotal": v["subtotal"]}
+    rows = [
+        {"Barang": b, "Qty": int(v["qty"]), "Harga Satuan": v["harga"], "Subtotal": int(v["subtotal"])}
         for b, v in kuantitas.items()
-    ])
+    ]
+    job = rekap_job(pelanggan, rows)
 
-    total = df_rekap["Subtotal"].sum()
-    ppn = int(total * 0.11)
-    grand_total = total + ppn
+    st.table(pd.DataFrame(rows))
+    st.write("**TOTAL MATERIAL:** Rp", f"{job['total']:,}")
+    st.write("**PPN (11%):** Rp", f"{job['ppn']:,}")
+    st.write("### TOTAL BIAYA SETELAH PPN: Rp", f"{job['grand_total']:,}")
 
-    st.table(df_rekap)
-    st.write("**TOTAL MATERIAL:** Rp", f"{total:,}")
-    st.write("**PPN (11%):** Rp", f"{ppn:,}")
-    st.write("### TOTAL BIAYA SETELAH PPN: Rp", f"{grand_total:,}")
+    # PDF baru dibuat saat diminta; input yang sama memakai hasil memo
+    if st.button("📄 Buat PDF"):
+        st.session_state["ggal_pdf"] = job_digest(job)
+    if st.session_state.get("ggal_pdf") == job_digest(job):
+        st.download_button("📥 Download Rekap PDF", data=rekap_pdf(job), file_name="rekap_harga.pdf", mime="application/pdf")
 
-    # Tombol download PDF
-    pdf = create_pdf(pelanggan, df_rekap, total, ppn, grand_total)
-    st.download_button("📥 Download Rekap PDF", data=pdf, file_name="rekap_harga.pdf", mime="application/pdf")
+# === Batch: semua rekap pada satu tanggal (dari ledger rekap) ===
+st.divider()
+st.subheader("📚 Batch Rekap PDF")
+col_tgl, col_fmt = st.columns(2)
+with col_tgl:
+    tanggal = st.date_input("Tanggal rekap:", value=date.today(), key="ggal_batch_date")
+with col_fmt:
+    mode = st.radio("Format:", ["PDF multi-halaman", "ZIP per pelanggan"], key="ggal_batch_mode")
+
+entries = rekap_ledger.by_date(tanggal.isoformat())
+st.caption(f"{len(entries)} rekap tercatat pada {tanggal.strftime('%d/%m/%Y')}")
+if entries and st.button("📦 Buat Batch"):
+    jobs = [ledger_job(e) for e in entries]
+    with st.spinner(f"Merender {len(jobs)} rekap..."):
+        if mode == "ZIP per pelanggan":
+            names = [f"rekap_{e['idpel']}_{e['id']}.pdf" for e in entries]
+            st.session_state["ggal_batch"] = ("zip", render_batch_zip(jobs, names))
+        else:
+            st.session_state["ggal_batch"] = ("pdf", render_batch_pdf(jobs))
+
+batch = st.session_state.get("ggal_batch")
+if batch:
+    ext, data = batch
+    st.download_button(
+        f"📥 Download Batch ({ext.upper()})",
+        data=data,
+        file_name=f"rekap_batch_{tanggal.strftime('%Y%m%d')}.{ext}",
+        mime="application/zip" if ext == "zip" else "application/pdf",
+    )
@@ -1,12 +1,16 @@
-import os
-import sys
 import traceback
 from typing import Optional, Callable
 from datetime import datetime
 
 import streamlit as st
 import pandas as pd
-from auth import get_gspread_client
+import json
+import outbox
+import rekap_ledger
+from auth import setting
+from pelanggan import fetch_pelanggan_df, search_index, SEARCH_LIMIT
+import numpy as np
+from harga import HARGA_VENDOR, HARGA_PELANGGAN, PPN_RATE, KATALOG, KATALOG_BARANG, hitung_rekap
 
 # Timezone helper
 try:
@@ -18,15 +22,12 @@ except Exception:
     def now_jakarta():
         return datetime.utcnow() + timedelta(hours=7)
 
-# Safe import of export module
-THIS_DIR = os.path.dirname(__file__)
-if THIS_DIR and THIS_DIR not in sys.path:
-    sys.path.insert(0, THIS_DIR)
-
+# Safe import of export module (export_rekap_sheets.py di root, seperti modul bersama lain)
 export_rekap_to_sheet: Optional[Callable] = None
 HAVE_EXPORT = False
 import_error_msg = None
 try:
+    # sekaligus mendaftarkan handler antrean 'rekap_export'
     import export_rekap_sheets as _export_mod
     export_rekap_to_sheet = getattr(_export_mod, "export_rekap_to_sheet", None)
     HAVE_EXPORT = callable(export_rekap_to_sheet)
@@ -35,162 +36,129 @@ except Exception:
     export_rekap_to_sheet = None
     HAVE_EXPORT = False
 
+# Export dikirim di thread latar belakang; dialog hanya menunggu sebentar
+# (rerun tidak tertahan), selebihnya status dipantau dari halaman
+EXPORT_WAIT = 8
+
+outbox.ensure_worker()
+
 # Konfigurasi Google Sheet dari secrets
 try:
-    SPREADSHEET_ID = str(st.secrets["SHEET_ID"])
-    GID = str(st.secrets["SHEET_GID"])
+    SPREADSHEET_ID = str(setting("SHEET_ID"))
+    GID = str(setting("SHEET_GID"))
 except Exception as e:
     st.error(f"Konfigurasi secrets tidak lengkap: {e}")
     st.stop()
 
-def load_sheet_by_gid(spreadsheet_id, gid):
-    gc = get_gspread_client()
-    sh = gc.open_by_key(spreadsheet_id)
-    target = None
-    for ws in sh.worksheets():
-        if str(ws.id) == str(gid):
-            target = ws
-            break
-    if target is None:
-        target = sh.sheet1
-    return target
-
-@st.cache_data(ttl=180, show_spinner=False)
-def fetch_pelanggan_df(spreadsheet_id: str, gid: str) -> pd.DataFrame:
-    ws = load_sheet_by_gid(spreadsheet_id, gid)
-    data = ws.get_all_records()
-    df = pd.DataFrame(data).fillna("")
-    return df
-
-# Load data pelanggan (cached)
-df_sheets = fetch_pelanggan_df(SPREADSHEET_ID, GID)
+# Cek layout template rekap (cached): template yang berubah terdeteksi sebelum export
+if HAVE_EXPORT:
+    try:
+        layout_problems = _export_mod.check_template_layouts(SPREADSHEET_ID)
+    except Exception as e:
+        layout_problems = [str(e)]
+    if layout_problems:
+        st.warning(
+            "⚠️ Layout template rekap tidak sesuai, export akan ditolak:\n"
+            + "\n".join(f"- {p}" for p in layout_problems)
+        )
+        if st.button("🔄 Cek ulang template", key="btn_recheck_layout"):
+            _export_mod.check_template_layouts(SPREADSHEET_ID, refresh=True)
+            st.rerun()
+else:
+    # preview tetap bisa dipakai; hanya export yang tidak tersedia
+    st.warning("⚠️ Modul export rekap gagal dimuat, export ke Google Sheets tidak tersedia.")
+    if import_error_msg:
+        with st.expander("Detail error import"):
+            st.code(import_error_msg)
 
-# Siapkan mapping ID -> Nama
-id_to_name = {}
-if not df_sheets.empty and "ID Pelanggan" in df_sheets.columns:
-    if "Nama" in df_sheets.columns:
-        id_to_name = {
-            str(row["ID Pelanggan"]): str(row.get("Nama", "-"))
-            for _, row in df_sheets.iterrows()
-            if str(row.get("ID Pelanggan", "")).strip() != ""
-        }
+# Load data pelanggan (cached) + indeks pencarian (dibangun sekali per snapshot)
+df_sheets = fetch_pelanggan_df(SPREADSHEET_ID, GID)
+index_pelanggan = search_index(SPREADSHEET_ID, GID)
+
+# Harga VENDOR (base price) & PELANGGAN (1.11x dari vendor)
+harga_vendor = HARGA_VENDOR
+harga_pelanggan = HARGA_PELANGGAN
+
+# Katalog barang (harga PELANGGAN) ada di harga.KATALOG; volume per sesi
+# disimpan sebagai satu array int32 sejajar urutan katalog
+N_BARANG_UTAMA = len(KATALOG_BARANG)
+
+def preview_lokal(df_pilih: pd.DataFrame) -> dict:
+    """Model preview tanpa modul export: harga langsung dari daftar harga (tanpa payload)"""
+    names = df_pilih["Rincian"].astype(str).str.strip().tolist()
+    qty = pd.to_numeric(df_pilih["Vol"], errors="coerce").fillna(0).astype(int).tolist()
+    model = {"key": None}
+    for side, harga in (("vendor", harga_vendor), ("pelanggan", harga_pelanggan)):
+        rekap = hitung_rekap(names, qty, harga)
+        rows = df_pilih.copy()
+        rows["Harga Satuan Material"] = rekap["unit"]
+        rows["Harga Total"] = rekap["line_total"]
+        model[side] = {"rows": rows, "subtotal": rekap["subtotal"], "ppn": rekap["ppn"], "total": rekap["total"]}
+    return model
+
+def show_export_status(item: dict) -> bool:
+    """Tampilkan status item antrean export; True bila sudah berhasil"""
+    if item["status"] == "failed":
+        st.error(f"❌ Gagal mengekspor: {item['last_error']}")
+        return False
+    if item["status"] != "done":
+        st.warning(
+            "📥 Google Sheets sedang tidak bisa dijangkau (koneksi/kuota). "
+            "Rekap tersimpan di antrean dan akan diexport otomatis."
+        )
+        return False
+    
+    pair_info = item["result"]
+    st.success(
+        f"✅ Berhasil membuat: **{pair_info['vendor']['sheet_title']}** dan "
+        f"**{pair_info['pelanggan']['sheet_title']}**"
+    )
+    
+    survey_result = pair_info.get("survey_result", {})
+    if survey_result.get("success", False):
+        st.info(f"📅 {survey_result.get('message', 'Tanggal Survey berhasil diperbarui')}")
     else:
-        id_to_name = {
-            str(row["ID Pelanggan"]): "-"
-            for _, row in df_sheets.iterrows()
-            if str(row.get("ID Pelanggan", "")).strip() != ""
-        }
-
-# Harga VENDOR (base price)
-harga_vendor = {
-    "Jasa Kegiatan Geser APP": 93000,
-    "Jasa Kegiatan Geser Perubahan Situasi SR": 79000,
-    "Service wedge clamp 2/4 x 6/10 mm": 3990,
-    "Strainhook / ekor babi": 8000,
-    "Imundex klem": 454,
-    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover": 11999,
-    "Paku Beton": 74,
-    "Pole Bracket 3-9\"": 36823,
-    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover": 29400,
-    "Segel Plastik": 1754,
-    "Twisted Cable 2 x 10 mm² - Al": 4339,
-    "Asuransi": 0,
-    "Twisted Cable 2x10 mm² - Al": 0,
-}
-
-# Harga PELANGGAN (1.11x dari vendor)
-harga_pelanggan = {
-    "Jasa Kegiatan Geser APP": 103230,
-    "Jasa Kegiatan Geser Perubahan Situasi SR": 87690,
-    "Service wedge clamp 2/4 x 6/10 mm": 4428.90,
-    "Strainhook / ekor babi": 8880.00,
-    "Imundex klem": 503.94,
-    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover": 13318.89,
-    "Paku Beton": 82.14,
-    "Pole Bracket 3-9\"": 40873.53,
-    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover": 32634.00,
-    "Segel Plastik": 1946.94,
-    "Twisted Cable 2 x 10 mm² - Al": 4816.29,
-    "Asuransi": 0,
-    "Twisted Cable 2x10 mm² - Al": 0,
-}
-
-# Data barang dengan harga PELANGGAN (untuk preview di website)
-data_barang = [
-    {"nama": "Jasa Kegiatan Geser APP", "SAT": "PLG", "harga": 103230},
-    {"nama": "Jasa Kegiatan Geser Perubahan Situasi SR", "SAT": "PLG", "harga": 87690},
-    {"nama": "Service wedge clamp 2/4 x 6/10 mm", "SAT": "B", "harga": 4428.90},
-    {"nama": "Strainhook / ekor babi", "SAT": "B", "harga": 8880.00},
-    {"nama": "Imundex klem", "SAT": "B", "harga": 503.94},
-    {"nama": "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover", "SAT": "B", "harga": 13318.89},
-    {"nama": "Paku Beton", "SAT": "B", "harga": 82.14},
-    {"nama": "Pole Bracket 3-9\"", "SAT": "B", "harga": 40873.53},
-    {"nama": "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover", "SAT": "B", "harga": 32634.00},
-]
-data_barang_tambahan = [
-    {"nama": "Segel Plastik", "SAT": "B", "harga": 1946.94},
-    {"nama": "Twisted Cable 2 x 10 mm² - Al", "SAT": "M", "harga": 4816.29},
-    {"nama": "Asuransi", "harga": 0},
-    {"nama": "Twisted Cable 2x10 mm² - Al", "SAT": "B", "harga": 0},
-]
-semua_barang = data_barang + [{"nama": "---- PEMBATAS ----", "SAT": "", "harga": 0}] + data_barang_tambahan
+        st.warning(f"⚠️ Tanggal Survey gagal diperbarui: {survey_result.get('message', 'Unknown error')}")
+    return True
 
 # Dialog untuk preview
 @st.dialog("📋 Preview Rekap", width="large")
 def show_preview_dialog(df_pilih, nama, idpel_selected, lokasi, pekerjaan, ulp, no_spk, vendor):
     id_display = idpel_selected if idpel_selected else ""
     nama_dengan_id = f"{nama} ({id_display})" if id_display else f"{nama}"
+    meta = {
+        "Pekerjaan": pekerjaan or "-",
+        "Nama": nama_dengan_id or "-",
+        "Lokasi": lokasi or "-",
+        "ULP": ulp or "-",
+        "No SPK": no_spk or "-",
+        "Vendor": vendor or "-"
+    }
     
-    # Calculate for Vendor & Pelanggan
-    df_preview_vendor = df_pilih.copy()
-    df_preview_pelanggan = df_pilih.copy()
-    
-    # Update harga untuk preview vendor
-    for i in range(len(df_preview_vendor)):
-        item_name = df_preview_vendor.iloc[i]["Rincian"]
-        qty = df_preview_vendor.iloc[i]["Vol"]
-        harga_v = harga_vendor.get(item_name, 0)
-        df_preview_vendor.loc[df_preview_vendor.index[i], "Harga Satuan Material"] = harga_v
-        df_preview_vendor.loc[df_preview_vendor.index[i], "Harga Total"] = qty * harga_v
-    
-    subtotal_vendor = df_preview_vendor["Harga Total"].sum()
-    ppn_vendor = subtotal_vendor * 0.11
-    total_vendor = subtotal_vendor + ppn_vendor
-    
-    subtotal_pelanggan = df_pilih["Harga Total"].sum()
-    ppn_pelanggan = subtotal_pelanggan * 0.11
-    total_pelanggan = subtotal_pelanggan + ppn_pelanggan
+    # Model preview Vendor & Pelanggan (harga, total, payload export) dihitung
+    # sekali per (IDPEL, volume, meta); interaksi dialog berikutnya memakai cache
+    if HAVE_EXPORT:
+        model = _export_mod.prepare_rekap(SPREADSHEET_ID, idpel_selected, df_pilih, meta)
+    else:
+        model = preview_lokal(df_pilih)
     
     # Tabs
     tab1, tab2 = st.tabs(["📦 VENDOR", "👥 PELANGGAN"])
     
-    with tab1:
-        st.markdown("#### REKAP HARGA PEKERJAAN - VENDOR")
-        st.markdown(f"**PEKERJAAN:** {pekerjaan or '-'}")
-        st.markdown(f"**NAMA:** {nama_dengan_id}")
-        st.markdown(f"**LOKASI:** {lokasi}")
-        st.markdown(f"**ULP:** {ulp or '-'}")
-        st.markdown(f"**NO SPK:** {no_spk or '-'}")
-        st.markdown(f"**VENDOR PELAKSANA:** {vendor or '-'}")
-        st.write("---")
-        st.dataframe(df_preview_vendor[["Rincian", "SAT", "Vol", "Harga Satuan Material", "Harga Total"]], use_container_width=True, hide_index=True)
-        st.write(f"💰 **Subtotal:** Rp {subtotal_vendor:,.2f}")
-        st.write(f"💸 **PPN (11%):** Rp {ppn_vendor:,.2f}")
-        st.success(f"🏷 **TOTAL BIAYA: Rp {total_vendor:,.2f}**")
-    
-    with tab2:
-        st.markdown("#### REKAP HARGA PEKERJAAN - PELANGGAN")
-        st.markdown(f"**PEKERJAAN:** {pekerjaan or '-'}")
-        st.markdown(f"**NAMA:** {nama_dengan_id}")
-        st.markdown(f"**LOKASI:** {lokasi}")
-        st.markdown(f"**ULP:** {ulp or '-'}")
-        st.markdown(f"**NO SPK:** {no_spk or '-'}")
-        st.markdown(f"**VENDOR PELAKSANA:** {vendor or '-'}")
-        st.write("---")
-        st.dataframe(df_pilih[["Rincian", "SAT", "Vol", "Harga Satuan Material", "Harga Total"]], use_container_width=True, hide_index=True)
-        st.write(f"💰 **Subtotal:** Rp {subtotal_pelanggan:,.2f}")
-        st.write(f"💸 **PPN (11%):** Rp {ppn_pelanggan:,.2f}")
-        st.success(f"🏷 **TOTAL BIAYA: Rp {total_pelanggan:,.2f}**")
+    for tab, judul, side in ((tab1, "VENDOR", model["vendor"]), (tab2, "PELANGGAN", model["pelanggan"])):
+        with tab:
+            st.markdown(f"#### REKAP HARGA PEKERJAAN - {judul}")
+            st.markdown(f"**PEKERJAAN:** {pekerjaan or '-'}")
+            st.markdown(f"**NAMA:** {nama_dengan_id}")
+            st.markdown(f"**LOKASI:** {lokasi}")
+            st.markdown(f"**ULP:** {ulp or '-'}")
+            st.markdown(f"**NO SPK:** {no_spk or '-'}")
+            st.markdown(f"**VENDOR PELAKSANA:** {vendor or '-'}")
+            st.write("---")
+            st.dataframe(side["rows"], use_container_width=True, hide_index=True)
+            st.write(f"💰 **Subtotal:** Rp {side['subtotal']:,.2f}")
+            st.write(f"💸 **PPN (11%):** Rp {side['ppn']:,.2f}")
+            st.success(f"🏷 **TOTAL BIAYA: Rp {side['total']:,.2f}**")
     
     # Action buttons
     st.write("---")
@@ -201,16 +169,9 @@ def show_preview_dialog(df_pilih, nama, idpel_selected, lokasi, pekerjaan, ulp,
             st.rerun()
     
     with col_btn3:
-        if st.button("✅ Konfirmasi & Export", type="primary", use_container_width=True, key="btn_export"):
-            meta = {
-                "Pekerjaan": pekerjaan or "-",
-                "Nama": nama_dengan_id or "-",
-                "Lokasi": lokasi or "-",
-                "ULP": ulp or "-",
-                "No SPK": no_spk or "-",
-                "Vendor": vendor or "-"
-            }
-            
+        if not HAVE_EXPORT:
+            st.error("❌ Modul export rekap gagal dimuat; rekap tidak bisa diexport.")
+        elif st.button("✅ Konfirmasi & Export", type="primary", use_container_width=True, key="btn_export"):
             now = now_jakarta().strftime("%Y%m%d_%H%M")
             safe_name = str(nama).replace("/", "-").replace("\\", "-")
             title_vendor = f"REKAP {safe_name} - {now}_Vendor"
@@ -218,27 +179,39 @@ def show_preview_dialog(df_pilih, nama, idpel_selected, lokasi, pekerjaan, ulp,
             
             with st.spinner("Menulis dua rekapan (Vendor & Pelanggan) ke Google Sheets..."):
                 try:
-                    from export_rekap_sheets import export_rekap_pair
-                    pair_info = export_rekap_pair(
-                        spreadsheet_id=SPREADSHEET_ID,
-                        base_sheet_title_vendor=title_vendor,
-                        base_sheet_title_pelanggan=title_pelanggan,
-                        meta=meta,
-                        df_pilih=df_pilih,
-                        idpel=idpel_selected,
-                        gid=GID,
+                    # Write-ahead: catat dulu di antrean lokal, lalu kirim. Judul hanya
+                    # beresolusi menit: hash isi rekap (kunci preview) ikut di kunci
+                    # idempotensi agar koreksi volume di menit yang sama tidak dibuang
+                    group_key = f"rekap:{idpel_selected}:{title_vendor}:{model['key'][:16]}"
+                    outbox.enqueue(
+                        "rekap_export",
+                        {
+                            "spreadsheet_id": SPREADSHEET_ID,
+                            "title_vendor": title_vendor,
+                            "title_pelanggan": title_pelanggan,
+                            "meta": meta,
+                            "df_pilih": json.loads(df_pilih.to_json(orient="records")),
+                            "idpel": idpel_selected,
+                            "gid": GID,
+                            # payload hasil preview dikirim apa adanya (tanpa dibangun ulang)
+                            "values_mode": model["vendor"]["values_mode"],
+                            "prepared": {
+                                side: {k: model[side][k] for k in ("payload", "layout_version", "values_mode")}
+                                for side in ("vendor", "pelanggan")
+                            },
+                        },
+                        idem_key=group_key,
+                        group_key=group_key,
                     )
+                    outbox.drain_async(group_key)
+                    item = outbox.wait(group_key, EXPORT_WAIT)[0]
                     
-                    st.success(
-                        f"✅ Berhasil membuat: **{pair_info['vendor']['sheet_title']}** dan "
-                        f"**{pair_info['pelanggan']['sheet_title']}**"
-                    )
-                    
-                    survey_result = pair_info.get("survey_result", {})
-                    if survey_result.get("success", False):
-                        st.info(f"📅 {survey_result.get('message', 'Tanggal Survey berhasil diperbarui')}")
-                    else:
-                        st.warning(f"⚠️ Tanggal Survey gagal diperbarui: {survey_result.get('message', 'Unknown error')}")
+                    if item["status"] in ("pending", "running") and not item["attempts"]:
+                        st.session_state["export_berjalan"] = group_key
+                        st.info("⏳ Export masih berjalan di latar belakang; statusnya tampil di bagian Export.")
+                        return
+                    if not show_export_status(item):
+                        return
                     
                     st.balloons()
                     
@@ -257,28 +230,12 @@ st.title("📋 Daftar Barang & Input Petugas")
 # Filter: Tanggal + Search ID/Nama
 st.subheader("🔎 Filter & Pilih Pelanggan")
 
-# Konversi Timestamp ke Date
-if "Timestamp" in df_sheets.columns:
-    try:
-        df_sheets["Date"] = pd.to_datetime(
-            df_sheets["Timestamp"], 
-            format="%d/%m/%Y %H:%M:%S",
-            errors='coerce'
-        ).dt.date
-    except Exception:
-        df_sheets["Date"] = pd.to_datetime(
-            df_sheets["Timestamp"], 
-            errors='coerce'
-        ).dt.date
-
 col_filter1, col_filter2 = st.columns(2)
 
 with col_filter1:
-    if "Date" in df_sheets.columns:
-        available_dates = df_sheets["Date"].dropna().unique()
-        available_dates = sorted([d for d in available_dates if d], reverse=True)
-        
-        date_options = ["Semua Tanggal"] + [str(d) for d in available_dates]
+    if "Timestamp" in df_sheets.columns:
+        # tanggal sudah diparse di indeks, tidak diulang tiap rerun
+        date_options = ["Semua Tanggal"] + index_pelanggan.date_options
         
         selected_date = st.selectbox(
             "📅 Filter Tanggal:",
@@ -296,36 +253,21 @@ with col_filter2:
         key="filter_search"
     )
 
-# Apply filters
-df_filtered = df_sheets.copy()
-
-if selected_date != "Semua Tanggal" and "Date" in df_sheets.columns:
-    df_filtered = df_filtered[df_filtered["Date"].astype(str) == selected_date]
-
-if search_text.strip():
-    search_lower = search_text.strip().lower()
-    mask_id = df_filtered["ID Pelanggan"].astype(str).str.lower().str.contains(search_lower, na=False)
-    
-    if "Nama" in df_filtered.columns:
-        mask_nama = df_filtered["Nama"].astype(str).str.lower().str.contains(search_lower, na=False)
-        df_filtered = df_filtered[mask_id | mask_nama]
-    else:
-        df_filtered = df_filtered[mask_id]
+# Apply filters: hanya SEARCH_LIMIT hasil teratas (awalan ID persis lebih dulu)
+hasil_cari, result_count = index_pelanggan.search(
+    search_text=search_text,
+    selected_date=None if selected_date == "Semua Tanggal" else selected_date,
+)
 
 # Buat dropdown dari hasil filter
-filtered_options = ["- Pilih ID -"]
-if not df_filtered.empty:
-    for _, row in df_filtered.iterrows():
-        pid = str(row["ID Pelanggan"]).strip()
-        pnama = str(row.get("Nama", "-")).strip()
-        if pid:
-            filtered_options.append(f"{pid} ({pnama})")
-    
-    result_count = len(filtered_options) - 1
-    if result_count > 0:
-        st.info(f"✅ Ditemukan **{result_count}** pelanggan yang sesuai filter")
-    else:
-        st.warning("⚠️ Tidak ada pelanggan yang cocok dengan filter. Coba ubah filter.")
+filtered_options = ["- Pilih ID -"] + hasil_cari
+if result_count > SEARCH_LIMIT:
+    st.info(
+        f"✅ Ditemukan **{result_count}** pelanggan, ditampilkan {SEARCH_LIMIT} teratas. "
+        "Perjelas pencarian untuk mempersempit hasil."
+    )
+elif result_count > 0:
+    st.info(f"✅ Ditemukan **{result_count}** pelanggan yang sesuai filter")
 else:
     st.warning("⚠️ Tidak ada pelanggan yang cocok dengan filter. Coba ubah filter.")
 
@@ -368,7 +310,7 @@ with col1:
             nama = str(first_row.get("Nama", "-"))
             lokasi = str(first_row.get("Alamat kWH Meter", "-"))
         else:
-            nama = id_to_name.get(idpel_selected, "-")
+            nama = index_pelanggan.name_of(idpel_selected)
 
         st.markdown(f"**NAMA:** {nama}")
         st.markdown(f"**LOKASI PEKERJAAN:** {lokasi}")
@@ -381,43 +323,29 @@ with col1:
         st.info("Silakan pilih ID Pelanggan untuk melihat detail.")
 
 # Input barang
-barang_dipilih = []
+qty_form = KATALOG.empty_qty()
 with col2:
     st.subheader("🛠 Input Kuantitas Barang")
     with st.form("form_barang"):
-        for idx, barang in enumerate(semua_barang):
-            if str(barang.get("nama", "")).startswith("----"):
+        for idx in range(len(KATALOG)):
+            if idx == N_BARANG_UTAMA:
                 st.markdown("---")
-                continue
-
-            key_name = f"qty_{idx}"
-            sat_label = barang.get("SAT", "")
-            qty = st.number_input(
-                f"{barang.get('nama', 'Item')} ({sat_label})",
+            qty_form[idx] = st.number_input(
+                f"{KATALOG.names[idx]} ({KATALOG.sat[idx]})",
                 min_value=0,
                 step=1,
-                key=key_name
+                key=f"qty_{idx}"
             )
-            if qty and qty > 0:
-                harga = float(barang.get("harga", 0) or 0)
-                total = qty * harga
-                barang_dipilih.append({
-                    "Rincian": barang.get("nama", ""),
-                    "SAT": sat_label,
-                    "Vol": int(qty),
-                    "Harga Satuan Material": harga,
-                    "Harga Total": total
-                })
         submitted = st.form_submit_button("Hitung Rekap")
 
-# Simpan hasil di session_state
+# Simpan volume di session_state (satu array int32, bukan list of dict)
 if submitted:
-    st.session_state["barang_dipilih"] = barang_dipilih
-barang_dipilih = st.session_state.get("barang_dipilih", barang_dipilih)
+    st.session_state["qty_barang"] = qty_form
+qty_barang = st.session_state.get("qty_barang")
 
-# Rekapitulasi
+# Rekapitulasi: tabel diturunkan dari array volume saat dibutuhkan
 st.subheader("📦 Rekapitulasi")
-df_pilih = pd.DataFrame(barang_dipilih) if barang_dipilih else pd.DataFrame()
+df_pilih = KATALOG.rekap_df(qty_barang) if qty_barang is not None and np.any(qty_barang) else pd.DataFrame()
 
 if not df_pilih.empty:
     st.markdown(f"**PEKERJAAN:** {pekerjaan or '-'}")
@@ -431,7 +359,7 @@ if not df_pilih.empty:
     st.dataframe(df_pilih, use_container_width=True)
 
     subtotal = df_pilih["Harga Total"].sum()
-    ppn = subtotal * 0.11
+    ppn = subtotal * PPN_RATE
     total_biaya = subtotal + ppn
 
     st.write(f"💰 **Subtotal:** Rp {subtotal:,.2f}")
@@ -440,10 +368,61 @@ if not df_pilih.empty:
 else:
     st.info("Belum ada barang yang dipilih (isi kuantitas > 0).")
 
+# Riwayat rekap dari ledger lokal (tanpa membaca Sheets)
+if idpel_selected:
+    riwayat = rekap_ledger.history(idpel_selected)
+    with st.expander(f"🗂 Riwayat Rekap ({len(riwayat)})", expanded=False):
+        if not riwayat:
+            st.info("Belum ada rekap untuk pelanggan ini.")
+        else:
+            st.dataframe(
+                pd.DataFrame([{
+                    "Waktu": datetime.fromtimestamp(r["created_at"], tz=rekap_ledger.WIB).strftime("%d/%m/%Y %H:%M"),
+                    "Tab Vendor": r["title_vendor"],
+                    "Total Vendor": r["total_vendor"],
+                    "Total Pelanggan": r["total_pelanggan"],
+                    "Item": ", ".join(f"{it.get('Rincian')} x{it.get('Vol')}" for it in r["items"]),
+                } for r in riwayat]),
+                use_container_width=True,
+                hide_index=True,
+            )
+            idx_riwayat = st.selectbox(
+                "Pilih rekap untuk diexport ulang:",
+                range(len(riwayat)),
+                format_func=lambda i: riwayat[i]["title_vendor"],
+                key="select_riwayat",
+            )
+            pilihan_riwayat = riwayat[idx_riwayat]
+            if st.button("🔁 Export Ulang", key="btn_reexport"):
+                m = pilihan_riwayat["meta"]
+                show_preview_dialog(
+                    pd.DataFrame(pilihan_riwayat["items"]),
+                    str(m.get("Nama", nama)).removesuffix(f" ({idpel_selected})"),
+                    idpel_selected,
+                    m.get("Lokasi", lokasi),
+                    m.get("Pekerjaan", ""),
+                    m.get("ULP", ""),
+                    m.get("No SPK", ""),
+                    m.get("Vendor", ""),
+                )
+
 # Tombol Export
 st.markdown("---")
 st.subheader("📤 Export Rekap ke Google Sheets")
 
+# Export yang belum selesai saat dialog ditutup: status dari antrean lokal
+export_berjalan = st.session_state.get("export_berjalan")
+if export_berjalan:
+    item_berjalan = next(iter(outbox.items(group_key=export_berjalan)), None)
+    if item_berjalan is None:
+        st.session_state.pop("export_berjalan", None)
+    elif item_berjalan["status"] in ("pending", "running") and not item_berjalan["attempts"]:
+        st.info("⏳ Export rekap sebelumnya masih berjalan di latar belakang...")
+        st.button("🔄 Cek status export", key="btn_cek_export")
+    else:
+        show_export_status(item_berjalan)
+        st.session_state.pop("export_berjalan", None)
+
 if st.button("📥 Export ke Google Sheets", type="primary"):
     if not idpel_selected:
         st.error("⚠️ Silakan pilih ID Pelanggan terlebih dahulu!")
@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Halaman dijalankan lewat app.py dengan backend lokal (tanpa Google); harus
+# diset sebelum auth/local_backend diimpor.
+os.environ.setdefault("GESER_METER_BACKEND", "local")
+os.environ.setdefault("GESER_METER_LOCAL_DIR", tempfile.mkdtemp(prefix="geser_meter_test_"))
+
+import outbox  # noqa: E402
+import shared_cache  # noqa: E402
+
+
+@pytest.fixture
+def outbox_dir(tmp_path, monkeypatch):
+    """Antrean outbox kosong per test"""
+    monkeypatch.setattr(outbox, "OUTBOX_DIR", str(tmp_path / "outbox"))
+    return tmp_path / "outbox"
+
+
+@pytest.fixture
+def local_cache():
+    """shared_cache bersih per test"""
+    shared_cache.set_backend(shared_cache.LocalCache())
+    yield shared_cache.get_backend()
+    shared_cache.set_backend(shared_cache.LocalCache())
+
+
+@pytest.fixture
+def fake_sheet(local_cache, outbox_dir, tmp_path, monkeypatch):
+    """fake_google.FakeBackend berisi sheet pelanggan + template, terpasang di auth"""
+    import auth
+    import pelanggan
+    import rekap_ledger
+    import sheet_columns
+    from fake_google import FakeBackend, seed_workbook
+
+    monkeypatch.setattr(rekap_ledger, "REKAP_LEDGER_PATH", str(tmp_path / "rekap_ledger.sqlite3"))
+    monkeypatch.setattr(pelanggan, "_pending", {})
+    backend = FakeBackend(latency=0.0, seed=0)
+    ids = seed_workbook(backend, 20, seed=0)
+    auth.set_backend_override(backend.client(), backend.drive_service())
+    pelanggan.clear_cache()
+    sheet_columns.forget(ids["spreadsheet_id"], ids["gid"])
+    yield {"backend": backend, **ids}
+    auth.set_backend_override(None, None)
+    pelanggan.clear_cache()
+    sheet_columns.forget(ids["spreadsheet_id"], ids["gid"])
@@ -0,0 +1,68 @@
+import io
+import zipfile
+
+import pytest
+
+from eksekusi_batch import group_photos, idpel_from_path
+
+
+class Upload(io.BytesIO):
+    """Pengganti UploadedFile Streamlit (turunan BytesIO dengan name & size)"""
+
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("513100000035/a.jpg", "513100000035"),
+    ("513100000035_1.jpg", "513100000035"),
+    ("513100000035-depan.png", "513100000035"),
+    ("513100000035 (2).jpg", "513100000035"),
+    ("eksekusi/513100000035/IMG_01.jpg", "513100000035"),
+    ("eksekusi\\513100000035\\IMG_01.jpg", "513100000035"),
+    ("513100000035.jpg", "513100000035"),
+    ("IMG_0001.jpg", None),
+    ("12345_a.jpg", None),
+    ("513100000035abc.jpg", None),
+])
+def test_idpel_from_path(path, expected):
+    assert idpel_from_path(path) == expected
+
+
+def _zip(entries: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, data in entries.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_group_photos_from_zip_and_files():
+    archive = _zip({
+        "513100000035/a.jpg": b"a",
+        "513100000035/b.PNG": b"bb",
+        "513100000036_1.jpeg": b"ccc",
+        "513100000036/catatan.txt": b"-",
+        "__MACOSX/513100000035/._a.jpg": b"x",
+        "513100000035/.DS_Store": b"x",
+        "lain/IMG_01.jpg": b"x",
+    })
+    groups, skipped = group_photos([
+        Upload("foto.zip", archive),
+        Upload("513100000037_depan.jpg", b"dddd"),
+    ])
+
+    assert list(groups) == ["513100000035", "513100000036", "513100000037"]
+    assert [p["name"] for p in groups["513100000035"]] == ["a.jpg", "b.PNG"]
+    assert groups["513100000035"][1]["mime"] == "image/png"
+    assert groups["513100000036"][0]["ext"] == "jpeg"
+    assert sorted(skipped) == ["513100000036/catatan.txt", "lain/IMG_01.jpg"]
+
+
+def test_group_photos_reads_lazily():
+    groups, _ = group_photos([Upload("foto.zip", _zip({"513100000035/a.jpg": b"isi foto"}))])
+    photo = groups["513100000035"][0]
+    assert photo["size"] == len(b"isi foto")
+    assert bytes(photo["read"]()) == b"isi foto"
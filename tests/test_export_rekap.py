@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+
+import auth
+import export_rekap_sheets as ers
+
+BARANG = pd.DataFrame([
+    {"Rincian": "Jasa Kegiatan Geser APP", "SAT": "PLG", "Vol": 1},
+    {"Rincian": "Service wedge clamp 2/4 x 6/10 mm", "SAT": "B", "Vol": 2},
+    {"Rincian": "Twisted Cable 2 x 10 mm² - Al", "SAT": "M", "Vol": 15},
+])
+META = {"Pekerjaan": "Geser APP", "Nama": "Uji", "Lokasi": "-", "ULP": "-", "No SPK": "-", "Vendor": "-"}
+
+
+def _without_named_ranges(sheet, template_title: str):
+    data = sheet["backend"].spreadsheets[sheet["spreadsheet_id"]]
+    sheet_id = data.tab_by_title(template_title).sheet_id
+    data.named_ranges = [nr for nr in data.named_ranges if nr["range"]["sheetId"] != sheet_id]
+
+
+def _titles(sheet):
+    return [ws.title for ws in auth.open_spreadsheet(sheet["spreadsheet_id"]).worksheets()]
+
+
+def test_default_layout_has_no_price_ranges(fake_sheet):
+    _without_named_ranges(fake_sheet, ers.TEMPLATE_PELANGGAN_TITLE)
+    layout = ers.get_template_layout(fake_sheet["spreadsheet_id"], ers.TEMPLATE_PELANGGAN_TITLE)
+    assert layout["source"] == "default"
+    assert not layout["errors"]
+    assert layout["ranges"]["HARGA"] is None and layout["ranges"]["TOTAL"] is None
+
+
+def test_values_mode_requires_named_price_ranges(fake_sheet):
+    _without_named_ranges(fake_sheet, ers.TEMPLATE_PELANGGAN_TITLE)
+    before = _titles(fake_sheet)
+    with pytest.raises(RuntimeError, match="HARGA/TOTAL"):
+        ers.export_rekap_to_sheet(fake_sheet["spreadsheet_id"], "REKAP UJI", META, BARANG,
+                                  ers.TEMPLATE_PELANGGAN_TITLE, ers.HARGA_PELANGGAN, values_mode=True)
+    # ditolak sebelum template diduplikat
+    assert _titles(fake_sheet) == before
+
+    # mode formula tetap jalan dengan layout default
+    info = ers.export_rekap_to_sheet(fake_sheet["spreadsheet_id"], "REKAP UJI", META, BARANG,
+                                     ers.TEMPLATE_PELANGGAN_TITLE, values_mode=False)
+    assert info["sheet_title"] in _titles(fake_sheet)
+
+
+@pytest.mark.parametrize("template_title, harga", [
+    (ers.TEMPLATE_VENDOR_TITLE, ers.HARGA_VENDOR),
+    (ers.TEMPLATE_PELANGGAN_TITLE, ers.HARGA_PELANGGAN),
+])
+def test_values_mode_totals_match_template_formulas(fake_sheet, template_title, harga):
+    before = _titles(fake_sheet)
+    assert ers.verify_values_mode(fake_sheet["spreadsheet_id"], BARANG, template_title, harga) == []
+    # tab formula sementara dihapus lagi
+    assert _titles(fake_sheet) == before
+
+
+def test_verify_values_mode_reports_price_mismatch(fake_sheet):
+    harga = {**ers.HARGA_VENDOR, "Jasa Kegiatan Geser APP": ers.HARGA_VENDOR["Jasa Kegiatan Geser APP"] + 1000}
+    mismatches = ers.verify_values_mode(fake_sheet["spreadsheet_id"], BARANG, ers.TEMPLATE_VENDOR_TITLE, harga)
+    # harga satuan & total baris item itu, plus subtotal/PPN/total
+    assert len(mismatches) == 5
+    assert all("values mode" in m and "formula" in m for m in mismatches)
+
+
+def test_retention_keeps_tabs_in_flight_on_other_replicas(fake_sheet):
+    import shared_cache
+
+    sid = fake_sheet["spreadsheet_id"]
+    data = fake_sheet["backend"].spreadsheets[sid]
+    titles = [f"REKAP Uji {i} - 202601{i + 1:02d}_0800_Vendor" for i in range(4)]
+    for title in titles:
+        data.add_tab(title, [[""]])
+    ers.invalidate_worksheet_registry(sid)
+    # tab terlama sedang ditulis export di replika lain
+    shared_cache.set(ers._in_flight_key(sid, titles[0]), True, ers.IN_FLIGHT_TTL)
+
+    ers.cleanup_old_rekap(auth.open_spreadsheet(sid), keep_latest=2)
+    remaining = [t for t in _titles(fake_sheet) if t.startswith("REKAP ")]
+    assert sorted(remaining) == sorted([titles[0], titles[2], titles[3]])
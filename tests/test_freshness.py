@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import freshness
+import shared_cache
+
+TOKEN = "rahasia"
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_WEBHOOK_TOKEN", TOKEN)
+
+
+def _body(**data) -> bytes:
+    return json.dumps(data).encode("utf-8")
+
+
+def test_push_refused_without_configured_token(local_cache, monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_WEBHOOK_TOKEN", "")
+    status, _ = freshness.handle_push({}, _body(spreadsheet_id="sheet1", token=""))
+    assert status == 403
+    assert shared_cache.get(freshness._push_key("sheet1")) is None
+
+
+def test_push_with_wrong_token_is_refused(local_cache, token):
+    status, _ = freshness.handle_push({}, _body(spreadsheet_id="sheet1", token="salah"))
+    assert status == 403
+    assert shared_cache.get(freshness._push_key("sheet1")) is None
+
+
+def test_apps_script_push_notifies(local_cache, token):
+    status, _ = freshness.handle_push({}, _body(spreadsheet_id="sheet1", token=TOKEN))
+    assert status == 200
+    assert shared_cache.get(freshness._push_key("sheet1")).startswith("push:")
+
+
+def test_drive_push_headers(local_cache, token):
+    headers = {
+        "X-Goog-Channel-ID": f"{freshness.CHANNEL_PREFIX}.sheet1.abcd1234",
+        "X-Goog-Channel-Token": TOKEN,
+        "X-Goog-Resource-State": "sync",
+    }
+    assert freshness.handle_push(headers) == (200, "sync")
+    assert shared_cache.get(freshness._push_key("sheet1")) is None
+
+    headers["X-Goog-Resource-State"] = "update"
+    assert freshness.handle_push(headers) == (200, "ok")
+    assert shared_cache.get(freshness._push_key("sheet1")) is not None
+
+
+def test_push_rejects_bad_body_and_unknown_sheet(local_cache, token):
+    assert freshness.handle_push({}, b"bukan json")[0] == 400
+    assert freshness.handle_push({}, _body(token=TOKEN))[0] == 400
+    headers = {"X-Goog-Channel-ID": "lain.sheet1.x", "X-Goog-Channel-Token": TOKEN}
+    assert freshness.handle_push(headers)[0] == 400
+
+
+def test_receiver_requires_token_and_shared_cache(local_cache, monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_WEBHOOK_TOKEN", "")
+    assert "FRESHNESS_WEBHOOK_TOKEN" in freshness.receiver_config_error()
+    monkeypatch.setattr(freshness, "FRESHNESS_WEBHOOK_TOKEN", TOKEN)
+    assert "SHARED_CACHE_URL" in freshness.receiver_config_error()
+    shared_cache.set_backend(shared_cache.RedisCache(shared_cache.FakeRedis()))
+    assert freshness.receiver_config_error() is None
+
+
+def test_webhook_mode_without_shared_cache_polls(local_cache, monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_MODE", "webhook")
+    monkeypatch.setattr(freshness, "_stub_attached", False)
+    assert freshness.mode() == "poll"
+    shared_cache.set_backend(shared_cache.RedisCache(shared_cache.FakeRedis()))
+    assert freshness.mode() == "webhook"
+
+
+def test_row_count_signal_has_short_max_age():
+    assert freshness.max_age("rows:1000") == min(freshness.FRESHNESS_MAX_AGE, freshness.FRESHNESS_ROWS_MAX_AGE)
+    assert freshness.max_age(None) == min(freshness.FRESHNESS_MAX_AGE, freshness.FRESHNESS_ROWS_MAX_AGE)
+    assert freshness.max_age("drive:12") == freshness.FRESHNESS_MAX_AGE
+
+
+def test_append_push_is_not_an_edit(local_cache, token, monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_MODE", "webhook")
+    monkeypatch.setattr(freshness, "_stub_attached", True)
+    freshness.handle_push({}, _body(spreadsheet_id="sheet1", token=TOKEN))
+    seen = freshness.signal("sheet1", "0")
+    freshness.handle_push({}, _body(spreadsheet_id="sheet1", token=TOKEN, append=True))
+    assert freshness.appended_only("sheet1", seen)
+    freshness.handle_push({}, _body(spreadsheet_id="sheet1", token=TOKEN))
+    assert not freshness.appended_only("sheet1", seen)
+    assert not freshness.appended_only("sheet1", "drive:12")
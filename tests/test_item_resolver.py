@@ -0,0 +1,42 @@
+from export_rekap_sheets import ItemResolver
+
+ITEMS = (
+    "Jasa Kegiatan Geser APP",
+    "Conn. press AL/AL type 10-16 mm2 / 10-16 mm2 + Scoot + Cover",
+    "Conn. press AL/AL type 10-16 mm2 / 50-70 mm2 + Scoot + Cover",
+    "Imundex klem",
+    "",
+)
+
+
+def test_exact_and_normalized_names():
+    r = ItemResolver(ITEMS)
+    assert r.resolve("Imundex klem") == 3
+    assert r.resolve("  IMUNDEX   Klem ") == 3
+    assert r.resolve("") is None
+
+
+def test_aliases():
+    r = ItemResolver(ITEMS)
+    assert r.resolve("Jasa Kegiatan") == 0
+    assert r.resolve("Conn. press AL/AL 50-70 mm² + Scoot + Cover") == 2
+
+
+def test_near_miss_is_not_mapped_to_another_item():
+    r = ItemResolver(ITEMS)
+    variant = "Conn. press AL/AL type 10-16 mm2 / 16-35 mm2 + Scoot + Cover"
+    assert r.resolve(variant) is None
+    # kandidat mirip hanya untuk pesan error layout
+    assert r.suggest(variant) in ITEMS[1:3]
+
+
+def test_suggest_ignores_known_and_unrelated_names():
+    r = ItemResolver(ITEMS)
+    assert r.suggest("Imundex klem") is None
+    assert r.suggest("Kabel NYM 3x2.5") is None
+
+
+def test_resolve_many_marks_unknown():
+    r = ItemResolver(ITEMS)
+    idx = r.resolve_many(["Imundex klem", "tidak ada", "Jasa Kegiatan", "Imundex klem"])
+    assert idx.tolist() == [3, -1, 0, 3]
@@ -0,0 +1,117 @@
+import threading
+
+import outbox
+
+
+def _register(monkeypatch, kind, fn):
+    monkeypatch.setitem(outbox._handlers, kind, fn)
+
+
+def test_same_idem_key_is_enqueued_once(outbox_dir, monkeypatch):
+    calls = []
+    _register(monkeypatch, "test_write", lambda payload, blob: calls.append(payload) or {"ok": True})
+
+    first = outbox.enqueue("test_write", {"n": 1}, idem_key="write:1", group_key="g")
+    second = outbox.enqueue("test_write", {"n": 1}, idem_key="write:1", group_key="g")
+    assert first == second
+    assert len(outbox.items(group_key="g")) == 1
+
+    outbox.drain(group_key="g")
+    outbox.enqueue("test_write", {"n": 1}, idem_key="write:1", group_key="g")
+    outbox.drain(group_key="g")
+    assert len(calls) == 1
+    assert calls[0]["idem_key"] == "write:1"
+
+
+def test_resubmit_revives_failed_item(outbox_dir, monkeypatch):
+    state = {"fail": True}
+
+    def handler(payload, blob):
+        if state["fail"]:
+            raise outbox.PermanentError("rusak")
+        return {"ok": True}
+
+    _register(monkeypatch, "test_write", handler)
+    outbox.enqueue("test_write", {}, idem_key="write:2", group_key="g")
+    outbox.drain(group_key="g")
+    assert outbox.items(group_key="g")[0]["status"] == "failed"
+
+    state["fail"] = False
+    outbox.enqueue("test_write", {}, idem_key="write:2", group_key="g")
+    outbox.drain(group_key="g")
+    assert outbox.items(group_key="g")[0]["status"] == "done"
+
+
+def test_blob_is_stored_under_its_content_hash(outbox_dir, monkeypatch):
+    seen = []
+    _register(monkeypatch, "test_upload", lambda payload, blob: seen.append(blob) or {})
+    data = b"foto" * 1000
+    digest = outbox.content_hash(data)
+
+    outbox.enqueue("test_upload", {}, idem_key=f"upload:1:{digest}", blob=data, blob_digest=digest, group_key="g")
+    outbox.enqueue("test_upload", {}, idem_key=f"upload:2:{digest}", blob=memoryview(data), group_key="g")
+    blobs = {it["blob_path"] for it in outbox.items(group_key="g")}
+    assert len(blobs) == 1
+    assert blobs.pop().endswith(digest)
+
+
+def test_items_filters_by_idem_keys(outbox_dir, monkeypatch):
+    _register(monkeypatch, "test_write", lambda payload, blob: {})
+    for key in ("lama", "baru:1", "baru:2"):
+        outbox.enqueue("test_write", {}, idem_key=key, group_key="eksekusi:1:01012026")
+
+    got = outbox.items(group_key="eksekusi:1:01012026", idem_keys=["baru:1", "baru:2"])
+    assert [it["idem_key"] for it in got] == ["baru:1", "baru:2"]
+    assert outbox.items(idem_keys=[]) == []
+
+
+def test_required_failure_blocks_dependent_item(outbox_dir, monkeypatch):
+    written = []
+
+    def upload(payload, blob):
+        if payload["bad"]:
+            raise outbox.PermanentError("foto rusak")
+        return {}
+
+    _register(monkeypatch, "test_upload", upload)
+    _register(monkeypatch, "test_tanggal", lambda payload, blob: written.append(payload) or {})
+
+    outbox.enqueue("test_upload", {"bad": True}, idem_key="upload:lama", group_key="g")
+    outbox.drain(group_key="g")
+
+    # submit baru di group yang sama tidak terhalang upload lama yang gagal
+    outbox.enqueue("test_upload", {"bad": False}, idem_key="upload:baru", group_key="g")
+    outbox.enqueue("test_tanggal", {}, idem_key="tanggal:1", group_key="g", requires=["upload:baru"])
+    outbox.drain(group_key="g")
+    assert len(written) == 1
+
+    # upload submit ini gagal -> tanggal tidak ditulis
+    outbox.enqueue("test_upload", {"bad": True}, idem_key="upload:x", group_key="h")
+    outbox.enqueue("test_tanggal", {}, idem_key="tanggal:2", group_key="h", requires=["upload:x"])
+    outbox.drain(group_key="h")
+    assert len(written) == 1
+    status = {it["idem_key"]: it["status"] for it in outbox.items(group_key="h")}
+    assert status == {"upload:x": "failed", "tanggal:2": "failed"}
+
+
+def test_dependent_item_waits_for_pending_requirement(outbox_dir, monkeypatch):
+    _register(monkeypatch, "test_tanggal", lambda payload, blob: {})
+    # prasyarat di group lain tanpa handler terdaftar: tetap pending
+    outbox.enqueue("test_unhandled", {}, idem_key="upload:pending", group_key="lain")
+    outbox.enqueue("test_tanggal", {}, idem_key="tanggal:3", group_key="g", requires=["upload:pending"])
+    outbox.drain(group_key="g")
+    assert outbox.items(group_key="g")[0]["status"] == "pending"
+
+
+def test_drain_async_does_not_block_the_caller(outbox_dir, monkeypatch):
+    release = threading.Event()
+    _register(monkeypatch, "test_write", lambda payload, blob: release.wait(5) and {"ok": True})
+    outbox.enqueue("test_write", {}, idem_key="write:3", group_key="g")
+
+    t = outbox.drain_async("g")
+    # handler masih jalan: wait() kembali setelah timeout dengan status apa adanya
+    assert outbox.wait("g", timeout=0.1)[0]["status"] in ("pending", "running")
+
+    release.set()
+    assert outbox.wait("g", timeout=5)[0]["status"] == "done"
+    t.join(5)
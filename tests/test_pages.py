@@ -0,0 +1,61 @@
+"""Smoke test: tiap halaman dimuat lewat app.py (seperti di server), backend lokal."""
+import os
+import sys
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import rekap_ledger
+from conftest import ROOT
+
+APP = os.path.join(ROOT, "app.py")
+
+
+@pytest.fixture
+def app(outbox_dir, local_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(rekap_ledger, "REKAP_LEDGER_PATH", str(tmp_path / "rekap_ledger.sqlite3"))
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    return at
+
+
+@pytest.mark.parametrize("page", ["Proses", "Eksekusi", "Data Pelanggan"])
+def test_page_loads_through_app(app, page):
+    if app.sidebar.selectbox[0].value != page:
+        app.sidebar.selectbox[0].select(page).run()
+    assert not app.exception, [e.value for e in app.exception]
+    errors = [e.value for e in app.error]
+    assert not any("Gagal memuat halaman" in msg or "tidak ditemukan" in msg for msg in errors), errors
+    assert not errors, errors
+
+
+def test_preview_works_without_export_module(outbox_dir, local_cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(rekap_ledger, "REKAP_LEDGER_PATH", str(tmp_path / "rekap_ledger.sqlite3"))
+    monkeypatch.setitem(sys.modules, "export_rekap_sheets", None)  # import gagal
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    assert any("Modul export rekap gagal dimuat" in w.value for w in at.warning)
+
+    at.selectbox(key="select_idpel").select(at.selectbox(key="select_idpel").options[1])
+    at.number_input(key="qty_0").set_value(1)
+    next(b for b in at.button if b.label == "Hitung Rekap").click().run()
+    next(b for b in at.button if "Export ke Google Sheets" in b.label).click().run()
+
+    assert not at.exception, [e.value for e in at.exception]
+    assert any("REKAP HARGA PEKERJAAN - VENDOR" in m.value for m in at.markdown)
+    assert [e.value for e in at.error] == ["Modul export rekap gagal dimuat; rekap tidak bisa diexport."]
+
+
+def test_download_is_served_once_and_file_removed(app, tmp_path, monkeypatch):
+    import export_data
+
+    monkeypatch.setattr(export_data, "EXPORT_DIR", str(tmp_path / "exports"))
+    app.sidebar.selectbox[0].select("Data Pelanggan").run()
+    next(b for b in app.button if "Siapkan" in b.label).click().run()
+    assert not app.exception, [e.value for e in app.exception]
+    assert len(app.get("download_button")) == 1
+    assert os.listdir(export_data.EXPORT_DIR) == []
+
+    # rerun berikutnya tidak membaca/menyajikan file lagi
+    app.run()
+    assert app.get("download_button") == []
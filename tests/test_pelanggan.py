@@ -0,0 +1,121 @@
+import pytest
+
+import auth
+import freshness
+import pelanggan
+import sheet_columns
+import shared_cache
+import tracing
+
+
+def _events(name: str) -> int:
+    return next((row["events"] for row in tracing.summary() if row["name"] == name), 0)
+
+
+def _ws(sheet):
+    return auth.get_worksheet(auth.open_spreadsheet(sheet["spreadsheet_id"]), gid=sheet["gid"])
+
+
+def _idpel(sheet, row: int) -> str:
+    tab = sheet["backend"].spreadsheets[sheet["spreadsheet_id"]].tabs[0]
+    col = [str(h) for h in tab.values[0]].index(sheet_columns.label("id_pelanggan"))
+    return str(tab.values[row - 1][col])
+
+
+def _poll(sheet):
+    """Lewati interval poll: sinyal berikutnya dibaca langsung"""
+    shared_cache.delete(f"freshness:signal:{sheet['spreadsheet_id']}:{sheet['gid']}")
+
+
+def test_own_write_is_adopted_only_in_this_process(fake_sheet):
+    sid, gid = fake_sheet["spreadsheet_id"], fake_sheet["gid"]
+    pelanggan.fetch_pelanggan_df(sid, gid)
+    seen_key = f"pelanggan:signal:{sid}:{gid}"
+    seen = shared_cache.get(seen_key)
+
+    idpel = _idpel(fake_sheet, 3)
+    assert pelanggan.update_tanggal_eksekusi(sid, gid, idpel, "01/02/2026")["success"]
+    # kunci bersama tidak digeser: replika lain tetap memuat ulang
+    assert shared_cache.get(seen_key) == seen
+
+    tracing.reset()
+    _poll(fake_sheet)
+    df = pelanggan.fetch_pelanggan_df(sid, gid)
+    assert _events("pelanggan.signal_changed") == 0
+    row = df[df["ID Pelanggan"].astype(str) == idpel].iloc[0]
+    assert row["TanggalEksekusi"] == "01/02/2026"
+
+    # replika lain (tanpa catatan tulisan sendiri) melihat sinyal berubah
+    pelanggan._adopted.clear()
+    tracing.reset()
+    pelanggan.fetch_pelanggan_df(sid, gid)
+    assert _events("pelanggan.signal_changed") == 1
+
+
+def test_outside_edit_after_own_write_reloads(fake_sheet):
+    sid, gid = fake_sheet["spreadsheet_id"], fake_sheet["gid"]
+    pelanggan.fetch_pelanggan_df(sid, gid)
+    assert pelanggan.update_tanggal_eksekusi(sid, gid, _idpel(fake_sheet, 3), "01/02/2026")["success"]
+
+    nama_col = sheet_columns.for_worksheet(_ws(fake_sheet), sid, gid).col("nama")
+    _ws(fake_sheet).update_cell(4, nama_col, "Diedit Petugas")
+    _poll(fake_sheet)
+    df = pelanggan.fetch_pelanggan_df(sid, gid)
+    assert "Diedit Petugas" in set(df["Nama"])
+
+
+def _append_and_edit(sheet, nama: str) -> str:
+    """Satu perubahan: baris baru + edit sel baris lama; kembalikan ID baris baru"""
+    ws = _ws(sheet)
+    cmap = sheet_columns.for_worksheet(ws, sheet["spreadsheet_id"], sheet["gid"])
+    row = list(sheet["backend"].spreadsheets[sheet["spreadsheet_id"]].tabs[0].values[1])
+    row[cmap.col("id_pelanggan") - 1] = "519999999999"
+    ws.append_row(row)
+    ws.update_cell(4, cmap.col("nama"), nama)
+    return "519999999999"
+
+
+def test_poll_edit_and_append_in_one_change_reloads_fully(fake_sheet):
+    sid, gid = fake_sheet["spreadsheet_id"], fake_sheet["gid"]
+    pelanggan.fetch_pelanggan_df(sid, gid)
+    new_id = _append_and_edit(fake_sheet, "Diedit Petugas")
+
+    tracing.reset()
+    _poll(fake_sheet)
+    df = pelanggan.fetch_pelanggan_df(sid, gid)
+    assert _events("pelanggan.delta_reload") == 0
+    assert "Diedit Petugas" in set(df["Nama"])
+    assert new_id in set(df["ID Pelanggan"].astype(str))
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    monkeypatch.setattr(freshness, "FRESHNESS_MODE", "webhook")
+    monkeypatch.setattr(freshness, "_stub_attached", True)
+
+
+def test_webhook_delta_only_for_append_pushes(fake_sheet, webhook):
+    sid, gid = fake_sheet["spreadsheet_id"], fake_sheet["gid"]
+    freshness.notify(sid)
+    pelanggan.fetch_pelanggan_df(sid, gid)
+
+    # onFormSubmit: hanya baris baru -> cukup delta
+    ws = _ws(fake_sheet)
+    row = list(fake_sheet["backend"].spreadsheets[sid].tabs[0].values[1])
+    id_col = sheet_columns.for_worksheet(ws, sid, gid).col("id_pelanggan")
+    row[id_col - 1] = "518888888888"
+    ws.append_row(row)
+    freshness.notify(sid, append=True)
+    tracing.reset()
+    df = pelanggan.fetch_pelanggan_df(sid, gid)
+    assert _events("pelanggan.delta_reload") == 1
+    assert "518888888888" in set(df["ID Pelanggan"].astype(str))
+
+    # edit + baris baru dalam satu push biasa -> fetch penuh
+    new_id = _append_and_edit(fake_sheet, "Diedit Petugas")
+    freshness.notify(sid)
+    tracing.reset()
+    df = pelanggan.fetch_pelanggan_df(sid, gid)
+    assert _events("pelanggan.delta_reload") == 0
+    assert "Diedit Petugas" in set(df["Nama"])
+    assert new_id in set(df["ID Pelanggan"].astype(str))
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+import shared_cache
+import tracing
+
+
+def _hold(name: str, acquire):
+    """Pegang kunci `name` di thread lain sampai event release diset"""
+    held, release = threading.Event(), threading.Event()
+
+    def run():
+        with acquire(name):
+            held.set()
+            release.wait(5)
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    assert held.wait(5)
+    return release, t
+
+
+def test_loader_timeout_is_not_retried(local_cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise TimeoutError("Sheets timeout")
+
+    with pytest.raises(TimeoutError, match="Sheets timeout"):
+        shared_cache.get_or_set("k", loader, ttl=10)
+    assert len(calls) == 1
+
+
+def test_flight_lock_timeout_loads_without_lock(local_cache, monkeypatch):
+    monkeypatch.setattr(shared_cache, "LOAD_LOCK_TIMEOUT", 0.05)
+    release, t = _hold("flight:k", lambda name: shared_cache.lock(name, timeout=1))
+    try:
+        assert shared_cache.get_or_set("k", lambda: 42, ttl=10) == 42
+    finally:
+        release.set()
+        t.join()
+    assert shared_cache.get("k")[0] == 42
+
+
+def test_lease_timeout(local_cache):
+    release, t = _hold("idpel:1", lambda name: shared_cache.lease(name, timeout=1))
+    try:
+        with pytest.raises(shared_cache.LeaseTimeout):
+            with shared_cache.lease("idpel:1", timeout=0.05):
+                pass
+        # kunci lain tidak ikut tertahan
+        with shared_cache.lease("idpel:2", timeout=0.05):
+            pass
+    finally:
+        release.set()
+        t.join()
+    with shared_cache.lease("idpel:1", timeout=0.05):
+        pass
+
+
+def test_lease_is_reentrant_per_thread(local_cache):
+    with shared_cache.lease("idpel:1", timeout=0.05):
+        with shared_cache.lease("idpel:1", timeout=0.05):
+            pass
+
+
+def test_redis_lease_timeout():
+    shared_cache.set_backend(shared_cache.RedisCache(shared_cache.FakeRedis()))
+    try:
+        release, t = _hold("idpel:1", lambda name: shared_cache.lease(name, timeout=1))
+        try:
+            with pytest.raises(shared_cache.LeaseTimeout):
+                with shared_cache.lease("idpel:1", timeout=0.05):
+                    pass
+        finally:
+            release.set()
+            t.join()
+    finally:
+        shared_cache.set_backend(shared_cache.LocalCache())
+
+
+def test_redis_lock_release_keeps_lock_taken_after_expiry():
+    backend = shared_cache.RedisCache(shared_cache.FakeRedis())
+    taken, release = threading.Event(), threading.Event()
+
+    def other_replica():
+        with backend.lock("retensi", timeout=1, ttl=5):
+            taken.set()
+            release.wait(5)
+
+    t = threading.Thread(target=other_replica, daemon=True)
+    tracing.reset()
+    try:
+        with backend.lock("retensi", timeout=1, ttl=0.05):
+            time.sleep(0.1)  # lease kedaluwarsa, replika lain mengambilnya
+            t.start()
+            assert taken.wait(5)
+        # pemegang lama selesai: lock milik replika lain tidak ikut terhapus
+        assert backend.client.get("lock:retensi") is not None
+        assert any(row["name"] == "shared_cache.lease_expired" for row in tracing.summary())
+    finally:
+        release.set()
+        t.join()
+    assert backend.client.get("lock:retensi") is None
@@ -0,0 +1,26 @@
+import sheet_columns
+from sheet_columns import ColumnMap
+
+
+def test_exact_aliases_match():
+    cmap = ColumnMap(["Cap waktu", "ID pelanggan ", "Nama", "Alamat", "Tarif/Daya", "Tgl Survey", "Tanggal Eksekusi"])
+    assert cmap.index("timestamp") == 0
+    assert cmap.index("id_pelanggan") == 1
+    assert cmap.index("alamat") == 3
+    assert cmap.index("tarif_daya") == 4
+    assert cmap.letter("tanggal_survey") == "F"
+    assert cmap.col("tanggal_eksekusi") == 7
+
+
+def test_headers_containing_a_key_are_not_matched():
+    header = ["Timestamp", "Alamat Email", "Nama Petugas", "ID Pelanggan", "Nama", "Alamat kWH Meter"]
+    cmap = ColumnMap(header)
+    assert cmap.header_name("alamat") == "Alamat kWH Meter"
+    assert cmap.header_name("nama") == "Nama"
+    assert "Alamat Email" not in cmap.renames()
+
+    # tanpa kolom aslinya, field tetap tidak ditemukan (bukan jatuh ke kolom lain)
+    cmap = ColumnMap(["Timestamp", "Alamat Email", "Nama Petugas", "ID Pelanggan"])
+    assert cmap.missing("nama", "alamat") == ["nama", "alamat"]
+    assert not sheet_columns.matches("alamat", "Alamat Email")
+    assert sheet_columns.matches("id_pelanggan", " ID Pelanggan ")
@@ -0,0 +1,30 @@
+import re
+
+import pytest
+
+import auth
+import sheet_ingest
+
+
+def test_frame_from_rows_pads_short_rows():
+    df = sheet_ingest.frame_from_rows(["ID", "", "Nama"], iter([[["1", "x", "Ani"], ["2"]]]))
+    assert list(df.columns) == ["ID", "", "Nama"]
+    assert df["ID"].tolist() == [1, 2]
+    assert df["Nama"].fillna("").tolist() == ["Ani", ""]
+
+
+@pytest.mark.parametrize("header, shown", [
+    (["ID", "Nama", "Nama"], "'Nama'"),
+    (["ID", "", "Nama", ""], "(kosong)"),
+])
+def test_duplicate_headers_are_rejected(header, shown):
+    with pytest.raises(ValueError, match=re.escape(f"tidak unik: {shown}")):
+        sheet_ingest.frame_from_rows(header, iter([[["1"] * len(header)]]))
+
+
+def test_read_frame_rejects_duplicate_header(fake_sheet):
+    tab = fake_sheet["backend"].spreadsheets[fake_sheet["spreadsheet_id"]].tabs[0]
+    tab.values[0][2] = tab.values[0][1]
+    sh = auth.open_spreadsheet(fake_sheet["spreadsheet_id"])
+    with pytest.raises(ValueError, match="Header sheet tidak unik"):
+        sheet_ingest.read_frame(sh, auth.get_worksheet(sh, gid=fake_sheet["gid"]))
@@ -0,0 +1,285 @@
+# tracing.py - Instrumentasi latensi untuk panggilan Sheets/Drive & render halaman
+import inspect
+import json
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+import streamlit as st
+
+# Ring buffer per proses: cukup untuk menghitung persentil tanpa tumbuh tanpa batas
+MAX_SPANS = 5000
+PERCENTILES = (50, 90, 95, 99)
+METRIC_PREFIX = "geser_meter"
+
+logger = logging.getLogger("geser_meter.trace")
+
+# Log JSON per span (opsional, untuk dikirim ke log collector)
+try:
+    JSON_LOG = bool(st.secrets.get("TRACE_JSON_LOG", False))
+except Exception:
+    JSON_LOG = False
+
+# Exception kontrol Streamlit (st.stop / st.rerun) bukan error
+_CONTROL_EXCEPTIONS = {"StopException", "RerunException"}
+
+_lock = threading.Lock()
+_spans: deque = deque(maxlen=MAX_SPANS)
+_counters: Dict[tuple, float] = defaultdict(float)
+_local = threading.local()
+
+
+class Span:
+    __slots__ = ("name", "started_at", "duration", "bytes_out", "bytes_in", "retries", "ok", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.retries = 0
+        self.ok = True
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "ts": datetime.fromtimestamp(self.started_at, tz=timezone.utc).isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+            "retries": self.retries,
+            "ok": self.ok,
+            "error": self.error,
+        }
+
+
+def payload_size(obj: Any) -> int:
+    """Perkiraan ukuran payload (bytes) untuk dicatat di span."""
+    if obj is None:
+        return 0
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, str):
+        return len(obj.encode("utf-8"))
+    if hasattr(obj, "memory_usage"):  # pandas DataFrame
+        try:
+            return int(obj.memory_usage(index=False).sum())
+        except Exception:
+            return 0
+    try:
+        return len(json.dumps(obj, default=str))
+    except Exception:
+        return 0
+
+
+def _stack() -> list:
+    st_ = getattr(_local, "stack", None)
+    if st_ is None:
+        st_ = _local.stack = []
+    return st_
+
+
+def current_span() -> Optional[Span]:
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def _record(sp: Span) -> None:
+    with _lock:
+        _spans.append(sp)
+        _counters[(sp.name, "count")] += 1
+        _counters[(sp.name, "sum")] += sp.duration
+        _counters[(sp.name, "bytes_out")] += sp.bytes_out
+        _counters[(sp.name, "bytes_in")] += sp.bytes_in
+        if not sp.ok:
+            _counters[(sp.name, "error")] += 1
+    if JSON_LOG:
+        logger.info(json.dumps(sp.as_dict()))
+
+
+@contextmanager
+def span(name: str, payload: Any = None):
+    """Ukur satu panggilan. Span bisa diisi bytes_in/retries dari dalam blok."""
+    sp = Span(name)
+    sp.bytes_out = payload_size(payload)
+    stack = _stack()
+    stack.append(sp)
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        if type(e).__name__ not in _CONTROL_EXCEPTIONS:
+            sp.ok = False
+            sp.error = type(e).__name__
+        raise
+    finally:
+        sp.duration = time.perf_counter() - t0
+        stack.pop()
+        _record(sp)
+
+
+def traced(name: str, payload_arg: Optional[str] = None, measure_result: bool = False):
+    """Decorator: catat latensi fungsi, opsional ukuran argumen payload & hasil."""
+    def deco(fn: Callable):
+        sig = inspect.signature(fn)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            payload = None
+            if payload_arg:
+                try:
+                    payload = sig.bind_partial(*args, **kwargs).arguments.get(payload_arg)
+                except TypeError:
+                    payload = None
+            with span(name, payload) as sp:
+                result = fn(*args, **kwargs)
+                if measure_result:
+                    sp.bytes_in = payload_size(result)
+                return result
+        return wrapper
+    return deco
+
+
+def record_retry(name: Optional[str] = None) -> None:
+    sp = current_span()
+    if sp is not None:
+        sp.retries += 1
+        name = name or sp.name
+    if name:
+        with _lock:
+            _counters[(name, "retry")] += 1
+
+
+def record_cache(name: str, hit: bool) -> None:
+    with _lock:
+        _counters[(name, "cache_hit" if hit else "cache_miss")] += 1
+
+
+def record_event(name: str) -> None:
+    """Hitung kejadian tanpa durasi (mis. konflik write-through)."""
+    with _lock:
+        _counters[(name, "event")] += 1
+
+
+def cache_miss() -> None:
+    """Dipanggil di dalam fungsi @st.cache_data: hanya jalan saat cache miss."""
+    _local.cache_miss = True
+
+
+def cached_call(name: str, fn: Callable, *args, **kwargs):
+    """Panggil fungsi ber-cache sambil mencatat latensi dan hit/miss."""
+    _local.cache_miss = False
+    with span(name) as sp:
+        result = fn(*args, **kwargs)
+        sp.bytes_in = payload_size(result)
+    record_cache(name, hit=not getattr(_local, "cache_miss", False))
+    return result
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summary() -> List[dict]:
+    """Ringkasan per nama span: jumlah, error, persentil latensi, payload, retry, cache."""
+    with _lock:
+        spans = list(_spans)
+        counters = dict(_counters)
+
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for sp in spans:
+        durations[sp.name].append(sp.duration)
+
+    names = sorted({k[0] for k in counters} | set(durations))
+    rows = []
+    for name in names:
+        durs = sorted(durations.get(name, []))
+        count = int(counters.get((name, "count"), 0))
+        row = {
+            "name": name,
+            "count": count,
+            "errors": int(counters.get((name, "error"), 0)),
+            "mean_ms": round(counters.get((name, "sum"), 0.0) / count * 1000, 2) if count else 0.0,
+        }
+        for p in PERCENTILES:
+            row[f"p{p}_ms"] = round(_percentile(durs, p) * 1000, 2)
+        row["max_ms"] = round(durs[-1] * 1000, 2) if durs else 0.0
+        row["bytes_out"] = int(counters.get((name, "bytes_out"), 0))
+        row["bytes_in"] = int(counters.get((name, "bytes_in"), 0))
+        row["retries"] = int(counters.get((name, "retry"), 0))
+        row["cache_hits"] = int(counters.get((name, "cache_hit"), 0))
+        row["cache_misses"] = int(counters.get((name, "cache_miss"), 0))
+        row["events"] = int(counters.get((name, "event"), 0))
+        rows.append(row)
+    return rows
+
+
+def export_json(last_n: int = 500) -> str:
+    with _lock:
+        spans = list(_spans)[-last_n:]
+    return json.dumps({
+        "generated_at": datetime.now(tz=timezone.utc).isoformat(),
+        "summary": summary(),
+        "spans": [sp.as_dict() for sp in spans],
+    }, indent=2)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def export_prometheus() -> str:
+    """Format teks Prometheus (exposition format 0.0.4)."""
+    p = METRIC_PREFIX
+    lines = [
+        f"# HELP {p}_call_duration_seconds Latensi panggilan Sheets/Drive/halaman",
+        f"# TYPE {p}_call_duration_seconds summary",
+    ]
+    rows = summary()
+    with _lock:
+        counters = dict(_counters)
+    for row in rows:
+        n = _label(row["name"])
+        for q in PERCENTILES:
+            lines.append(f'{p}_call_duration_seconds{{name="{n}",quantile="{q / 100}"}} {row[f"p{q}_ms"] / 1000}')
+        lines.append(f'{p}_call_duration_seconds_sum{{name="{n}"}} {counters.get((row["name"], "sum"), 0.0)}')
+        lines.append(f'{p}_call_duration_seconds_count{{name="{n}"}} {row["count"]}')
+
+    simple = [
+        ("errors_total", "Panggilan yang gagal", [("", "errors")]),
+        ("retries_total", "Jumlah retry", [("", "retries")]),
+        ("events_total", "Kejadian (konflik, dedup, dll.)", [("", "events")]),
+        ("payload_bytes_total", "Ukuran payload", [('direction="out"', "bytes_out"), ('direction="in"', "bytes_in")]),
+        ("cache_requests_total", "Hit/miss cache", [('result="hit"', "cache_hits"), ('result="miss"', "cache_misses")]),
+    ]
+    for metric, help_text, fields in simple:
+        lines.append(f"# HELP {p}_{metric} {help_text}")
+        lines.append(f"# TYPE {p}_{metric} counter")
+        for row in rows:
+            n = _label(row["name"])
+            for extra, field in fields:
+                if not row[field] and (field.startswith("cache") or field == "events"):
+                    continue
+                labels = f'name="{n}"' + (f",{extra}" if extra else "")
+                lines.append(f"{p}_{metric}{{{labels}}} {row[field]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _spans.clear()
+        _counters.clear()